@@ -0,0 +1,533 @@
+# Benchmarks of the sync process with synthetic music libraries. Usage example:
+# python benchmark.py --sizes 1000 10000 100000 1000000 --output benchmark.json
+
+import os
+import json
+import random
+import argparse
+import plistlib
+import tracemalloc
+from time import perf_counter
+from datetime import datetime
+from tempfile import mkdtemp
+from contextlib import redirect_stdout
+from platform import platform as get_os
+from platform import python_version
+from shutil import copy2 as copy
+from shutil import rmtree as remove_tree
+from src.music_library import *
+from src.music_sync import *
+from src.music_ratings import add_ratings
+from src.music_backends import BACKENDS
+from src.music_filesystem import MemoryFileSystem
+
+WORDS = {
+    "ascii": [
+        "Love",
+        "Night",
+        "Blue",
+        "Fire",
+        "Road",
+        "Dream",
+        "Heart",
+        "Rain",
+        "Summer",
+        "Light",
+        "River",
+        "Gold",
+        "Song",
+        "Time",
+        "World",
+        "Street",
+        "Moon",
+        "Dance",
+    ],
+    "unicode": [
+        "Café",
+        "Ñandú",
+        "Garçon",
+        "Über",
+        "Ωμέγα",
+        "Мир",
+        "東京",
+        "서울",
+        "Smørrebrød",
+        "Señorita",
+        "Crème",
+        "Fiancée",
+        "Ελπίδα",
+        "Ночь",
+        "夢",
+        "Ça",
+        "Déjà",
+        "Żółw",
+    ],
+}  # Words to build names
+SPECIAL = ["?", ":", "/", "&", "'", "."]  # Characters replaced in file paths
+SONGS_PER_ALBUM = 12
+ALBUMS_PER_ARTIST = 4
+
+
+def get_name(generator: random.Random, words: int, unicode: float) -> str:
+    """It gets a random name.
+
+    Args:
+        generator (random.Random): Random numbers generator.
+        words (int): Maximum number of words.
+        unicode (float): Ratio of non ASCII words (from 0 to 1).
+
+    Returns:
+        str: Name.
+    """
+    name = []
+    for word in range(generator.randint(1, words)):
+        language = "unicode" if generator.random() < unicode else "ascii"
+        name.append(generator.choice(WORDS[language]))
+    if generator.random() < 0.05:
+        name.append(generator.choice(SPECIAL))
+    return " ".join(name)
+
+
+def generate(
+    folder: str,
+    tracks: int,
+    playlists: int = 20,
+    playlist_size: int = 100,
+    unicode: float = 0.2,
+    file_size: int = 1024,
+    seed: int = 0,
+) -> Library:
+    """It generates a synthetic music library in a folder with the same layout as the test folder (see test.py): iTunes and Rhythmbox library XML files, Rhythmbox playlists XML file and source music folder with dummy songs files.
+
+    Args:
+        folder (str): Folder path.
+        tracks (int): Number of songs.
+        playlists (int, optional): Number of playlists. Defaults to 20.
+        playlist_size (int, optional): Number of songs of each playlist. Defaults to 100.
+        unicode (float, optional): Ratio of non ASCII words in names (from 0 to 1). Defaults to 0.2.
+        file_size (int, optional): Size in bytes of each song file. Defaults to 1024.
+        seed (int, optional): Random numbers seed. Defaults to 0.
+
+    Returns:
+        Library: Generated music library.
+    """
+    generator = random.Random(seed)
+    source = folder + SEPARATOR + "source"
+    shortened = get_os()[:7] == "Windows"
+    library = Library(None)
+    # Songs
+    artist = album = None
+    for id in range(1, tracks + 1):
+        if (id - 1) % (SONGS_PER_ALBUM * ALBUMS_PER_ARTIST) == 0:
+            artist = get_name(generator, 3, unicode) + " " + str(id)
+        if (id - 1) % SONGS_PER_ALBUM == 0:
+            album = get_name(generator, 4, unicode)
+            year = generator.randint(1960, 2024)
+            genre = generator.choice(WORDS["ascii"])
+        song = Song(
+            id,
+            title=get_name(generator, 5, unicode),
+            artist=artist,
+            album=album,
+            album_artist=artist,
+            track_number=(id - 1) % SONGS_PER_ALBUM + 1,
+            disc_number=1,
+            year=year,
+            genre=genre,
+            rating=generator.randint(0, 5),
+            play_count=generator.randint(0, 200),
+            format=generator.choice(["mp3", "mp3", "m4a"]),
+        )
+        library.add_song(song)
+        file = source + SEPARATOR + get_file_path(song, shortened)
+        os.makedirs(os.path.dirname(file), exist_ok=True)
+        with open(file, mode="wb") as song_file:
+            song_file.write(generator.randbytes(file_size))
+    # Playlists
+    for id in range(1, playlists + 1):
+        library.playlists.append(
+            Playlist(
+                tracks + id,
+                get_name(generator, 3, unicode),
+                songs=generator.sample(library.songs, min(playlist_size, tracks)),
+            )
+        )
+    write_itunes(library, folder + SEPARATOR + "iTunes Music Library.xml", source)
+    write_rhythmbox(
+        library,
+        folder + SEPARATOR + "rhythmdb.xml",
+        folder + SEPARATOR + "playlists.xml",
+        source,
+    )
+    return library
+
+
+def write_itunes(library: Library, file_name: str, source: str) -> None:
+    """It writes an iTunes library XML file.
+
+    Args:
+        library (Library): Music library.
+        file_name (str): Path to the iTunes library XML file.
+        source (str): Absolute folder path to the source music folder.
+    """
+    TAGS = {
+        "Name": "title",
+        "Artist": "artist",
+        "Album Artist": "album_artist",
+        "Album": "album",
+        "Genre": "genre",
+    }  # Song attributes by iTunes string key
+    NUMBERS = {
+        "Disc Number": "disc_number",
+        "Track Number": "track_number",
+        "Year": "year",
+        "Play Count": "play_count",
+    }  # Song attributes by iTunes integer key
+    with open(file_name, mode="w", encoding=ENCODING, buffering=BUFFER_SIZE) as file:
+        file.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        file.write('<plist version="1.0">\n<dict>\n')
+        file.write("\t<key>Major Version</key><integer>1</integer>\n")
+        file.write("\t<key>Tracks</key>\n\t<dict>\n")
+        for song in library.songs:
+            file.write("\t\t<key>" + str(song.id) + "</key>\n\t\t<dict>\n")
+            file.write(
+                "\t\t\t<key>Track ID</key><integer>" + str(song.id) + "</integer>\n"
+            )
+            for key in TAGS:
+                file.write(
+                    "\t\t\t<key>"
+                    + key
+                    + "</key><string>"
+                    + str2html(getattr(song, TAGS[key]), quote=False)
+                    + "</string>\n"
+                )
+            for key in NUMBERS:
+                file.write(
+                    "\t\t\t<key>"
+                    + key
+                    + "</key><integer>"
+                    + str(getattr(song, NUMBERS[key]))
+                    + "</integer>\n"
+                )
+            file.write(
+                "\t\t\t<key>Rating</key><integer>"
+                + str(20 * song.rating)
+                + "</integer>\n"
+            )
+            file.write(
+                "\t\t\t<key>Location</key><string>file://"
+                + str2html(
+                    str2url(
+                        source + SEPARATOR + get_file_path(song), safe=SAFE_CHARACTERS
+                    ),
+                    quote=False,
+                )
+                + "</string>\n"
+            )
+            file.write("\t\t</dict>\n")
+        file.write("\t</dict>\n\t<key>Playlists</key>\n\t<array>\n")
+        for playlist in library.playlists:
+            file.write("\t\t<dict>\n")
+            file.write(
+                "\t\t\t<key>Name</key><string>"
+                + str2html(playlist.name, quote=False)
+                + "</string>\n"
+            )
+            file.write(
+                "\t\t\t<key>Playlist ID</key><integer>"
+                + str(playlist.id)
+                + "</integer>\n"
+            )
+            file.write("\t\t\t<key>Playlist Items</key>\n\t\t\t<array>\n")
+            for song in playlist.get_songs():
+                file.write(
+                    "\t\t\t\t<dict>\n\t\t\t\t\t<key>Track ID</key><integer>"
+                    + str(song.id)
+                    + "</integer>\n\t\t\t\t</dict>\n"
+                )
+            file.write("\t\t\t</array>\n\t\t</dict>\n")
+        file.write("\t</array>\n</dict>\n</plist>\n")
+
+
+def write_rhythmbox(
+    library: Library, database: str, playlists: str, source: str
+) -> None:
+    """It writes a Rhythmbox library XML file and playlists XML file.
+
+    Args:
+        library (Library): Music library.
+        database (str): Path to the Rhythmbox library XML file.
+        playlists (str): Path to the Rhythmbox playlists XML file.
+        source (str): Absolute folder path to the source music folder.
+    """
+    TAGS = {
+        "title": "title",
+        "genre": "genre",
+        "artist": "artist",
+        "album": "album",
+        "track-number": "track_number",
+        "disc-number": "disc_number",
+        "play-count": "play_count",
+    }  # Song attributes by Rhythmbox entry tag
+    with open(database, mode="w", encoding=ENCODING, buffering=BUFFER_SIZE) as file:
+        file.write('<?xml version="1.0" standalone="yes"?>\n<rhythmdb version="2.0">\n')
+        for song in library.songs:
+            file.write('  <entry type="song">\n')
+            for tag in TAGS:
+                file.write(
+                    "    <"
+                    + tag
+                    + ">"
+                    + str2html(str(getattr(song, TAGS[tag])), quote=False)
+                    + "</"
+                    + tag
+                    + ">\n"
+                )
+            file.write(
+                "    <location>file://"
+                + str2html(
+                    str2url(
+                        source + SEPARATOR + get_file_path(song), safe=SAFE_CHARACTERS
+                    ),
+                    quote=False,
+                )
+                + "</location>\n"
+            )
+            file.write("  </entry>\n")
+        file.write("</rhythmdb>\n")
+    with open(playlists, mode="w", encoding=ENCODING, buffering=BUFFER_SIZE) as file:
+        file.write('<?xml version="1.0"?>\n<rhythmdb-playlists>')
+        for playlist in library.playlists:
+            write_rhythmbox_playlist(file, playlist, source)
+        file.write("\n</rhythmdb-playlists>\n")
+
+
+def measure(
+    results: list, tracks: int, stage: str, function, *args, memory: bool = False
+) -> None:
+    """It measures the time that a function takes, hiding its console output, and adds it to the results.
+
+    Args:
+        results (list): Results of the benchmarks.
+        tracks (int): Number of songs of the library.
+        stage (str): Name of the measured stage.
+        function (function): Function to be measured.
+        args: Arguments of the function.
+        memory (bool, optional): If True, the function is run again with tracemalloc to measure its peak memory (not during the timed run, because tracing slows it down). Defaults to False.
+    """
+    result = {"tracks": tracks, "stage": stage}
+    with open(os.devnull, mode="w") as null, redirect_stdout(null):
+        start = perf_counter()
+        function(*args)
+        result["seconds"] = perf_counter() - start
+        if memory:
+            tracemalloc.start()
+            function(*args)
+            result["peak_bytes"] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+    results.append(result)
+    print(
+        " - "
+        + stage
+        + ": "
+        + str(round(result["seconds"], 3))
+        + " s"
+        + (
+            " (peak of " + str(round(result["peak_bytes"] / 2**20, 1)) + " MiB)"
+            if memory
+            else ""
+        )
+    )
+
+
+def run(tracks: int, folder: str, arguments: argparse.Namespace) -> list:
+    """It runs all benchmarks with a library of a given size.
+
+    Args:
+        tracks (int): Number of songs.
+        folder (str): Working folder path.
+        arguments (argparse.Namespace): Command line arguments.
+
+    Returns:
+        list: Results of the benchmarks.
+    """
+    print("Benchmarking " + str(tracks) + " song(s)")
+    results = []
+    start = perf_counter()
+    generate(
+        folder,
+        tracks,
+        playlists=arguments.playlists,
+        playlist_size=arguments.playlist_size,
+        unicode=arguments.unicode,
+        file_size=arguments.file_size,
+    )
+    print(" - generation: " + str(round(perf_counter() - start, 3)) + " s")
+    itunes = [folder + SEPARATOR + "iTunes Music Library.xml"]
+    rhythmbox = [
+        folder + SEPARATOR + "rhythmdb.xml",
+        folder + SEPARATOR + "playlists.xml",
+    ]
+    source = folder + SEPARATOR + "source"
+    destination = folder + SEPARATOR + "destination"
+    measure(results, tracks, "parse iTunes", Library, itunes, "iTunes")
+    measure(results, tracks, "parse Rhythmbox", Library, rhythmbox, "Rhythmbox")
+    # iTunes library readers, with the XML and binary property list formats
+    binary = folder + SEPARATOR + "iTunes Music Library.plist"
+    with open(itunes[0], mode="rb") as file:
+        content = plistlib.load(file)
+    with open(binary, mode="wb") as file:
+        plistlib.dump(content, file, fmt=plistlib.FMT_BINARY)
+    del content
+    for backend in BACKENDS:
+        measure(
+            results,
+            tracks,
+            "parse iTunes (" + backend + " backend)",
+            Library,
+            itunes,
+            "iTunes",
+            backend,
+            memory=True,
+        )
+    measure(
+        results,
+        tracks,
+        "parse iTunes (binary plist)",
+        Library,
+        [binary],
+        "iTunes",
+        memory=True,
+    )
+    with open(os.devnull, mode="w") as null, redirect_stdout(null):
+        process = Sync("iTunes", itunes, source, destination)
+    os.makedirs(destination)
+    measure(results, tracks, "sync songs (cold)", process.sync_songs)
+    measure(results, tracks, "sync songs (no-op)", process.sync_songs)
+    # Some songs files are missing in the destination folder
+    generator = random.Random(tracks)
+    songs = generator.sample(process.library.songs, max(1, tracks // 10))
+    for song in songs:
+        os.remove(destination + SEPARATOR + get_file_path(song))
+    measure(results, tracks, "sync songs (warm)", process.sync_songs)
+    # Some files and folders do not belong to the library
+    for song in songs:
+        folder_path = destination + SEPARATOR + get_folder_path(song)
+        with open(folder_path + SEPARATOR + "stale " + str(song.id) + ".mp3", "wb"):
+            pass
+        os.makedirs(folder_path + " stale", exist_ok=True)
+        os.makedirs(destination + SEPARATOR + "Stale " + str(song.id), exist_ok=True)
+    measure(results, tracks, "sync songs (cleanup)", process.sync_songs)
+    measure(results, tracks, "sync playlists (Generic)", process.sync_playlists)
+    process.destination_playlists = folder + SEPARATOR + "destination playlists.xml"
+    measure(results, tracks, "sync playlists (Rhythmbox)", process.sync_playlists)
+    # Planning and bookkeeping of the sync process, without disks
+    filesystem = MemoryFileSystem(
+        latency=arguments.latency, bandwidth=arguments.bandwidth
+    )
+    for song in process.library.songs:
+        filesystem.add_file(process.get_source_path(song), size=arguments.file_size)
+    with open(os.devnull, mode="w") as null, redirect_stdout(null):
+        simulation = Sync(
+            "iTunes",
+            None,
+            source,
+            destination,
+            library=process.library,
+            filesystem=filesystem,
+        )
+    for stage in ["cold", "no-op"]:
+        elapsed = filesystem.elapsed
+        measure(
+            results,
+            tracks,
+            "sync songs (in memory, " + stage + ")",
+            simulation.sync_songs,
+        )
+        # Time of the file system operations, which are not waited for
+        results[-1]["simulated_seconds"] = filesystem.elapsed - elapsed
+    copy(rhythmbox[0], folder + SEPARATOR + "ratings.xml")
+    measure(
+        results,
+        tracks,
+        "add ratings",
+        add_ratings,
+        itunes[0],
+        folder + SEPARATOR + "ratings.xml",
+        ["rating", "play-count"],
+    )
+    return results
+
+
+def main() -> None:
+    """It runs the benchmarks from the command line and writes the results as a JSON file."""
+    parser = argparse.ArgumentParser(description="Benchmarks of the sync process.")
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[1000, 10000],
+        help="numbers of songs of the libraries",
+    )
+    parser.add_argument("--playlists", type=int, default=20, help="number of playlists")
+    parser.add_argument(
+        "--playlist-size",
+        type=int,
+        default=100,
+        help="number of songs of each playlist",
+    )
+    parser.add_argument(
+        "--unicode", type=float, default=0.2, help="ratio of non ASCII words in names"
+    )
+    parser.add_argument(
+        "--file-size", type=int, default=1024, help="size in bytes of each song file"
+    )
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0,
+        help="simulated seconds of each operation of the in-memory file system",
+    )
+    parser.add_argument(
+        "--bandwidth",
+        type=float,
+        help="bytes per second copied by the in-memory file system (unlimited by default)",
+    )
+    parser.add_argument(
+        "--folder",
+        help="working folder (a temporary one is created and removed by default)",
+    )
+    parser.add_argument(
+        "--output", default="benchmark.json", help="JSON file for the results"
+    )
+    arguments = parser.parse_args()
+    results = []
+    for tracks in arguments.sizes:
+        if arguments.folder:
+            folder = arguments.folder + SEPARATOR + str(tracks)
+            if os.path.exists(folder):
+                remove_tree(folder)
+            os.makedirs(folder)
+        else:
+            folder = mkdtemp(prefix="itunes-sync-benchmark-")
+        try:
+            results += run(tracks, folder, arguments)
+        finally:
+            if not arguments.folder:
+                remove_tree(folder, ignore_errors=True)
+    with open(arguments.output, mode="w", encoding=ENCODING) as file:
+        json.dump(
+            {
+                "date": str(datetime.now()),
+                "python": python_version(),
+                "platform": get_os(),
+                "results": results,
+            },
+            file,
+            indent=2,
+        )
+    print("Results written to " + arguments.output)
+
+
+if __name__ == "__main__":
+    main()
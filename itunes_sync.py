@@ -0,0 +1,401 @@
+# Command line interface without graphical user interface. Usage examples:
+# python -m itunes_sync sync --library "iTunes Music Library.xml" --source-folder Music --destination-folder /media/music
+# python -m itunes_sync sync --merge iTunes Music "iTunes Music Library.xml" --merge Rhythmbox Rhythmbox rhythmdb.xml playlists.xml --destination-folder /media/music
+# python -m itunes_sync sync --library "iTunes Music Library.xml" --source-folder Music --destination-folder /media/car --transcode flac mp3 192 --transcode m4a mp3 192
+# python -m itunes_sync sync --library "iTunes Music Library.xml" --source-folder Music --archive /media/backup/music.tar
+# python -m itunes_sync watch --library "iTunes Music Library.xml" --source-folder Music --destination-folder /media/music
+# python -m itunes_sync ratings "iTunes Music Library.xml" rhythmdb.xml --play-counts
+# python -m itunes_sync stats --library "iTunes Music Library.xml"
+# Results are written as JSON to the standard output, and progress messages to the standard error.
+
+import sys
+import json
+import shlex
+from argparse import ArgumentParser
+from contextlib import redirect_stdout
+
+SUCCESS = 0  # Exit code when everything was synced
+ERRORS = 1  # Exit code when some songs or playlists could not be synced
+USAGE = 2  # Exit code when the arguments are not valid (as argparse)
+FAILURE = 3  # Exit code when the process failed
+LANGUAGES = ["iTunes", "Rhythmbox"]  # Source libraries languages
+
+
+def sync(arguments) -> int:
+    """It syncs a destination folder with a source music library.
+
+    Args:
+        arguments (argparse.Namespace): Command line arguments.
+
+    Returns:
+        int: Exit code.
+    """
+    from src.music_sync import Sync
+
+    with redirect_stdout(sys.stderr):
+        library = None
+        if arguments.merge:
+            from src.music_library import Library
+            from src.music_merge import MergedLibrary
+
+            sources = []
+            if arguments.library:
+                sources.append(
+                    (
+                        Library(arguments.library, language=arguments.source_language),
+                        arguments.source_folder,
+                    )
+                )
+            for source in arguments.merge:
+                sources.append((Library(source[2:], language=source[0]), source[1]))
+            library = MergedLibrary(sources)
+        process = Sync(
+            arguments.source_language,
+            arguments.library,
+            arguments.source_folder,
+            arguments.destination_folder,
+            destination_playlists=arguments.destination_playlists,
+            destination_database=arguments.destination_database,
+            workers=arguments.workers,
+            memory_budget=arguments.memory_budget and arguments.memory_budget << 20,
+            dedup=arguments.dedup,
+            transcode=get_transcode(arguments),
+            encoder=arguments.encoder and shlex.split(arguments.encoder),
+            transcode_cache=arguments.transcode_cache,
+            library=library,
+            fit=arguments.fit,
+            archive=arguments.archive,
+            events=arguments.events,
+        )
+        metrics = process.start()
+        if arguments.log:
+            process.write_log(arguments.log)
+        if arguments.metrics:
+            process.write_metrics(arguments.metrics)
+    output(
+        {
+            "songs": len(process.library.songs),
+            "playlists": len(process.library.playlists),
+            "errors": process.log.counters["error"],
+            "metrics": metrics,
+        }
+    )
+    return ERRORS if process.log.counters["error"] else SUCCESS
+
+
+def watch(arguments) -> int:
+    """It syncs a destination folder with a source music library, and then it keeps it synced while the library changes. A JSON line is written for each sync.
+
+    Args:
+        arguments (argparse.Namespace): Command line arguments.
+
+    Returns:
+        int: Exit code.
+    """
+    from src.music_sync import Sync
+    from src.music_watch import Watch
+
+    with redirect_stdout(sys.stderr):
+        process = Sync(
+            arguments.source_language,
+            arguments.library,
+            arguments.source_folder,
+            arguments.destination_folder,
+            destination_playlists=arguments.destination_playlists,
+            destination_database=arguments.destination_database,
+            workers=arguments.workers,
+            memory_budget=arguments.memory_budget and arguments.memory_budget << 20,
+            dedup=arguments.dedup,
+            transcode=get_transcode(arguments),
+            encoder=arguments.encoder and shlex.split(arguments.encoder),
+            transcode_cache=arguments.transcode_cache,
+            events=arguments.events,
+        )
+        metrics = process.start()
+        watcher = Watch(
+            process,
+            debounce=arguments.debounce,
+            interval=arguments.interval,
+            polling=arguments.polling,
+        )
+    output({"errors": process.log.counters["error"], "metrics": metrics}, lines=True)
+    sync = watcher.sync
+
+    def sync_changes(changes: set) -> dict:
+        with redirect_stdout(sys.stderr):
+            result = sync(changes)
+        output(result, lines=True)
+        return result
+
+    watcher.sync = sync_changes
+    with redirect_stdout(sys.stderr):
+        watcher.run()
+    return SUCCESS
+
+
+def get_transcode(arguments) -> dict:
+    """It gets the transcoding settings of the command line arguments.
+
+    Args:
+        arguments (argparse.Namespace): Command line arguments.
+
+    Returns:
+        dict: Target file format and bitrate by source file format (see Sync).
+    """
+    return {
+        format: (target, int(bitrate))
+        for format, target, bitrate in arguments.transcode or []
+    }
+
+
+def ratings(arguments) -> int:
+    """It copies songs ratings (and play counts) from an iTunes library to a Rhythmbox library.
+
+    Args:
+        arguments (argparse.Namespace): Command line arguments.
+
+    Returns:
+        int: Exit code.
+    """
+    from src.music_ratings import add_ratings
+
+    properties = ["rating"]
+    if arguments.play_counts:
+        properties.append("play-count")
+    with redirect_stdout(sys.stderr):
+        report = add_ratings(
+            arguments.source, arguments.destination, properties, arguments.fuzzy
+        )
+    output(report)
+    return SUCCESS
+
+
+def stats(arguments) -> int:
+    """It gets the statistics of a music library.
+
+    Args:
+        arguments (argparse.Namespace): Command line arguments.
+
+    Returns:
+        int: Exit code.
+    """
+    from src.music_library import Library
+    from src.music_profiler import profile
+
+    with profile("parse"):
+        library = Library(arguments.library, language=arguments.source_language)
+    output(
+        {
+            "artists": library.get_artists_number(),
+            "albums": library.get_albums_number(),
+            "songs": len(library.songs),
+            "playlists": len(library.playlists),
+            "genres": library.get_counts("genre"),
+            "ratings": library.get_counts("rating"),
+        }
+    )
+    return SUCCESS
+
+
+def output(result: dict, lines: bool = False) -> None:
+    """It writes a result as JSON to the standard output.
+
+    Args:
+        result (dict): Result.
+        lines (bool, optional): If True, the result is written in a single line. Defaults to False.
+    """
+    json.dump(
+        result,
+        sys.stdout,
+        indent=None if lines else 2,
+        ensure_ascii=False,
+        default=str,
+    )
+    sys.stdout.write("\n")
+    sys.stdout.flush()
+
+
+def get_parser() -> ArgumentParser:
+    """It gets the command line arguments parser.
+
+    Returns:
+        ArgumentParser: Arguments parser.
+    """
+    parser = ArgumentParser(
+        prog="itunes_sync", description="Sync iTunes and Rhythmbox music libraries."
+    )
+    parser.add_argument(
+        "--profile",
+        help="profilers to be enabled for each phase, separated by commas (cpu, memory)",
+    )
+    parser.add_argument("--profile-folder", help="folder for the profiling results")
+    commands = parser.add_subparsers(dest="command", required=True)
+    for name in ["sync", "watch"]:
+        if name == "sync":
+            command = commands.add_parser(
+                "sync", help="sync a destination music folder"
+            )
+            command.set_defaults(function=sync)
+        else:
+            command = commands.add_parser(
+                "watch", help="sync and keep syncing when the library changes"
+            )
+            command.set_defaults(function=watch)
+        # Merged sources can be given instead of a single source
+        command.add_argument(
+            "--library",
+            nargs="+",
+            required=name == "watch",
+            help="source library XML files (Rhythmbox needs the library and the playlists)",
+        )
+        command.add_argument("--source-language", choices=LANGUAGES, default="iTunes")
+        command.add_argument("--source-folder", required=name == "watch")
+        command.add_argument("--destination-folder", required=name == "watch")
+        command.add_argument(
+            "--destination-playlists",
+            help="Rhythmbox playlists XML file (generic playlists are written by default)",
+        )
+        command.add_argument(
+            "--destination-database",
+            help="Rhythmbox library XML file to be written with the synced songs",
+        )
+        command.add_argument(
+            "--workers",
+            type=int,
+            help="worker processes that sync the songs, partitioned by artist",
+        )
+        command.add_argument(
+            "--memory-budget",
+            type=int,
+            metavar="MIB",
+            help="plan the songs in temporary files, with this memory (in MiB)",
+        )
+        command.add_argument(
+            "--dedup",
+            action="store_true",
+            help="copy identical songs files once and hard link the others",
+        )
+        command.add_argument(
+            "--transcode",
+            nargs=3,
+            action="append",
+            metavar=("FORMAT", "TARGET", "KBPS"),
+            help="transcode songs files of a format to a target format and bitrate (it can be repeated)",
+        )
+        command.add_argument(
+            "--encoder",
+            help="encoder command, with {source}, {destination}, {format} and {bitrate} fields (ffmpeg by default)",
+        )
+        command.add_argument(
+            "--transcode-cache", help="folder where transcoded files are kept"
+        )
+        command.add_argument(
+            "--events",
+            help="JSON lines file where the events (copies, removals, errors...) are appended as they happen",
+        )
+        if name == "sync":
+            command.add_argument(
+                "--merge",
+                nargs="+",
+                action="append",
+                metavar="SOURCE",
+                help="another source to be merged: language, music folder and library XML files (it can be repeated)",
+            )
+            command.add_argument(
+                "--fit",
+                action="store_true",
+                help="sync only the songs that fit in the destination device, by priority (playlists, rating and play count)",
+            )
+            command.add_argument(
+                "--archive",
+                help="tar archive (.tar, .tar.gz or .tar.zst) to be written instead of the destination folder",
+            )
+            command.add_argument("--log", help="log file with the errors")
+            command.add_argument(
+                "--metrics", help="JSON file with the performance metrics"
+            )
+        else:
+            command.add_argument(
+                "--debounce",
+                type=float,
+                default=5,
+                help="seconds without changes before syncing",
+            )
+            command.add_argument(
+                "--interval",
+                type=float,
+                default=10,
+                help="seconds between checks when polling",
+            )
+            command.add_argument(
+                "--polling", action="store_true", help="poll even if inotify works"
+            )
+    # Ratings
+    command = commands.add_parser(
+        "ratings", help="copy ratings from iTunes to Rhythmbox"
+    )
+    command.set_defaults(function=ratings)
+    command.add_argument("source", help="iTunes library XML file")
+    command.add_argument("destination", help="Rhythmbox library XML file")
+    command.add_argument(
+        "--play-counts", action="store_true", help="copy play counts too"
+    )
+    command.add_argument(
+        "--fuzzy",
+        type=float,
+        help="minimum score (from 0 to 1) to match songs with different tags",
+    )
+    # Stats
+    command = commands.add_parser("stats", help="show library statistics")
+    command.set_defaults(function=stats)
+    command.add_argument("--library", nargs="+", required=True)
+    command.add_argument("--source-language", choices=LANGUAGES, default="iTunes")
+    return parser
+
+
+def main(arguments: list = None) -> int:
+    """It runs a command.
+
+    Args:
+        arguments (list, optional): Command line arguments. Defaults to the arguments of the process.
+
+    Returns:
+        int: Exit code.
+    """
+    parser = get_parser()
+    arguments = parser.parse_args(arguments)
+    for format, target, bitrate in getattr(arguments, "transcode", None) or []:
+        if not bitrate.isdigit():
+            parser.error("--transcode needs a bitrate in kbit/s")
+    if arguments.command == "sync":
+        if not arguments.merge and not (arguments.library and arguments.source_folder):
+            parser.error("--library and --source-folder are required without --merge")
+        if not arguments.destination_folder and not arguments.archive:
+            parser.error("--destination-folder or --archive is required")
+        if bool(arguments.library) != bool(arguments.source_folder):
+            parser.error("--library and --source-folder must be given together")
+        for source in arguments.merge or []:
+            if len(source) < 3 or not source[0] in LANGUAGES:
+                parser.error(
+                    "--merge needs a language ("
+                    + ", ".join(LANGUAGES)
+                    + "), a music folder and library XML files"
+                )
+    from src.music_profiler import configure
+
+    try:
+        configure(
+            arguments.profile and arguments.profile.split(","),
+            arguments.profile_folder,
+        )
+    except ValueError as error:
+        parser.error(str(error))
+    try:
+        return arguments.function(arguments)
+    except Exception as error:
+        print("Error: " + str(error), file=sys.stderr)
+        return FAILURE
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,11 +1,12 @@
 from src.music_sync import *
+from src.music_profiler import profile
 import tkinter as gui
 from tkinter import filedialog
 from tkinter import messagebox
 from tkinter import ttk
 from platform import system
-from datetime import datetime
 from functools import partial
+from os.path import splitext
 
 # Window properties
 APP = "iTunes sync"
@@ -189,7 +190,10 @@ def update_state(event=None) -> None:
     if not "" in source_folder:
         try:
             global library
-            library = Library(source_folder, window["source"]["language value"].get())
+            with profile("parse"):
+                library = Library(
+                    source_folder, window["source"]["language value"].get()
+                )
             content += "The selected music library contains:"
             content += "\n" + str(library.get_artists_number()) + " artist(s)"
             content += "\n" + str(library.get_albums_number()) + " album(s)"
@@ -319,6 +323,10 @@ def sync() -> None:
     destination_playlists = None
     if destination_language == "Rhythmbox":
         destination_playlists = window["destination"]["playlists label"]["text"]
+    # Events are written next to the log file as they happen
+    events = None
+    if window["destination"]["library label"]["text"]:
+        events = splitext(window["destination"]["library label"]["text"])[0] + ".jsonl"
     # Sync process
     process = Sync(
         source_language,
@@ -327,31 +335,26 @@ def sync() -> None:
         destination_folder,
         destination_playlists=destination_playlists,
         window=window,
+        events=events,
     )
     process.start()
     # Log file
     if window["destination"]["library label"]["text"]:
-        log = open(window["destination"]["library label"]["text"], "w")
-        log.write(
-            "Sync process was completed at "
-            + str(datetime.now())
-            + " with the following errors:\n"
+        # Performance metrics are written next to the log file
+        process.write_metrics(
+            splitext(window["destination"]["library label"]["text"])[0] + ".json"
         )
-        for error in process.errors:
-            if isinstance(error, Song):
-                log.write("\n" + get_file_path(error))
-            elif isinstance(error, Playlist):
-                log.write("\nPlaylist: " + error.name)
-        log.close()
+        process.write_log(window["destination"]["library label"]["text"])
     # Result
-    if len(process.errors) == 0:
+    if process.log.counters["error"] == 0:
         content = "The music library has been successfully synced."
     else:
         content = (
             "The music library has been synced with "
-            + str(len(process.errors))
+            + str(process.log.counters["error"])
             + " error(s)."
         )
+    content += "\n" + process.log.get_summary() + "."
     window["destination"]["content"]["text"] = content
     messagebox.showinfo(icon="info", title="Music library synced", message=content)
     # Sync button
@@ -375,4 +378,23 @@ def confirm(action: str) -> bool:
 
 
 if __name__ == "__main__":
+    from argparse import ArgumentParser
+    from src.music_profiler import PROFILERS, configure
+
+    parser = ArgumentParser(description=APP)
+    parser.add_argument(
+        "--profile",
+        help="profilers to be enabled for each sync phase, separated by commas ("
+        + ", ".join(PROFILERS)
+        + ")",
+    )
+    parser.add_argument("--profile-folder", help="folder for the profiling results")
+    arguments = parser.parse_args()
+    try:
+        configure(
+            arguments.profile and arguments.profile.split(","),
+            arguments.profile_folder,
+        )
+    except ValueError as error:
+        parser.error(str(error))
     run()
@@ -0,0 +1,141 @@
+import os
+import json
+import tarfile
+from contextlib import contextmanager
+from tempfile import mkstemp
+from src.music_library import ENCODING, BUFFER_SIZE, atomic_open
+
+INDEX_EXTENSION = ".idx.json"  # Members index file extension (next to the archive)
+COMPRESSIONS = {
+    ".tar": "",
+    ".tar.gz": "gz",
+    ".tgz": "gz",
+    ".tar.zst": "zst",
+    ".tzst": "zst",
+}  # Compression by archive file extension
+BLOCK_SIZE = tarfile.BLOCKSIZE  # Tar headers and contents are padded to blocks
+
+
+def get_compression(file_name: str) -> str:
+    """It gets the compression of an archive by its file extension.
+
+    Args:
+        file_name (str): Path to the archive file.
+
+    Returns:
+        str: Compression (see COMPRESSIONS).
+    """
+    for extension in COMPRESSIONS:
+        if file_name.endswith(extension):
+            return COMPRESSIONS[extension]
+    assert False, (
+        "Archive extension of "
+        + file_name
+        + " is not valid ("
+        + ", ".join(COMPRESSIONS)
+        + ")."
+    )
+
+
+def get_footprint(size: int) -> int:
+    """It gets the approximate bytes that a member takes in an uncompressed archive: its header and its content, padded to blocks.
+
+    Args:
+        size (int): Content size in bytes.
+
+    Returns:
+        int: Bytes in the archive.
+    """
+    return BLOCK_SIZE + -(-size // BLOCK_SIZE) * BLOCK_SIZE
+
+
+def read_index(file_name: str) -> dict:
+    """It reads the members index of an archive. If it cannot be read, there is no index.
+
+    Args:
+        file_name (str): Path to the archive file.
+
+    Returns:
+        dict: Compression, archive size, bytes of replaced or removed members ("dead") and fingerprint and content size of each member by name, or None if there is no index.
+    """
+    try:
+        with open(file_name + INDEX_EXTENSION, mode="r", encoding=ENCODING) as file:
+            index = json.load(file)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(index, dict) or not "members" in index:
+        return None
+    return index
+
+
+def write_index(file_name: str, index: dict) -> None:
+    """It writes the members index of an archive (see read_index).
+
+    Args:
+        file_name (str): Path to the archive file.
+        index (dict): Members index.
+    """
+    with atomic_open(file_name + INDEX_EXTENSION) as file:
+        json.dump(index, file, ensure_ascii=False)
+
+
+@contextmanager
+def open_archive(file_name: str, append: bool = False):
+    """It opens an archive to be written in one sequential pass. New archives are written aside and then renamed, so a broken run never replaces the previous archive. Uncompressed archives can be appended in place instead. Zstandard compression needs the zstandard package.
+
+    Args:
+        file_name (str): Path to the archive file.
+        append (bool, optional): If True, members are appended to the archive (only uncompressed). Defaults to False.
+
+    Yields:
+        TarFile: Archive object.
+    """
+    compression = get_compression(file_name)
+    if append:
+        assert not compression, "Only uncompressed archives can be appended."
+        with tarfile.open(file_name, mode="a") as archive:
+            yield archive
+        return
+    if compression == "zst":
+        import zstandard
+    folder = os.path.dirname(os.path.abspath(file_name))
+    handle, temporary = mkstemp(prefix=".", suffix=".tar", dir=folder)
+    try:
+        with open(handle, mode="wb", buffering=BUFFER_SIZE) as file:
+            if compression == "zst":
+                with zstandard.ZstdCompressor().stream_writer(
+                    file, closefd=False
+                ) as stream:
+                    with tarfile.open(fileobj=stream, mode="w|") as archive:
+                        yield archive
+            else:
+                with tarfile.open(
+                    fileobj=file, mode="w|" + compression, bufsize=BUFFER_SIZE
+                ) as archive:
+                    yield archive
+            file.flush()
+            os.fsync(file.fileno())
+        # Temporary files are only readable by their owner
+        os.chmod(temporary, 0o644)
+        os.replace(temporary, file_name)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+
+
+def add_member(archive, name: str, file, size: int, mtime: float) -> None:
+    """It adds a regular file member to an archive, copying its content from a file object.
+
+    Args:
+        archive (TarFile): Archive object.
+        name (str): Member name (path relative to the archive root).
+        file (BufferedReader): File object with the content.
+        size (int): Content size in bytes.
+        mtime (float): Modification time.
+    """
+    info = tarfile.TarInfo(name)
+    info.size = size
+    info.mtime = int(mtime)
+    info.mode = 0o644
+    archive.addfile(info, file)
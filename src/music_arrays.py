@@ -0,0 +1,211 @@
+import numpy
+from src.music_library import *
+
+NUMBERS = {
+    "id": "i8",
+    "track_number": "i4",
+    "disc_number": "i4",
+    "year": "i4",
+    "rating": "i1",
+    "play_count": "i8",
+}  # Song attributes stored as integer columns (-1 means no value)
+CATEGORIES = [
+    "artist",
+    "album_artist",
+    "album",
+    "genre",
+    "format",
+]  # Song attributes stored as codes of a list of values (-1 means no value)
+TEXTS = [
+    "title",
+    "path",
+    "location",
+]  # Song attributes that are different for most songs, stored as the length of their UTF-8 bytes in one array of all songs (-1 means no value)
+
+
+def to_arrays(library: Library) -> dict:
+    """It exports a library as NumPy arrays, so it can be analyzed with vectorized operations.
+
+    Args:
+        library (Library): Music library.
+
+    Returns:
+        dict: NumPy arrays:
+            - songs: Structured array with a column by song attribute (see NUMBERS, CATEGORIES and TEXTS).
+            - Values of each category column, by category name (e.g. artist).
+            - UTF-8 bytes of the values of each text column one after another, by text name (e.g. title).
+            - playlists_ids, playlists_names and playlists_offsets: Playlists data, and where each playlist starts in playlists_items.
+            - playlists_items: Songs rows of the playlists. Playlists of files (see playlists_files) have files codes instead.
+            - playlists_files: True for the playlists of files.
+            - files: Relative paths to songs files of the playlists of files.
+    """
+    arrays = {}
+    codes = {category: {} for category in CATEGORIES}  # Codes by value, by category
+    texts = {text: [] for text in TEXTS}  # Encoded values, by text
+    songs = numpy.empty(
+        len(library.songs),
+        dtype=[(column, NUMBERS[column]) for column in NUMBERS]
+        + [(category, "i4") for category in CATEGORIES]
+        + [(text, "i4") for text in TEXTS],
+    )
+    rows = {}  # Songs rows by song
+    for row, song in enumerate(library.songs):
+        rows[song] = row
+        record = []
+        for column in NUMBERS:
+            value = getattr(song, column)
+            record.append(-1 if value is None else value)
+        for category in CATEGORIES:
+            value = getattr(song, category)
+            if value is None:
+                record.append(-1)
+            else:
+                if not value in codes[category]:
+                    codes[category][value] = len(codes[category])
+                record.append(codes[category][value])
+        for text in TEXTS:
+            value = getattr(song, text)
+            if value is None:
+                record.append(-1)
+            else:
+                value = value.encode(ENCODING)
+                texts[text].append(value)
+                record.append(len(value))
+        songs[row] = tuple(record)
+    arrays["songs"] = songs
+    for category in CATEGORIES:
+        arrays[category] = numpy.array(list(codes[category]), dtype=str)
+    for text in TEXTS:
+        arrays[text] = numpy.frombuffer(b"".join(texts[text]), dtype="u1")
+    # Playlists
+    files = {}  # Codes by relative path to song file
+    offsets = [0]
+    items = []
+    kinds = []
+    for playlist in library.playlists:
+        if playlist.get_songs() is not None:
+            items.extend(rows[song] for song in playlist.get_songs())
+            kinds.append(False)
+        else:
+            for file in playlist.get_files():
+                if not file in files:
+                    files[file] = len(files)
+                items.append(files[file])
+            kinds.append(True)
+        offsets.append(len(items))
+    arrays["playlists_ids"] = numpy.array(
+        [playlist.id for playlist in library.playlists], dtype="i8"
+    )
+    arrays["playlists_names"] = numpy.array(
+        [playlist.name for playlist in library.playlists], dtype=str
+    )
+    arrays["playlists_offsets"] = numpy.array(offsets, dtype="i8")
+    arrays["playlists_items"] = numpy.array(items, dtype="i8")
+    arrays["playlists_files"] = numpy.array(kinds, dtype=bool)
+    arrays["files"] = numpy.array(list(files), dtype=str)
+    return arrays
+
+
+def from_arrays(arrays: dict) -> Library:
+    """It imports a library from NumPy arrays exported by to_arrays.
+
+    Args:
+        arrays (dict): NumPy arrays (see to_arrays).
+
+    Returns:
+        Library: Music library.
+    """
+    library = Library(None)
+    values = {category: arrays[category].tolist() for category in CATEGORIES}
+    texts = {text: arrays[text].tobytes() for text in TEXTS}
+    offsets = {text: 0 for text in TEXTS}  # Start of the next value, by text
+    songs = []
+    for record in arrays["songs"].tolist():
+        metadata = {}
+        for index, column in enumerate(NUMBERS):
+            if record[index] >= 0:
+                metadata[column] = record[index]
+        for index, category in enumerate(CATEGORIES, start=len(NUMBERS)):
+            if record[index] >= 0:
+                metadata[category] = values[category][record[index]]
+        for index, text in enumerate(TEXTS, start=len(NUMBERS) + len(CATEGORIES)):
+            if record[index] >= 0:
+                start = offsets[text]
+                offsets[text] += record[index]
+                metadata[text] = texts[text][start : offsets[text]].decode(ENCODING)
+        song = Song(**metadata)
+        songs.append(song)
+        library.add_song(song)
+    files = arrays["files"].tolist()
+    offsets = arrays["playlists_offsets"].tolist()
+    items = arrays["playlists_items"].tolist()
+    for index, (id, name, kind) in enumerate(
+        zip(
+            arrays["playlists_ids"].tolist(),
+            arrays["playlists_names"].tolist(),
+            arrays["playlists_files"].tolist(),
+        )
+    ):
+        rows = items[offsets[index] : offsets[index + 1]]
+        if kind:
+            playlist = Playlist(id, name, files=[files[row] for row in rows])
+        else:
+            playlist = Playlist(id, name, songs=[songs[row] for row in rows])
+        library.playlists.append(playlist)
+    return library
+
+
+def save_npz(library: Library, file_name: str) -> None:
+    """It saves a library as a NumPy .npz file, which can be quickly loaded again with load_npz.
+
+    Args:
+        library (Library): Music library.
+        file_name (str): Path to the .npz file.
+    """
+    with open(file_name, mode="wb") as file:
+        numpy.savez(file, **to_arrays(library))
+
+
+def load_npz(file_name: str) -> Library:
+    """It loads a library from a NumPy .npz file saved with save_npz.
+
+    Args:
+        file_name (str): Path to the .npz file.
+
+    Returns:
+        Library: Music library.
+    """
+    with numpy.load(file_name) as arrays:
+        library = from_arrays(arrays)
+    library.files = [file_name]
+    return library
+
+
+def count_by(arrays: dict, column: str) -> dict:
+    """It counts the songs by value of a column, with a vectorized operation.
+
+    Args:
+        arrays (dict): NumPy arrays (see to_arrays).
+        column (str): Song attribute (see NUMBERS and CATEGORIES).
+
+    Returns:
+        dict: Number of songs by value (None for songs without value).
+    """
+    assert not column in TEXTS, "Songs cannot be counted by " + column + "."
+    data = arrays["songs"][column]
+    counts = {}
+    if len(data) == 0:
+        return counts
+    if (data < 0).any():
+        counts[None] = int((data < 0).sum())
+    data = data[data >= 0]
+    if column in CATEGORIES:
+        names = arrays[column].tolist()
+        for code, count in enumerate(numpy.bincount(data, minlength=len(names))):
+            if count:
+                counts[names[code]] = int(count)
+    else:
+        values, numbers = numpy.unique(data, return_counts=True)
+        for value, count in zip(values.tolist(), numbers.tolist()):
+            counts[value] = count
+    return counts
@@ -0,0 +1,210 @@
+import plistlib
+import xml.etree.ElementTree as ElementTree
+from re import match
+from urllib.parse import unquote as url2str
+
+BINARY_HEADER = b"bplist00"  # First bytes of binary property list files
+PROTOCOL = "file://"  # URL paths to files
+HIDDEN_PLAYLISTS = [
+    "Library",
+    "Downloaded",
+    "Music",
+    "Playlists",
+    "Rating",
+]  # iTunes playlists that are not synced
+NUMBERS = {
+    "Track Number": "track_number",
+    "Disc Number": "disc_number",
+    "Year": "year",
+    "Play Count": "play_count",
+}  # Integer song metadata by iTunes key
+TEXTS = {
+    "Name": "title",
+    "Artist": "artist",
+    "Album": "album",
+    "Album Artist": "album_artist",
+    "Genre": "genre",
+}  # Text song metadata by iTunes key
+
+
+class ElementTreeBackend:
+    """Class to read iTunes XML library files with xml.etree.ElementTree. Values are kept as text."""
+
+    def __init__(self, file_name: str) -> None:
+        """Constructor for ElementTreeBackend class.
+
+        Args:
+            file_name (str): Path to the iTunes XML library file.
+        """
+        self.library = get_dict(ElementTree.parse(file_name).getroot().find("dict"))
+
+    def iter_songs(self):
+        """It iterates over the songs of the library.
+
+        Yields:
+            dict: Song ID and metadata, as arguments of Song class.
+        """
+        for track_id, track in get_dict(self.library["Tracks"]).items():
+            yield get_song_record(track_id, get_dict(track))
+
+    def iter_playlists(self):
+        """It iterates over the playlists of the library that are synced.
+
+        Yields:
+            dict: Playlist ID, name and songs IDs.
+        """
+        for playlist in self.library["Playlists"].findall("dict"):
+            playlist = get_dict(playlist)
+            if "Playlist Items" in playlist:
+                playlist["Playlist Items"] = [
+                    get_dict(item) for item in playlist["Playlist Items"]
+                ]
+            record = get_playlist_record(playlist)
+            if record is not None:
+                yield record
+
+
+class PlistBackend:
+    """Class to read iTunes library files with plistlib, both in XML and binary property list formats. Values are kept with their types."""
+
+    def __init__(self, file_name: str) -> None:
+        """Constructor for PlistBackend class.
+
+        Args:
+            file_name (str): Path to the iTunes library file.
+        """
+        with open(file_name, mode="rb") as file:
+            self.library = plistlib.load(file)
+
+    def iter_songs(self):
+        """It iterates over the songs of the library.
+
+        Yields:
+            dict: Song ID and metadata, as arguments of Song class.
+        """
+        for track_id, track in self.library.get("Tracks", {}).items():
+            yield get_song_record(track_id, track)
+
+    def iter_playlists(self):
+        """It iterates over the playlists of the library that are synced.
+
+        Yields:
+            dict: Playlist ID, name and songs IDs.
+        """
+        for playlist in self.library.get("Playlists", []):
+            record = get_playlist_record(playlist)
+            if record is not None:
+                yield record
+
+
+BACKENDS = {
+    "xml": ElementTreeBackend,
+    "plist": PlistBackend,
+}  # iTunes library readers by name
+
+
+def get_backend(file_name: str, backend: str = None):
+    """It opens an iTunes library file with a backend. If no backend is given, it is chosen by the file header: binary property lists are read with plistlib, and XML ones with xml.etree.ElementTree.
+
+    Args:
+        file_name (str): Path to the iTunes library file.
+        backend (str, optional): Backend name (see BACKENDS). Defaults to None, so it is chosen automatically.
+
+    Returns:
+        ElementTreeBackend | PlistBackend: Backend object with the library.
+    """
+    if backend is None:
+        with open(file_name, mode="rb") as file:
+            header = file.read(len(BINARY_HEADER))
+        backend = "plist" if header == BINARY_HEADER else "xml"
+    assert backend in BACKENDS, "Backend " + str(backend) + " is not valid."
+    return BACKENDS[backend](file_name)
+
+
+def get_dict(xml: ElementTree) -> dict:
+    """It returns the content of a property list dictionary tag, pairing each key tag with the tag just after it. Text values are returned as text, booleans as bool, and other values as their tags.
+
+    Args:
+        xml (ElementTree): Dictionary tag.
+
+    Returns:
+        dict: Values by key.
+    """
+    values = {}
+    children = iter(xml)
+    for key in children:
+        value = next(children, None)
+        if value is None:
+            break
+        if value.tag in ["dict", "array"]:
+            values[key.text] = value
+        elif value.tag in ["true", "false"]:
+            values[key.text] = value.tag == "true"
+        else:
+            values[key.text] = value.text
+    return values
+
+
+def get_song_record(track_id, track: dict) -> dict:
+    """It converts the metadata of an iTunes track into the arguments of Song class.
+
+    Args:
+        track_id (str | int): Track ID.
+        track (dict): Track metadata by iTunes key.
+
+    Returns:
+        dict: Song ID and metadata.
+    """
+    record = {"id": int(track_id)}
+    for key in TEXTS:
+        if track.get(key) is not None:
+            record[TEXTS[key]] = str(track[key])
+    for key in NUMBERS:
+        if track.get(key) is not None:
+            record[NUMBERS[key]] = int(track[key])
+    if track.get("Rating") is not None:
+        record["rating"] = int(int(track["Rating"]) / 20)
+    # Songs that are only in the cloud have no location
+    if track.get("Location") is not None:
+        record["format"] = track["Location"].split(".")[-1]
+        record["path"] = get_path(track["Location"])
+    return record
+
+
+def get_path(url: str) -> str:
+    """It decodes the URL of a file (as in iTunes and Rhythmbox libraries) into its path.
+
+    Args:
+        url (str): URL of the file.
+
+    Returns:
+        str: Path to the file, with / as separator (and with the drive letter on Windows).
+    """
+    path = url2str(url)
+    if path.startswith(PROTOCOL):
+        path = path[len(PROTOCOL) :]
+    if path.startswith("localhost/"):
+        path = path[len("localhost") :]
+    # Windows drive letter
+    if match(r"^/[A-Za-z]:/", path):
+        path = path[1:]
+    return path
+
+
+def get_playlist_record(playlist: dict) -> dict:
+    """It converts an iTunes playlist into a playlist record, if it is synced (see HIDDEN_PLAYLISTS) and it has songs.
+
+    Args:
+        playlist (dict): Playlist metadata by iTunes key, with the items as a list of dictionaries.
+
+    Returns:
+        dict: Playlist ID, name and songs IDs, or None if it is not synced.
+    """
+    items = playlist.get("Playlist Items")
+    if not items or playlist.get("Name") in HIDDEN_PLAYLISTS:
+        return None
+    return {
+        "id": int(playlist["Playlist ID"]),
+        "name": playlist["Name"],
+        "songs": [int(item["Track ID"]) for item in items],
+    }
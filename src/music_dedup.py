@@ -0,0 +1,109 @@
+import json
+from hashlib import sha1
+from src.music_library import BUFFER_SIZE
+
+HASH_CACHE = ".itunes-sync-hashes.json"  # Hashes cache file in the destination folder
+PARTIAL_SIZE = 1 << 16  # Bytes read from the start of the files for the partial hash
+
+
+def get_duplicates(files: dict, open_read, cache: dict) -> dict:
+    """It finds the files with identical content, grouping them by size, then by the hash of their first bytes, and then by the hash of their whole content, so only the files that can be identical are read. Files that cannot be read (or whose content is not kept, see MemoryFileSystem.open_read) are not linked. Hashes are kept in the cache, so they are only calculated again if the files change.
+
+    Args:
+        files (dict): Size and modification time of each file, by path.
+        open_read (callable): Function that opens a file by path to read its content as bytes.
+        cache (dict): Size, modification time, partial hash and full hash of each file, by path (see read_cache). It is updated with the calculated hashes.
+
+    Returns:
+        dict: Path to the first file with the same content (in the files order), by path of each file with duplicates.
+    """
+    sizes = {}  # Files paths by size
+    for path, (size, mtime) in files.items():
+        if size:  # Empty files are not worth linking
+            sizes.setdefault(size, []).append(path)
+    duplicates = {}
+    for size, paths in sizes.items():
+        if len(paths) < 2:
+            continue
+        for stage in ["partial", "full"]:
+            groups = {}  # Files paths by hash
+            for path in paths:
+                try:
+                    digest = get_hash(path, files[path], stage, open_read, cache)
+                except (OSError, ValueError):  # Unreadable files are copied as they are
+                    continue
+                groups.setdefault(digest, []).append(path)
+            groups = [group for group in groups.values() if len(group) > 1]
+            if stage == "partial":
+                paths = [path for group in groups for path in group]
+                if not paths:
+                    break
+        else:
+            for group in groups:
+                for path in group:
+                    duplicates[path] = group[0]
+    return duplicates
+
+
+def get_hash(path: str, status: tuple, stage: str, open_read, cache: dict) -> str:
+    """It gets the partial or full SHA-1 hash of a file from the cache, or calculates it if the file changed since it was cached. Files that are not bigger than the partial hash size have the same partial and full hashes.
+
+    Args:
+        path (str): Path to the file.
+        status (tuple): Size and modification time of the file.
+        stage (str): "partial" (first bytes of the file) or "full" (whole content).
+        open_read (callable): Function that opens a file by path to read its content as bytes.
+        cache (dict): Hashes cache (see read_cache).
+
+    Returns:
+        str: SHA-1 hash.
+    """
+    size, mtime = status
+    entry = cache.get(path)
+    if entry is None or entry[0] != size or entry[1] != mtime:
+        entry = [size, mtime, None, None]
+        cache[path] = entry
+    index = 2 if stage == "partial" or size <= PARTIAL_SIZE else 3
+    if entry[index] is None:
+        digest = sha1()
+        with open_read(path) as file:
+            if index == 2:
+                digest.update(file.read(PARTIAL_SIZE))
+            else:
+                for block in iter(lambda: file.read(BUFFER_SIZE), b""):
+                    digest.update(block)
+        entry[index] = digest.hexdigest()
+    return entry[index]
+
+
+def read_cache(file_name: str, open_read) -> dict:
+    """It reads the hashes cache. If it cannot be read, the cache is empty.
+
+    Args:
+        file_name (str): Path to the hashes cache JSON file.
+        open_read (callable): Function that opens a file by path to read its content as bytes.
+
+    Returns:
+        dict: Size, modification time, partial hash and full hash (or None if they were not calculated) of each file, by path.
+    """
+    try:
+        with open_read(file_name) as file:
+            cache = json.load(file)
+    except (OSError, ValueError):
+        return {}
+    return cache if isinstance(cache, dict) else {}
+
+
+def write_cache(file_name: str, cache: dict, open_write, files: dict = None) -> None:
+    """It writes the hashes cache.
+
+    Args:
+        file_name (str): Path to the hashes cache JSON file.
+        cache (dict): Hashes cache (see read_cache).
+        open_write (callable): Function that opens a text file by path to be written.
+        files (dict, optional): Files whose hashes are kept, by path. Defaults to None, so every hash is kept.
+    """
+    if files is not None:
+        cache = {path: entry for path, entry in cache.items() if path in files}
+    with open_write(file_name) as file:
+        json.dump(cache, file, ensure_ascii=False)
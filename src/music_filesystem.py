@@ -0,0 +1,434 @@
+import os
+import io
+import errno
+import posixpath
+from time import sleep, time
+from contextlib import contextmanager
+from shutil import copy2 as copy
+from shutil import rmtree as remove_tree
+from shutil import disk_usage
+from src.music_library import ENCODING, atomic_open
+
+FILE_MODE = 0o100644  # Mode of regular files in the in-memory file system
+FOLDER_MODE = 0o040755  # Mode of folders in the in-memory file system
+
+
+class LocalFileSystem:
+    """Class to access the local file system (the one used by sync processes by default)."""
+
+    def exists(self, path: str) -> bool:
+        """It checks if a file or folder exists.
+
+        Args:
+            path (str): Path to the file or folder.
+
+        Returns:
+            bool: True if it exists.
+        """
+        return os.path.exists(path)
+
+    def stat(self, path: str) -> os.stat_result:
+        """It gets the status of a file or folder.
+
+        Args:
+            path (str): Path to the file or folder.
+
+        Returns:
+            os.stat_result: File or folder status.
+        """
+        return os.stat(path)
+
+    def getsize(self, file: str) -> int:
+        """It gets the size of a file.
+
+        Args:
+            file (str): Path to the file.
+
+        Returns:
+            int: File size in bytes.
+        """
+        return os.path.getsize(file)
+
+    def listdir(self, folder: str) -> list:
+        """It lists the content of a folder.
+
+        Args:
+            folder (str): Path to the folder.
+
+        Returns:
+            list: Names of the files and folders inside.
+        """
+        return os.listdir(folder)
+
+    def scan(self, folder: str) -> dict:
+        """It gets the sizes of the files of a folder while it is listed, so there is no separate call for each file where the system gives them with the listing.
+
+        Args:
+            folder (str): Path to the folder.
+
+        Returns:
+            dict: File size in bytes and inode number (the same for hard links of a file) by name.
+        """
+        sizes = {}
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                if entry.is_file():
+                    sizes[entry.name] = (entry.stat().st_size, entry.inode())
+        return sizes
+
+    def free_space(self, folder: str) -> int:
+        """It gets the free space of the device of a folder, available to the user.
+
+        Args:
+            folder (str): Path to the folder.
+
+        Returns:
+            int: Free space in bytes.
+        """
+        if hasattr(os, "statvfs"):
+            status = os.statvfs(folder)
+            return status.f_bavail * status.f_frsize
+        return disk_usage(folder).free
+
+    def makedirs(self, folder: str) -> None:
+        """It creates a folder and its parent folders.
+
+        Args:
+            folder (str): Path to the folder.
+        """
+        os.makedirs(folder)
+
+    def copy(self, source: str, destination: str) -> None:
+        """It copies a file with its modification time.
+
+        Args:
+            source (str): Path to the source file.
+            destination (str): Path to the destination file.
+        """
+        copy(source, destination)
+
+    def link(self, source: str, destination: str) -> None:
+        """It creates a hard link to a file, so both paths share the same content.
+
+        Args:
+            source (str): Path to the existing file.
+            destination (str): Path to the new link.
+        """
+        os.link(source, destination)
+
+    def remove(self, file: str) -> None:
+        """It removes a file.
+
+        Args:
+            file (str): Path to the file.
+        """
+        os.remove(file)
+
+    def remove_tree(self, folder: str, ignore_errors: bool = False) -> None:
+        """It removes a folder and its content.
+
+        Args:
+            folder (str): Path to the folder.
+            ignore_errors (bool, optional): If True, errors are ignored. Defaults to False.
+        """
+        remove_tree(folder, ignore_errors=ignore_errors)
+
+    def open_read(self, file: str):
+        """It opens a file to read its content as bytes.
+
+        Args:
+            file (str): Path to the file.
+
+        Returns:
+            BufferedReader: File object.
+        """
+        return open(file, mode="rb")
+
+    def open_write(self, file: str):
+        """It opens a text file to be written, replacing the file only when the writing finishes (see music_library.atomic_open).
+
+        Args:
+            file (str): Path to the file.
+
+        Returns:
+            ContextManager: Context that yields the file object.
+        """
+        return atomic_open(file)
+
+
+class MemoryFileSystem:
+    """Class for a file system kept in memory, with simulated latency and bandwidth, so sync processes can be profiled without disks. Files can keep only their size (see add_file), so big libraries take little memory."""
+
+    def __init__(
+        self,
+        latency: float = 0,
+        bandwidth: float = None,
+        capacity: int = None,
+        realtime: bool = False,
+    ) -> None:
+        """Constructor for MemoryFileSystem class.
+
+        Args:
+            latency (float, optional): Seconds that each operation takes. Defaults to 0.
+            bandwidth (float, optional): Bytes per second that are copied or written. Defaults to None, so copies take no time.
+            capacity (int, optional): Size of the simulated device in bytes (see free_space). Defaults to None, so its free space is unknown.
+            realtime (bool, optional): If True, operations really wait for their simulated time. Defaults to False, so the time is only added to elapsed.
+        """
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.capacity = capacity
+        self.realtime = realtime
+        self.elapsed = 0  # Simulated seconds of all operations
+        # Size, modification time, content (None if only the size is kept) and inode number by file path
+        self.files = {}
+        self.links = {}  # Number of paths by inode number (hard links share it)
+        self.inodes = 0  # Last inode number
+        # Names of the files and folders inside, by folder path
+        self.folders = {"/": set()}
+
+    def wait(self, size: int = 0) -> None:
+        """It simulates the time that an operation takes, adding it to the elapsed time (and waiting for it in real time mode).
+
+        Args:
+            size (int, optional): Bytes that are transferred. Defaults to 0.
+        """
+        seconds = self.latency
+        if self.bandwidth:
+            seconds += size / self.bandwidth
+        self.elapsed += seconds
+        if self.realtime and seconds:
+            sleep(seconds)
+
+    def add_file(
+        self, file: str, size: int = 0, mtime: float = None, content: bytes = None
+    ) -> None:
+        """It adds a file (and its parent folders) without simulating any time, to prepare the file system.
+
+        Args:
+            file (str): Path to the file.
+            size (int, optional): File size in bytes (ignored if there is content). Defaults to 0.
+            mtime (float, optional): Modification time. Defaults to the current time.
+            content (bytes, optional): File content. Defaults to None, so only the size is kept (and the file cannot be read).
+        """
+        file = get_path(file)
+        self.add_folder(posixpath.dirname(file))
+        if content is not None:
+            size = len(content)
+        self.inodes += 1
+        self.set_file(
+            file, (size, time() if mtime is None else mtime, content, self.inodes)
+        )
+
+    def set_file(self, file: str, entry: tuple) -> None:
+        """It sets the entry of a file path, replacing the previous file, and counts the paths of its inode.
+
+        Args:
+            file (str): Normalized path to the file.
+            entry (tuple): Size, modification time, content and inode number.
+        """
+        if file in self.files:
+            self.unset_file(file)
+        self.files[file] = entry
+        self.links[entry[3]] = self.links.get(entry[3], 0) + 1
+        self.folders[posixpath.dirname(file)].add(posixpath.basename(file))
+
+    def unset_file(self, file: str) -> None:
+        """It removes the entry of a file path, and its inode when it has no other paths.
+
+        Args:
+            file (str): Normalized path to the file.
+        """
+        inode = self.files.pop(file)[3]
+        self.links[inode] -= 1
+        if not self.links[inode]:
+            del self.links[inode]
+        self.folders[posixpath.dirname(file)].discard(posixpath.basename(file))
+
+    def add_folder(self, folder: str) -> None:
+        """It adds a folder and its parent folders.
+
+        Args:
+            folder (str): Path to the folder.
+        """
+        folder = get_path(folder)
+        while not folder in self.folders:
+            if folder in self.files:
+                raise FileExistsError(errno.EEXIST, "File exists", folder)
+            self.folders[folder] = set()
+            parent = posixpath.dirname(folder)
+            if not parent in self.folders:
+                self.add_folder(parent)
+            self.folders[parent].add(posixpath.basename(folder))
+            folder = parent
+
+    def exists(self, path: str) -> bool:
+        """It checks if a file or folder exists (see LocalFileSystem.exists)."""
+        self.wait()
+        path = get_path(path)
+        return path in self.files or path in self.folders
+
+    def stat(self, path: str) -> os.stat_result:
+        """It gets the status of a file or folder (see LocalFileSystem.stat)."""
+        self.wait()
+        path = get_path(path)
+        if path in self.files:
+            size, mtime, content, inode = self.files[path]
+            return os.stat_result(
+                (
+                    FILE_MODE,
+                    inode,
+                    0,
+                    self.links[inode],
+                    0,
+                    0,
+                    size,
+                    mtime,
+                    mtime,
+                    mtime,
+                )
+            )
+        if path in self.folders:
+            return os.stat_result((FOLDER_MODE, 0, 0, 1, 0, 0, 0, 0, 0, 0))
+        raise FileNotFoundError(errno.ENOENT, "No such file or directory", path)
+
+    def getsize(self, file: str) -> int:
+        """It gets the size of a file (see LocalFileSystem.getsize)."""
+        return self.stat(file).st_size
+
+    def listdir(self, folder: str) -> list:
+        """It lists the content of a folder (see LocalFileSystem.listdir)."""
+        self.wait()
+        folder = get_path(folder)
+        if not folder in self.folders:
+            raise FileNotFoundError(errno.ENOENT, "No such file or directory", folder)
+        return list(self.folders[folder])
+
+    def scan(self, folder: str) -> dict:
+        """It gets the sizes of the files of a folder while it is listed (see LocalFileSystem.scan)."""
+        self.wait()
+        folder = get_path(folder)
+        if not folder in self.folders:
+            raise FileNotFoundError(errno.ENOENT, "No such file or directory", folder)
+        sizes = {}
+        for name in self.folders[folder]:
+            file = posixpath.join(folder, name)
+            if file in self.files:
+                sizes[name] = (self.files[file][0], self.files[file][3])
+        return sizes
+
+    def free_space(self, folder: str) -> int:
+        """It gets the free space of the simulated device: its capacity without the files sizes (hard links are counted once).
+
+        Args:
+            folder (str): Path to a folder of the device.
+
+        Returns:
+            int: Free space in bytes, or None if there is no capacity.
+        """
+        self.wait()
+        if self.capacity is None:
+            return None
+        sizes = {inode: size for size, mtime, content, inode in self.files.values()}
+        return max(self.capacity - sum(sizes.values()), 0)
+
+    def makedirs(self, folder: str) -> None:
+        """It creates a folder and its parent folders (see LocalFileSystem.makedirs)."""
+        self.wait()
+        if get_path(folder) in self.folders:
+            raise FileExistsError(errno.EEXIST, "File exists", folder)
+        self.add_folder(folder)
+
+    def copy(self, source: str, destination: str) -> None:
+        """It copies a file with its modification time, simulating the transfer time (see LocalFileSystem.copy)."""
+        source = get_path(source)
+        destination = get_path(destination)
+        if not source in self.files:
+            self.wait()
+            raise FileNotFoundError(errno.ENOENT, "No such file or directory", source)
+        if not posixpath.dirname(destination) in self.folders:
+            self.wait()
+            raise FileNotFoundError(
+                errno.ENOENT, "No such file or directory", destination
+            )
+        size, mtime, content, inode = self.files[source]
+        self.wait(size)
+        # Copies are new files, which take their own space
+        self.inodes += 1
+        self.set_file(destination, (size, mtime, content, self.inodes))
+
+    def link(self, source: str, destination: str) -> None:
+        """It creates a hard link to a file (see LocalFileSystem.link)."""
+        self.wait()
+        source = get_path(source)
+        destination = get_path(destination)
+        if (
+            not source in self.files
+            or not posixpath.dirname(destination) in self.folders
+        ):
+            raise FileNotFoundError(errno.ENOENT, "No such file or directory", source)
+        if destination in self.files or destination in self.folders:
+            raise FileExistsError(errno.EEXIST, "File exists", destination)
+        self.set_file(destination, self.files[source])
+
+    def remove(self, file: str) -> None:
+        """It removes a file (see LocalFileSystem.remove)."""
+        self.wait()
+        file = get_path(file)
+        if not file in self.files:
+            raise FileNotFoundError(errno.ENOENT, "No such file or directory", file)
+        self.unset_file(file)
+
+    def remove_tree(self, folder: str, ignore_errors: bool = False) -> None:
+        """It removes a folder and its content (see LocalFileSystem.remove_tree)."""
+        self.wait()
+        folder = get_path(folder)
+        if not folder in self.folders or folder == "/":
+            if ignore_errors:
+                return
+            raise NotADirectoryError(errno.ENOTDIR, "Not a directory", folder)
+        folders = [folder]
+        while folders:
+            path = folders.pop()
+            for name in list(self.folders[path]):
+                child = posixpath.join(path, name)
+                if child in self.folders:
+                    folders.append(child)
+                else:
+                    self.unset_file(child)
+            del self.folders[path]
+        self.folders[posixpath.dirname(folder)].discard(posixpath.basename(folder))
+
+    def open_read(self, file: str):
+        """It opens a file to read its content as bytes (see LocalFileSystem.open_read). It raises ValueError for files that only keep their size, because any made up content would be the same for files that are different (see music_dedup)."""
+        self.wait()
+        file = get_path(file)
+        if not file in self.files:
+            raise FileNotFoundError(errno.ENOENT, "No such file or directory", file)
+        size, mtime, content, inode = self.files[file]
+        if content is None:
+            raise ValueError("Content of " + file + " is not kept (see add_file)")
+        return io.BytesIO(content)
+
+    @contextmanager
+    def open_write(self, file: str):
+        """It opens a text file to be written, which is only added when the writing finishes (see LocalFileSystem.open_write)."""
+        path = get_path(file)
+        if not posixpath.dirname(path) in self.folders:
+            raise FileNotFoundError(errno.ENOENT, "No such file or directory", file)
+        buffer = io.StringIO()
+        yield buffer
+        content = buffer.getvalue().encode(ENCODING)
+        self.wait(len(content))
+        self.add_file(path, content=content)
+
+
+def get_path(path: str) -> str:
+    """It normalizes a path of the in-memory file system (absolute, with / as separator).
+
+    Args:
+        path (str): Path.
+
+    Returns:
+        str: Normalized path.
+    """
+    return posixpath.normpath(posixpath.join("/", path.replace(os.sep, "/")))
@@ -0,0 +1,161 @@
+import os
+import mmap
+import struct
+import xml.etree.ElementTree as ElementTree
+from src.music_backends import get_dict, get_song_record
+
+INDEX_EXTENSION = ".idx"  # Extension added to the library file name for its index file
+MAGIC = b"ITSIDX01"  # First bytes of index files
+# Index file header: magic, library size, modification time and number of tracks
+HEADER = struct.Struct("<8sQQQ")
+ENTRY = struct.Struct("<QQI")  # Track ID, offset and length of its dictionary
+
+
+class TrackIndex:
+    """Class to read single tracks of an iTunes XML library file without parsing all of it. The byte range of each track dictionary is kept in an index file next to the library, which is built again when the library changes."""
+
+    def __init__(self, file_name: str, index_file: str = None) -> None:
+        """Constructor for TrackIndex class.
+
+        Args:
+            file_name (str): Path to the iTunes XML library file.
+            index_file (str, optional): Path to the index file. Defaults to the library file name with INDEX_EXTENSION.
+        """
+        self.file_name = file_name
+        self.index_file = index_file or file_name + INDEX_EXTENSION
+        self.file = open(file_name, mode="rb")
+        try:
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # Empty file
+            self.map = b""
+        self.offsets = read_index(self.file_name, self.index_file)
+        if self.offsets is None:
+            self.offsets = build_index(self.map)
+            write_index(self.file_name, self.index_file, self.offsets)
+
+    def __len__(self) -> int:
+        """It gets the number of tracks."""
+        return len(self.offsets)
+
+    def __contains__(self, id: int) -> bool:
+        """It checks if a track ID is in the library."""
+        return id in self.offsets
+
+    def get_ids(self) -> list:
+        """It gets the IDs of the tracks, in the library order.
+
+        Returns:
+            list: Track IDs.
+        """
+        return list(self.offsets)
+
+    def get_track(self, id: int) -> dict:
+        """It reads a track, parsing only its byte range.
+
+        Args:
+            id (int): Track ID.
+
+        Returns:
+            dict: Song ID and metadata, as arguments of Song class, or None if the track is not in the library.
+        """
+        if not id in self.offsets:
+            return None
+        offset, length = self.offsets[id]
+        track = ElementTree.fromstring(self.map[offset : offset + length])
+        return get_song_record(id, get_dict(track))
+
+    def close(self) -> None:
+        """It closes the library file."""
+        if isinstance(self.map, mmap.mmap):
+            self.map.close()
+        self.file.close()
+
+
+def build_index(data) -> dict:
+    """It scans the Tracks dictionary of an iTunes XML library for the byte range of each track, without parsing it.
+
+    Args:
+        data (mmap.mmap | bytes): Content of the library file.
+
+    Returns:
+        dict: Offset and length of each track dictionary by track ID, in the library order.
+    """
+    offsets = {}
+    position = data.find(b"<key>Tracks</key>")
+    if position < 0:
+        return offsets
+    position = data.find(b"<dict>", position)
+    if position < 0:
+        return offsets
+    position += len(b"<dict>")
+    while True:
+        key = data.find(b"<key>", position)
+        end = data.find(b"</dict>", position)
+        # The Tracks dictionary finishes before the next key
+        if key < 0 or 0 <= end < key:
+            break
+        key += len(b"<key>")
+        id = int(data[key : data.find(b"</key>", key)])
+        start = data.find(b"<dict", key)
+        if data[start : start + len(b"<dict/>")] == b"<dict/>":
+            end = start + len(b"<dict/>")
+        else:
+            # Track dictionaries do not contain other dictionaries
+            end = data.find(b"</dict>", start) + len(b"</dict>")
+        offsets[id] = (start, end - start)
+        position = end
+    return offsets
+
+
+def read_index(file_name: str, index_file: str) -> dict:
+    """It reads the index file of an iTunes XML library, if it was built for its current version.
+
+    Args:
+        file_name (str): Path to the iTunes XML library file.
+        index_file (str): Path to the index file.
+
+    Returns:
+        dict: Offset and length of each track dictionary by track ID, or None if the index file does not exist or it is outdated.
+    """
+    status = os.stat(file_name)
+    try:
+        with open(index_file, mode="rb") as file:
+            data = file.read()
+    except OSError:
+        return None
+    if len(data) < HEADER.size:
+        return None
+    magic, size, mtime, count = HEADER.unpack_from(data)
+    if (
+        magic != MAGIC
+        or size != status.st_size
+        or mtime != status.st_mtime_ns
+        or len(data) != HEADER.size + count * ENTRY.size
+    ):
+        return None
+    offsets = {}
+    for id, offset, length in ENTRY.iter_unpack(data[HEADER.size :]):
+        offsets[id] = (offset, length)
+    return offsets
+
+
+def write_index(file_name: str, index_file: str, offsets: dict) -> None:
+    """It writes the index file of an iTunes XML library. If it cannot be written (for example, in a read-only folder), the index is only kept in memory.
+
+    Args:
+        file_name (str): Path to the iTunes XML library file.
+        index_file (str): Path to the index file.
+        offsets (dict): Offset and length of each track dictionary by track ID.
+    """
+    status = os.stat(file_name)
+    temporary = index_file + ".tmp"
+    try:
+        with open(temporary, mode="wb") as file:
+            file.write(
+                HEADER.pack(MAGIC, status.st_size, status.st_mtime_ns, len(offsets))
+            )
+            for id in offsets:
+                file.write(ENTRY.pack(id, *offsets[id]))
+        os.replace(temporary, index_file)
+    except OSError:
+        print("Index file " + index_file + " could not be written.")
@@ -1,18 +1,48 @@
 import xml.etree.ElementTree as ElementTree
 from re import sub
+from contextlib import contextmanager
+from io import open
+from os import chmod, fsync
+from os import remove as remove_file
+from os import replace as replace_file
+from os.path import abspath, basename, dirname
+from os.path import exists as file_exists
+from shutil import copymode
+from tempfile import mkstemp
+from operator import eq, ne, gt, ge, lt, le
 from html import escape as str2html
 from html import unescape as html2str
 from urllib.parse import quote as str2url
-from urllib.parse import unquote as url2str
+from src.music_backends import get_backend, get_path
+from src.music_index import TrackIndex
 
 
 SEPARATOR = "/"  # Files
+PROTOCOL = "file://"  # URL paths to files
 SPECIAL_CHARACTERS = (
     r'\/|\\|\?|\*|@|\$|€|=|:|;|~|\[|\]|{|}|<|>|\^|"|´|’'  # Special characters
 )
 SAFE_CHARACTERS = (
     ",|&|'" + SEPARATOR
 )  # Characters that will not be converted to URL format
+ENCODING = "utf-8"  # Files encoding
+BUFFER_SIZE = 1 << 16  # Write buffer size (in bytes) for streamed files
+INDEXES = [
+    "artist",
+    "album_artist",
+    "album",
+    "genre",
+    "year",
+    "rating",
+]  # Song attributes indexed in libraries
+OPERATORS = {
+    "==": eq,
+    "!=": ne,
+    ">": gt,
+    ">=": ge,
+    "<": lt,
+    "<=": le,
+}  # Comparison operators for library queries
 LANGUAGES = {
     "source": ["iTunes", "Rhythmbox"],
     "destination": ["Generic", "Rhythmbox"],
@@ -38,6 +68,8 @@ class Song:
             rating (int): Rating number (from 0 to 100). Defaults to 0.
             play_count (int): User play count. Defaults to 0.
             format (str): File format extension. Defaults to mp3.
+            location (str): Absolute file path to the song file, if it is not in the source music folder (see music_merge). Defaults to None.
+            path (str): File path in the library, relative to the music folder that contains its artist folder (see get_relative_path). Defaults to None, so it is built from the metadata.
         """
         assert type(id) is int and id >= 0, "Song ID must be a positive integer number."
         self.id = id
@@ -52,6 +84,8 @@ class Song:
         self.rating = 0
         self.play_count = 0
         self.format = "mp3"
+        self.location = None
+        self.path = None
         for key in metadata:
             if metadata[key] is not None:
                 if key == "rating":
@@ -177,17 +211,32 @@ class Playlist:
         Returns:
             int: Number of songs in the playlist.
         """
-        return len(self._Playlist__songs or self._Playlist__files)
+        if self._Playlist__songs is not None:
+            return len(self._Playlist__songs)
+        return len(self._Playlist__files)
 
-    def get_files(self, folder: str = None) -> list:
+    def get_files(self, folder: str = None, formats: dict = None) -> list:
         """It gets all file paths to songs in the playlist as a list object.
 
         Args:
             folder (str, optional): Music folder path. If no value is given, it returns as relative file paths. Defaults to None.
+            formats (dict, optional): File format extension of the songs files by their own format (for transcoded songs). Defaults to None.
 
         Returns:
             list: List of file paths to songs files in the playlist.
         """
+        return list(self.iter_files(folder, formats))
+
+    def iter_files(self, folder: str = None, formats: dict = None):
+        """It yields the file paths to songs in the playlist one by one, so no list is built for long playlists.
+
+        Args:
+            folder (str, optional): Music folder path. If no value is given, it yields relative file paths. Defaults to None.
+            formats (dict, optional): File format extension of the songs files by their own format (for transcoded songs). Defaults to None.
+
+        Yields:
+            str: File path to a song file in the playlist.
+        """
         if folder:
             if folder[-1] != SEPARATOR:
                 folder += SEPARATOR
@@ -195,57 +244,68 @@ class Playlist:
             folder = ""
         # Songs
         if not self.get_songs() is None:
-            files = []
             for song in self.get_songs():
-                files.append(folder + get_file_path(song))
+                yield folder + get_file_path(
+                    song, format=get_format(song.format, formats)
+                )
         # Files
         elif not self.__files is None:
-            files = []
             for file in self.__files:
-                files.append(folder + file)
-        return files
+                yield folder + replace_format(file, formats)
 
-    def get_urls(self, folder: str) -> list:
+    def get_urls(self, folder: str, formats: dict = None) -> list:
         """It gets all URL paths to songs in the playlist as a list object.
 
         Args:
             folder (str): Music folder path.
+            formats (dict, optional): File format extension of the songs files by their own format (for transcoded songs). Defaults to None.
 
         Returns:
             list: List of URL paths to songs files in the playlist.
         """
-        PROTOCOL = "file://"
+        return list(self.iter_urls(folder, formats))
+
+    def iter_urls(self, folder: str, formats: dict = None):
+        """It yields the URL paths to songs in the playlist one by one, so no list is built for long playlists.
+
+        Args:
+            folder (str): Music folder path.
+            formats (dict, optional): File format extension of the songs files by their own format (for transcoded songs). Defaults to None.
+
+        Yields:
+            str: URL path to a song file in the playlist.
+        """
         if folder[-1] != SEPARATOR:
             folder += SEPARATOR
         # Songs
         if not self.get_songs() is None:
-            urls = []
             for song in self.get_songs():
-                urls.append(
-                    PROTOCOL
-                    + sub(
-                        r"&",
-                        "&amp;",
-                        str2url(folder + get_file_path(song), safe=SAFE_CHARACTERS),
-                    )
-                )
+                yield get_url(song, folder, get_format(song.format, formats))
         # Files
         elif not self.__files is None:
-            urls = []
             for file in self.__files:
-                urls.append(PROTOCOL + str2url(folder + file, safe=SAFE_CHARACTERS))
-        return urls
+                yield PROTOCOL + str2url(
+                    folder + replace_format(file, formats), safe=SAFE_CHARACTERS
+                )
 
 
 class Library:
     """Class for music library."""
 
-    def __init__(self, files: list = [], language: str = "iTunes") -> None:
+    def __init__(
+        self,
+        files: list = [],
+        language: str = "iTunes",
+        backend: str = None,
+        lazy: bool = False,
+    ) -> None:
         """Constructor for Library class.
 
         Args:
             files (list, optional): File name of the music library XML files. Defaults to empty list, so an empty library is created.
             language (str, optional): Library language for the XML files. Defaults to 'iTunes'.
+            backend (str, optional): Reader of iTunes library files (see music_backends.BACKENDS). Defaults to None, so it is chosen by the file header (binary property lists are supported too).
+            lazy (bool, optional): If True, songs of iTunes XML libraries are only read when they are requested (see get_song and load_songs), parsing their byte ranges (see music_index.TrackIndex), and playlists are not read. Defaults to False.
         """
 
         def get_property(xml: ElementTree, key: str) -> ElementTree:
@@ -261,76 +321,73 @@ class Library:
             if xml.find(key) is not None:
                 return xml.find(key).text
 
-        def get_section(xml: ElementTree, key: str) -> ElementTree:
-            """It returns the XML tag just after a key tag which includes a key value inside.
-
-            Args:
-                xml (ElementTree): XML content.
-                key (str): Key tag name that refers the XML section to be returned.
-
-            Returns:
-                ElementTree: XML section inside the XML content to be returned.
-            """
-            for index, value in enumerate(xml.findall("key")):
-                if value.text == key:
-                    return xml[2 * index + 1]
-
-        def get_metadata(xml: ElementTree, key: str) -> str:
-            """It returns the metadata value defined just after a key tag included in a song metadata of a iTunes XML header.
-
-            Args:
-                xml (ElementTree): XML content.
-                key (str): Key tag name that refers the metadata to be returned.
-
-            Returns:
-                str: metadata value inside the XML content to be returned.
-            """
-            value = get_section(xml, key)
-            if value is not None:
-                return value.text
-
         self.songs = []  # List of songs (objects of Song class)
         self.playlists = []  # List of playlists (objects of Playlist class)
         self.files = files
-        if self.files is not None:
-            if language == "iTunes":
-                library = read_XML(self.files[0])
+        self.language = language
+        self.__ids = {}  # Songs by ID
+        self.__paths = {}  # Songs by path, relative to their music folder
+        self.__indexes = {
+            attribute: {} for attribute in INDEXES
+        }  # Sets of songs by attribute value, by song attribute
+        self.__tracks = None  # Track index of lazy libraries
+        if self.files:
+            if language == "iTunes" and lazy:
+                self.__tracks = TrackIndex(self.files[0])
+            elif language == "iTunes":
+                library = get_backend(self.files[0], backend)
+                # Songs
+                for record in library.iter_songs():
+                    if record.get("path") is not None:
+                        record["path"] = get_relative_path(record["path"])
+                    self.add_song(Song(**record))
+                # Playlists
+                for record in library.iter_playlists():
+                    self.playlists.append(
+                        Playlist(
+                            record["id"],
+                            record["name"],
+                            songs=[self.get_song(id) for id in record["songs"]],
+                        )
+                    )
+            elif language == "Rhythmbox":
                 # Songs
-                songs = get_section(library.getroot().find("dict"), "Tracks")
-                ids = songs.findall("key")
-                songs = songs.findall("dict")
-                for song, song_id in enumerate(ids):
-                    title = get_metadata(songs[song], "Name")
-                    artist = get_metadata(songs[song], "Artist")
-                    album = get_metadata(songs[song], "Album")
-                    album_artist = get_metadata(songs[song], "Album Artist")
-                    track_number = get_metadata(songs[song], "Track Number")
+                songs = [
+                    (song_id, song)
+                    for song_id, song in enumerate(
+                        read_XML(self.files[0]).getroot().findall("entry")
+                    )
+                    if song.attrib["type"] == "song"
+                ]
+                for song_id, song in songs:
+                    title = get_property(song, "title")
+                    artist = get_property(song, "artist")
+                    album = get_property(song, "album")
+                    track_number = get_property(song, "track-number")
                     if track_number is not None:
                         track_number = int(track_number)
-                    disc_number = get_metadata(songs[song], "Disc Number")
+                    disc_number = get_property(song, "disc-number")
                     if disc_number is not None:
                         disc_number = int(disc_number)
-                    year = get_metadata(songs[song], "Year")
-                    if year is not None:
-                        year = int(year)
-                    genre = get_metadata(songs[song], "Genre")
-                    rating = get_metadata(songs[song], "Rating")
+                    genre = get_property(song, "genre")
+                    rating = get_property(song, "rating")
                     if rating is not None:
-                        rating = int(int(rating) / 20)
-                    play_count = get_metadata(songs[song], "Play Count")
+                        rating = int(rating)
+                    play_count = get_property(song, "play-count")
                     if play_count is not None:
                         play_count = int(play_count)
-                    format = get_metadata(songs[song], "Location").split(".")[-1]
-                    self.songs.append(
+                    format = get_property(song, "location").split(".")[-1]
+                    self.add_song(
                         Song(
-                            id=int(song_id.text),
+                            id=int(song_id),
+                            path=get_relative_path(
+                                get_path(get_property(song, "location"))
+                            ),
                             title=title,
                             artist=artist,
                             album=album,
-                            album_artist=album_artist,
                             track_number=track_number,
                             disc_number=disc_number,
-                            year=year,
                             genre=genre,
                             rating=rating,
                             play_count=play_count,
@@ -338,68 +395,6 @@ class Library:
                         )
                     )
                 # Playlists
-                playlists = get_section(
-                    library.getroot().find("dict"), "Playlists"
-                ).findall("dict")
-                for song, playlist in enumerate(playlists):
-                    items = get_section(playlist, "Playlist Items")
-                    if items:
-                        playlist_name = get_metadata(playlist, "Name")
-                        if not playlist_name in [
-                            "Library",
-                            "Downloaded",
-                            "Music",
-                            "Playlists",
-                            "Rating",
-                        ]:
-                            playlist_id = int(get_metadata(playlist, "Playlist ID"))
-                            playlist_songs = []  # Playlist songs
-                            songs = items.findall("dict")
-                            for song in songs:
-                                song_id = int(get_metadata(song, "Track ID"))  # Song ID
-                                playlist_songs.append(self.get_song(song_id))
-                            self.playlists.append(
-                                Playlist(
-                                    playlist_id, playlist_name, songs=playlist_songs
-                                )
-                            )
-            elif language == "Rhythmbox":
-                # Songs
-                songs = read_XML(self.files[0]).getroot().findall("entry")
-                for song_id, song in enumerate(songs):
-                    if song.attrib["type"] == "song":
-                        title = get_property(song, "title")
-                        artist = get_property(song, "artist")
-                        album = get_property(song, "album")
-                        track_number = get_property(song, "track-number")
-                        if track_number is not None:
-                            track_number = int(track_number)
-                        disc_number = get_property(song, "disc-number")
-                        if disc_number is not None:
-                            disc_number = int(disc_number)
-                        genre = get_property(song, "genre")
-                        rating = get_property(song, "rating")
-                        if rating is not None:
-                            rating = int(rating)
-                        play_count = get_property(song, "play-count")
-                        if play_count is not None:
-                            play_count = int(play_count)
-                        format = get_property(song, "location").split(".")[-1]
-                        self.songs.append(
-                            Song(
-                                id=int(song_id),
-                                title=title,
-                                artist=artist,
-                                album=album,
-                                track_number=track_number,
-                                disc_number=disc_number,
-                                genre=genre,
-                                rating=rating,
-                                play_count=play_count,
-                                format=format,
-                            )
-                        )
-                # Playlists
                 playlists = read_XML(self.files[1]).getroot().findall("playlist")
                 for playlist in playlists:
                     playlist_name = html2str(playlist.attrib["name"])
@@ -407,13 +402,57 @@ class Library:
                     playlist_songs = []
                     songs = playlist.findall("location")
                     for song in songs:
-                        playlist_songs.append(
-                            SEPARATOR.join(url2str(song.text).split(SEPARATOR)[-3:])
+                        path = get_path(song.text)
+                        song = self.get_song_by_path(get_relative_path(path))
+                        if song is not None:
+                            playlist_songs.append(song)
+                            continue
+                        print(
+                            "Song of playlist "
+                            + playlist_name
+                            + " not found ("
+                            + path
+                            + ")"
                         )
                     self.playlists.append(
-                        Playlist(playlist_id, playlist_name, files=playlist_songs)
+                        Playlist(playlist_id, playlist_name, songs=playlist_songs)
                     )
 
+    def add_song(self, song: Song) -> None:
+        """It adds a Song object to the library and to its indexes.
+
+        Args:
+            song (Song): Song object.
+        """
+        self.songs.append(song)
+        self._Library__ids[song.id] = song
+        if song.path is not None:
+            self._Library__paths[song.path] = song
+        for attribute in INDEXES:
+            index = self._Library__indexes[attribute]
+            value = getattr(song, attribute)
+            if not value in index:
+                index[value] = set()
+            index[value].add(song)
+
+    def remove_song(self, song: Song) -> None:
+        """It removes a Song object from the library and from its indexes.
+
+        Args:
+            song (Song): Song object to be removed from the library.
+        """
+        self.songs.remove(song)
+        if self._Library__ids.get(song.id) is song:
+            del self._Library__ids[song.id]
+        if song.path is not None and self._Library__paths.get(song.path) is song:
+            del self._Library__paths[song.path]
+        for attribute in INDEXES:
+            index = self._Library__indexes[attribute]
+            value = getattr(song, attribute)
+            index[value].discard(song)
+            if not index[value]:
+                del index[value]
+
     def get_song(self, id: int) -> Song:
         """It gets a Song object specified by its ID number in the library.
 
@@ -423,9 +462,46 @@ class Library:
         Returns:
             Song: Song object.
         """
-        for song in self.songs:
-            if song.id == id:
-                return song
+        song = self._Library__ids.get(id)
+        if song is None and self._Library__tracks is not None:
+            songs = self.load_songs([id])
+            if songs:
+                song = songs[0]
+        return song
+
+    def get_song_by_path(self, path: str) -> Song:
+        """It gets a Song object specified by its file path in the library.
+
+        Args:
+            path (str): File path, relative to the music folder of the song (see get_relative_path).
+
+        Returns:
+            Song: Song object.
+        """
+        return self._Library__paths.get(path)
+
+    def load_songs(self, ids: list) -> list:
+        """It reads songs of a lazy library from the library file, if they have not been read yet.
+
+        Args:
+            ids (list): ID numbers of the songs.
+
+        Returns:
+            list: Song objects of the IDs that are in the library.
+        """
+        songs = []
+        for id in ids:
+            song = self._Library__ids.get(id)
+            if song is None and self._Library__tracks is not None:
+                record = self._Library__tracks.get_track(id)
+                if record is not None:
+                    if record.get("path") is not None:
+                        record["path"] = get_relative_path(record["path"])
+                    song = Song(**record)
+                    self.add_song(song)
+            if song is not None:
+                songs.append(song)
+        return songs
 
     def get_artists_number(self) -> int:
         """It gets the number of artists in the library.
@@ -433,10 +509,7 @@ class Library:
         Returns:
             int: Number of artists.
         """
-        artists = set()
-        for song in self.songs:
-            artists.add(song.artist)
-        return len(artists)
+        return len(self._Library__indexes["artist"])
 
     def get_albums_number(self) -> int:
         """It gets the number of albums in the library.
@@ -444,10 +517,104 @@ class Library:
         Returns:
             int: Number of albums.
         """
-        albums = set()
-        for song in self.songs:
-            albums.add(song.album)
-        return len(albums)
+        return len(self._Library__indexes["album"])
+
+    def get_counts(self, attribute: str) -> dict:
+        """It gets the number of songs for each value of an indexed song attribute.
+
+        Args:
+            attribute (str): Song attribute (see INDEXES).
+
+        Returns:
+            dict: Number of songs by attribute value.
+        """
+        index = self._Library__indexes[attribute]
+        return {value: len(index[value]) for value in index}
+
+    def query(self, **conditions) -> list:
+        """It gets the songs that meet all conditions on indexed song attributes, by intersecting the indexes instead of checking every song. For example, library.query(genre={"Rock", "Pop"}, rating=(">=", 4)).
+
+        Args:
+            conditions: Condition by song attribute (see INDEXES). It can be a set or list of accepted values, a tuple with a comparison operator (see OPERATORS) and a value, or a single accepted value.
+
+        Returns:
+            list: Songs that meet all conditions, sorted by ID.
+        """
+        results = []
+        for attribute in conditions:
+            assert attribute in INDEXES, (
+                "Song attribute " + attribute + " is not indexed."
+            )
+            index = self._Library__indexes[attribute]
+            condition = conditions[attribute]
+            songs = set()
+            if type(condition) in [set, frozenset, list]:
+                for value in condition:
+                    songs.update(index.get(value, ()))
+            elif (
+                type(condition) is tuple
+                and len(condition) == 2
+                and condition[0] in OPERATORS
+            ):
+                operator = OPERATORS[condition[0]]
+                for value in index:
+                    if value is not None and operator(value, condition[1]):
+                        songs.update(index[value])
+            else:
+                songs.update(index.get(condition, ()))
+            results.append(songs)
+        if not results:
+            return list(self.songs)
+        # Smallest sets first, so the intersection is as cheap as possible
+        results.sort(key=len)
+        songs = results[0]
+        for result in results[1:]:
+            songs = songs & result
+        return sorted(songs, key=lambda song: song.id)
+
+    def select(self, **conditions) -> "Library":
+        """It gets a new library with only the songs that meet all conditions (see query), and its playlists with only those songs.
+
+        Args:
+            conditions: Condition by song attribute (see query).
+
+        Returns:
+            Library: Library with the selected songs.
+        """
+        return self.get_subset(self.query(**conditions))
+
+    def get_subset(self, songs: list) -> "Library":
+        """It gets a new library with only the given songs, and its playlists with only those songs.
+
+        Args:
+            songs (list): Songs of the library to be kept.
+
+        Returns:
+            Library: Library with the given songs.
+        """
+        library = Library(None, language=self.language)
+        library.files = self.files
+        for song in songs:
+            library.add_song(song)
+        selected = set(songs)
+        files = None  # Relative paths to selected songs files (only needed by playlists of files)
+        for playlist in self.playlists:
+            if playlist.get_songs() is not None:
+                playlist = Playlist(
+                    playlist.id,
+                    playlist.name,
+                    songs=[song for song in playlist.get_songs() if song in selected],
+                )
+            else:
+                if files is None:
+                    files = {get_file_path(song) for song in songs}
+                playlist = Playlist(
+                    playlist.id,
+                    playlist.name,
+                    files=[file for file in playlist.get_files() if file in files],
+                )
+            library.playlists.append(playlist)
+        return library
 
     def get_playlist(self, name: str) -> Playlist:
         """It gets a Playlist object specified by its name in the library.
@@ -506,16 +673,19 @@ def get_folder_path(song: Song, shortened: bool = False) -> str:
     return artist + SEPARATOR + album
 
 
-def get_file_path(song: Song, shortened: bool = False) -> str:
+def get_file_path(song: Song, shortened: bool = False, format: str = None) -> str:
     """It gets the relative path of the song file according to its metadata.
 
     Args:
         song (Song): Object of Song class containing all metadata.
         shortened (bool, optional): If True, the path is shortened to 40 characters each directory level (it is necessary on Windows). Defaults to False.
+        format (str, optional): File format extension instead of the song one (for transcoded songs). Defaults to None.
 
     Returns:
         str: Path name to the song file, relative to the music folder.
     """
+    if format is None:
+        format = song.format
     # Disc number
     disc_number = ""
     if song.disc_number is not None:
@@ -529,17 +699,78 @@ def get_file_path(song: Song, shortened: bool = False) -> str:
     file_path = disc_number + track_number + song.title
     # Shortened directory
     if shortened:
-        file_path = file_path[: (40 - len(song.format) - 1)]
+        file_path = file_path[: (40 - len(format) - 1)]
         if file_path[-1] == " ":
             file_path = file_path[:-1]
     # Title without special characters
-    file_path = sub(
-        r"^\.", "_", replace_special_characters(file_path) + "." + song.format
-    )
+    file_path = sub(r"^\.", "_", replace_special_characters(file_path) + "." + format)
     # Full file path
     return get_folder_path(song, shortened) + SEPARATOR + file_path
 
 
+def get_url(song: Song, folder: str, format: str = None) -> str:
+    """It gets the URL path of the song file according to its metadata, escaped to be written in XML files.
+
+    Args:
+        song (Song): Object of Song class containing all metadata.
+        folder (str): Music folder path.
+        format (str, optional): File format extension instead of the song one (for transcoded songs). Defaults to None.
+
+    Returns:
+        str: URL path to the song file.
+    """
+    if folder[-1] != SEPARATOR:
+        folder += SEPARATOR
+    return PROTOCOL + sub(
+        r"&",
+        "&amp;",
+        str2url(folder + get_file_path(song, format=format), safe=SAFE_CHARACTERS),
+    )
+
+
+def get_format(format: str, formats: dict = None) -> str:
+    """It gets the file format extension of a song file once it is transcoded.
+
+    Args:
+        format (str): File format extension of the song.
+        formats (dict, optional): Transcoded file format extension by song file format. Defaults to None.
+
+    Returns:
+        str: Transcoded file format extension, or None if the song is not transcoded.
+    """
+    if formats:
+        return formats.get(format)
+    return None
+
+
+def replace_format(file: str, formats: dict = None) -> str:
+    """It replaces the file format extension of a song file path by its transcoded one.
+
+    Args:
+        file (str): Path to the song file.
+        formats (dict, optional): Transcoded file format extension by song file format. Defaults to None.
+
+    Returns:
+        str: Path to the transcoded song file.
+    """
+    format = get_format(file.split(".")[-1], formats)
+    if format is None or not "." in file:
+        return file
+    return file[: file.rindex(".") + 1] + format
+
+
+def get_relative_path(path: str) -> str:
+    """It gets the path to a song file relative to its music folder: the folder that contains its artist folder (songs files are in artist and album folders). Each song is resolved on its own, so songs stored somewhere else do not change the paths of the other songs.
+
+    Args:
+        path (str): Path to the song file, with / as separator.
+
+    Returns:
+        str: Artist folder, album folder and file name of the song file.
+    """
+    return SEPARATOR.join(path.split(SEPARATOR)[-3:])
+
+
 def read_XML(file_name: str) -> ElementTree:
     """It reads a XML file and returns a xml.etree.ElementTree.ElementTree object with the XML content.
 
@@ -553,3 +784,36 @@ def read_XML(file_name: str) -> ElementTree:
     xml = ElementTree.parse(file_name)
     file.close()
     return xml
+
+
+@contextmanager
+def atomic_open(file_name: str, encoding: str = ENCODING):
+    """It opens a temporary text file next to the given file for writing, and it replaces the given file with it only when the writing finishes without errors. So the given file is never left half written.
+
+    Args:
+        file_name (str): Path to the file to be written.
+        encoding (str, optional): File encoding. Defaults to UTF-8.
+
+    Yields:
+        TextIOWrapper: Buffered file object to write into.
+    """
+    handle, temporary = mkstemp(
+        prefix="." + basename(file_name) + ".",
+        suffix=".tmp",
+        dir=dirname(abspath(file_name)),
+    )
+    try:
+        with open(handle, mode="w", encoding=encoding, buffering=BUFFER_SIZE) as file:
+            yield file
+            file.flush()
+            fsync(file.fileno())
+        # Keep the permissions of the replaced file (temporary files are only readable by the owner)
+        if file_exists(file_name):
+            copymode(file_name, temporary)
+        else:
+            chmod(temporary, 0o644)
+        replace_file(temporary, file_name)
+    except BaseException:
+        if file_exists(temporary):
+            remove_file(temporary)
+        raise
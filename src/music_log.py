@@ -0,0 +1,191 @@
+import os
+import json
+from time import time
+from queue import Queue, Empty
+from threading import Thread
+from collections import deque
+from src.music_library import ENCODING, BUFFER_SIZE
+
+try:
+    from fcntl import flock, LOCK_EX, LOCK_UN
+except ImportError:  # Windows
+    flock = None
+
+CATEGORIES = [
+    "copy",
+    "link",
+    "transcode",
+    "skip",
+    "remove",
+    "error",
+]  # Events categories of a sync process
+RING_SIZE = 1000  # Last events kept in memory for each category
+QUEUE_SIZE = 10000  # Events waiting to be written (adding events waits if it is full)
+BATCH_SIZE = 1000  # Maximum number of events written at once
+
+
+class EventLog:
+    """Class for the events of a sync process (copied, linked, transcoded, skipped and removed files, and errors). Events are written as they happen to an append-only JSON lines file by a background thread, and memory is bounded: only the events counters by category and the last events of each category are kept. Skipped files are only counted (see count), so syncs without changes do not make the file grow."""
+
+    def __init__(self, file_name: str = None, ring_size: int = RING_SIZE) -> None:
+        """Constructor for EventLog class.
+
+        Args:
+            file_name (str, optional): Path to the JSON lines file, where events are appended. Defaults to None, so events are only kept in memory.
+            ring_size (int, optional): Last events kept in memory for each category. Defaults to RING_SIZE.
+        """
+        self.file_name = file_name
+        self.counters = {category: 0 for category in CATEGORIES}
+        self.ring_size = ring_size
+        self.recent = {category: deque(maxlen=ring_size) for category in CATEGORIES}
+        self.offset = 0  # Size of the file before this log, where its events start
+        self.__queue = None
+        self.__thread = None
+        self.__handle = None
+        if file_name:
+            # Lines are appended with the file locked, so several processes can share it
+            self.__handle = os.open(
+                file_name, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644
+            )
+            self.offset = os.fstat(self.__handle).st_size
+            self.__queue = Queue(maxsize=QUEUE_SIZE)
+            self.__thread = Thread(target=self.__write, daemon=True)
+            self.__thread.start()
+
+    def add(self, category: str, **fields) -> None:
+        """It adds an event.
+
+        Args:
+            category (str): Event category (see CATEGORIES).
+            fields: Event data, as JSON values.
+        """
+        event = {"time": time(), "event": category, **fields}
+        self.counters[category] = self.counters.get(category, 0) + 1
+        if not category in self.recent:
+            self.recent[category] = deque(maxlen=self.ring_size)
+        self.recent[category].append(event)
+        if self.__queue is not None:
+            self.__queue.put(event)
+
+    def count(self, category: str) -> None:
+        """It counts an event without keeping it, for events that happen for most songs in every sync (such as up to date files).
+
+        Args:
+            category (str): Event category (see CATEGORIES).
+        """
+        self.counters[category] = self.counters.get(category, 0) + 1
+
+    def merge(self, counters: dict, events: list) -> None:
+        """It merges the counters and the last events of another log (for example, of a worker process that wrote its events to the same file).
+
+        Args:
+            counters (dict): Events counters by category.
+            events (list): Last events.
+        """
+        for category, number in counters.items():
+            self.counters[category] = self.counters.get(category, 0) + number
+        for event in events:
+            if not event["event"] in self.recent:
+                self.recent[event["event"]] = deque(maxlen=self.ring_size)
+            self.recent[event["event"]].append(event)
+
+    def get_recent(self) -> list:
+        """It gets the last events kept in memory.
+
+        Returns:
+            list: Last events of every category, sorted by time.
+        """
+        events = [event for ring in self.recent.values() for event in ring]
+        return sorted(events, key=lambda event: event["time"])
+
+    def iter_events(self, category: str = None):
+        """It iterates over the events of this log, reading them from the file (or from memory if there is no file, so only the last ones).
+
+        Args:
+            category (str, optional): Event category. Defaults to None, so events of every category are returned.
+
+        Yields:
+            dict: Event data.
+        """
+        if not self.file_name:
+            events = self.recent.get(category, []) if category else self.get_recent()
+            yield from list(events)
+            return
+        self.flush()
+        with open(
+            self.file_name, mode="rb", buffering=BUFFER_SIZE
+        ) as file:  # Bytes, so the offset is exact
+            file.seek(self.offset)
+            for line in file:
+                try:
+                    event = json.loads(line.decode(ENCODING))
+                except ValueError:  # Lines of a process that broke
+                    continue
+                if category is None or event.get("event") == category:
+                    yield event
+
+    def get_summary(self) -> str:
+        """It gets a summary of the events counters.
+
+        Returns:
+            str: Summary text.
+        """
+        return (
+            str(self.counters["copy"] + self.counters["transcode"])
+            + " song(s) copied, "
+            + str(self.counters["link"])
+            + " linked, "
+            + str(self.counters["skip"])
+            + " up to date, "
+            + str(self.counters["remove"])
+            + " removed and "
+            + str(self.counters["error"])
+            + " error(s)"
+        )
+
+    def flush(self) -> None:
+        """It waits until the added events are written."""
+        if self.__queue is not None:
+            self.__queue.join()
+
+    def close(self) -> None:
+        """It writes the remaining events and closes the file."""
+        if self.__thread is None:
+            return
+        self.__queue.put(None)
+        self.__thread.join()
+        os.close(self.__handle)
+        self.__thread = None
+        self.__queue = None
+
+    def __write(self) -> None:
+        """It writes the events as they are added, with the events that are already waiting written together (in the background thread)."""
+        closed = False
+        while not closed:
+            events = [self.__queue.get()]
+            while len(events) < BATCH_SIZE and events[-1] is not None:
+                try:
+                    events.append(self.__queue.get_nowait())
+                except Empty:
+                    break
+            number = len(events)
+            if events[-1] is None:
+                closed = True
+                events.pop()
+            data = "".join(
+                json.dumps(event, ensure_ascii=False) + "\n" for event in events
+            ).encode(ENCODING)
+            try:
+                # Writes can be partial, so other processes must wait for the whole batch
+                if flock:
+                    flock(self.__handle, LOCK_EX)
+                try:
+                    while data:
+                        data = data[os.write(self.__handle, data) :]
+                finally:
+                    if flock:
+                        flock(self.__handle, LOCK_UN)
+            except OSError as error:
+                print("Events could not be written (" + str(error) + ")")
+            for event in range(number):
+                self.__queue.task_done()
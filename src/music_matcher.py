@@ -0,0 +1,146 @@
+import unicodedata
+from re import sub
+from difflib import SequenceMatcher
+
+FEATURING = (
+    r"[\(\[]?\b(feat|ft|featuring)\b\.?.*$"  # Featured artists at the end of a tag
+)
+STOPWORDS = {"the", "a", "an", "and", "of", "el", "la", "los", "las", "le", "les"}
+MAX_BLOCK_SIZE = 1000  # Blocks with more songs are too generic to find candidates
+WEIGHTS = {"artist": 0.3, "album": 0.2, "title": 0.5}  # Score weight of each tag
+
+
+class Matcher:
+    """Class to find the songs of a library that are the most similar to a given song, even if their tags are written differently.
+
+    Songs are grouped in blocks by each pair of artist and title words, so only the songs that share a block with the given song are compared.
+    """
+
+    def __init__(self) -> None:
+        """Constructor for Matcher class."""
+        self.songs = []  # Normalized artist, album and title, and the related item
+        self.blocks = {}  # Songs indexes by block key
+
+    def add(self, artist: str, album: str, title: str, item=None) -> None:
+        """It adds a song to the matcher.
+
+        Args:
+            artist (str): Artist name.
+            album (str): Album name.
+            title (str): Song title.
+            item (optional): Object returned when the song is matched. Defaults to None.
+        """
+        song = (normalize(artist), normalize(album), normalize(title), item)
+        index = len(self.songs)
+        self.songs.append(song)
+        for key in get_blocks(song[0], song[2]):
+            if not key in self.blocks:
+                self.blocks[key] = []
+            self.blocks[key].append(index)
+
+    def match(
+        self, artist: str, album: str, title: str, limit: int = 5, threshold: float = 0
+    ) -> list:
+        """It returns the songs that are the most similar to the given one.
+
+        Args:
+            artist (str): Artist name.
+            album (str): Album name.
+            title (str): Song title.
+            limit (int, optional): Maximum number of songs to be returned. Defaults to 5.
+            threshold (float, optional): Minimum score (from 0 to 1) of the returned songs. Defaults to 0.
+
+        Returns:
+            list: Score (from 0 to 1) and item of the matched songs, from the highest score to the lowest one.
+        """
+        artist = normalize(artist)
+        album = normalize(album)
+        title = normalize(title)
+        candidates = set()
+        for key in get_blocks(artist, title):
+            block = self.blocks.get(key, [])
+            if len(block) <= MAX_BLOCK_SIZE:
+                candidates.update(block)
+        matches = []
+        for index in candidates:
+            song = self.songs[index]
+            score = get_score((artist, album, title), song[:3])
+            if score >= threshold:
+                matches.append((score, index))
+        matches.sort(key=lambda match: (-match[0], match[1]))
+        return [(score, self.songs[index][3]) for score, index in matches[:limit]]
+
+
+def normalize(text: str) -> str:
+    """It normalizes a song tag to be compared: lowercase, without accents, punctuation, featured artists nor repeated whitespaces.
+
+    Args:
+        text (str): Song tag.
+
+    Returns:
+        str: Normalized song tag.
+    """
+    if text is None:
+        return ""
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(
+        character for character in text if not unicodedata.combining(character)
+    )
+    text = text.lower().replace("&", " and ")
+    text = sub(FEATURING, "", text)
+    text = sub(r"[^\w\s]|_", " ", text)
+    return " ".join(text.split())
+
+
+def get_words(text: str) -> set:
+    """It gets the significant words of a normalized song tag (all of them if there are only stopwords).
+
+    Args:
+        text (str): Normalized song tag.
+
+    Returns:
+        set: Words.
+    """
+    words = set(text.split())
+    return (words - STOPWORDS) or words or {""}
+
+
+def get_blocks(artist: str, title: str) -> set:
+    """It gets the block keys of a song.
+
+    Args:
+        artist (str): Normalized artist name.
+        title (str): Normalized song title.
+
+    Returns:
+        set: Pairs of artist and title words.
+    """
+    return {
+        (artist_word, title_word)
+        for artist_word in get_words(artist)
+        for title_word in get_words(title)
+    }
+
+
+def get_score(song: tuple, candidate: tuple) -> float:
+    """It gets how similar two songs are. Albums are only compared if both songs have one.
+
+    Args:
+        song (tuple): Normalized artist, album and title.
+        candidate (tuple): Normalized artist, album and title.
+
+    Returns:
+        float: Score from 0 (different) to 1 (same tags).
+    """
+    score = 0
+    total = 0
+    for index, tag in enumerate(["artist", "album", "title"]):
+        if tag == "album" and not (song[index] and candidate[index]):
+            continue
+        if song[index] == candidate[index]:
+            ratio = 1
+        else:
+            ratio = SequenceMatcher(None, song[index], candidate[index]).ratio()
+        score += WEIGHTS[tag] * ratio
+        total += WEIGHTS[tag]
+    return score / total
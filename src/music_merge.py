@@ -0,0 +1,132 @@
+from os.path import getsize
+from src.music_sync import *
+from src.music_matcher import normalize
+
+METADATA = [
+    "title",
+    "artist",
+    "album",
+    "album_artist",
+    "track_number",
+    "disc_number",
+    "year",
+    "genre",
+]  # Song attributes completed from duplicated songs
+
+
+class MergedLibrary(Library):
+    """Class for a music library that combines several music libraries, so they can be synced to the same destination folder in one pass.
+
+    Duplicated songs (with the same normalized artist, album, disc number, track number and title, and the same file size) are merged into one song with the highest rating and the sum of the play counts. Songs and playlists get new ID numbers, because they can collide between libraries, and playlists with the same name are joined.
+    """
+
+    def __init__(self, sources: list) -> None:
+        """Constructor for MergedLibrary class.
+
+        Args:
+            sources (list): Music library (Library) and absolute folder path to its music folder (str) of each source.
+        """
+        super().__init__()
+        self.sources = sources
+        self.duplicates = 0  # Number of merged duplicated songs
+        songs = []  # Merged songs (added to the library when their metadata is final)
+        keys = {}  # Merged songs by deduplication key
+        names = {}  # Merged playlists and IDs of their songs, by name
+        for library, folder in sources:
+            shortened = library.language == "iTunes" and IS_WINDOWS
+            merged = {}  # Merged songs by ID in the source library
+            for song in library.songs:
+                location = song.location or (
+                    folder + SEPARATOR + (song.path or get_file_path(song, shortened))
+                )
+                key = get_key(song, location)
+                if key in keys:
+                    merge_song(keys[key], song)
+                    self.duplicates += 1
+                else:
+                    keys[key] = Song(
+                        len(songs),
+                        **{
+                            attribute: getattr(song, attribute)
+                            for attribute in METADATA
+                        },
+                        rating=song.rating,
+                        play_count=song.play_count,
+                        format=song.format,
+                        location=location,
+                    )
+                    songs.append(keys[key])
+                merged[song.id] = keys[key]
+            # Songs of generic playlists are found by their file paths
+            files = {get_file_path(song): merged[song.id] for song in library.songs}
+            for playlist in library.playlists:
+                if playlist.get_songs() is not None:
+                    playlist_songs = [merged[song.id] for song in playlist.get_songs()]
+                else:
+                    playlist_songs = [
+                        files[file] for file in playlist.get_files() if file in files
+                    ]
+                if not playlist.name in names:
+                    names[playlist.name] = (
+                        Playlist(
+                            len(self.playlists), playlist.name, songs=playlist_songs
+                        ),
+                        {song.id for song in playlist_songs},
+                    )
+                    self.playlists.append(names[playlist.name][0])
+                    continue
+                # Songs that are not in the playlist of the same name yet
+                union, ids = names[playlist.name]
+                for song in playlist_songs:
+                    if not song.id in ids:
+                        union.add_song(song)
+                        ids.add(song.id)
+        for song in songs:
+            self.add_song(song)
+        print(
+            "Libraries merged: "
+            + str(len(self.songs))
+            + " song(s) ("
+            + str(self.duplicates)
+            + " duplicate(s)) and "
+            + str(len(self.playlists))
+            + " playlist(s)"
+        )
+
+
+def get_key(song: Song, location: str) -> tuple:
+    """It gets the deduplication key of a song: its normalized artist, album, disc number, track number and title, and its file size.
+
+    Args:
+        song (Song): Song object.
+        location (str): Absolute file path to the song file.
+
+    Returns:
+        tuple: Deduplication key.
+    """
+    try:
+        size = getsize(location)
+    except OSError:
+        size = None
+    return (
+        normalize(song.artist),
+        normalize(song.album),
+        song.disc_number,
+        song.track_number,
+        normalize(song.title),
+        size,
+    )
+
+
+def merge_song(song: Song, duplicate: Song) -> None:
+    """It merges the metadata of a duplicated song into a song: the highest rating, the sum of the play counts, and the missing tags.
+
+    Args:
+        song (Song): Merged song.
+        duplicate (Song): Duplicated song.
+    """
+    song.rating = max(song.rating or 0, duplicate.rating or 0)
+    song.play_count = (song.play_count or 0) + (duplicate.play_count or 0)
+    for attribute in METADATA:
+        if getattr(song, attribute) is None:
+            setattr(song, attribute, getattr(duplicate, attribute))
@@ -0,0 +1,140 @@
+import json
+from heapq import heappush, heappushpop
+from time import perf_counter
+from contextlib import contextmanager
+from src.music_profiler import profile
+
+OPERATIONS = [
+    "stat",
+    "listdir",
+    "mkdir",
+    "copy",
+    "link",
+    "transcode",
+    "remove",
+]  # File system operations counted during a sync process
+SLOWEST_FILES = 10  # Number of slowest copied files that are kept
+
+
+class Metrics:
+    """Class for the performance metrics of a sync process."""
+
+    def __init__(self, slowest_files: int = SLOWEST_FILES) -> None:
+        """Constructor for Metrics class.
+
+        Args:
+            slowest_files (int, optional): Number of slowest copied files that are kept. Defaults to SLOWEST_FILES.
+        """
+        self.phases = {}  # Wall time in seconds by phase name
+        self.operations = {operation: 0 for operation in OPERATIONS}
+        self.bytes_copied = 0
+        self.copy_seconds = 0
+        self.bytes_linked = 0  # Bytes that were not copied because of hard links
+        self.slowest_files = slowest_files
+        self.__slowest = []  # Heap of copy time, size and path of the slowest files
+
+    @contextmanager
+    def phase(self, name: str):
+        """It measures the wall time of a phase, and profiles it if profiling is enabled (see music_profiler). Several measures of the same phase are added up.
+
+        Args:
+            name (str): Phase name.
+        """
+        start = perf_counter()
+        try:
+            with profile(name):
+                yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0) + perf_counter() - start
+
+    def count(self, operation: str, number: int = 1) -> None:
+        """It counts file system operations.
+
+        Args:
+            operation (str): Operation name (see OPERATIONS).
+            number (int, optional): Number of operations. Defaults to 1.
+        """
+        self.operations[operation] += number
+
+    def add_copy(self, file: str, size: int, seconds: float) -> None:
+        """It adds a copied file.
+
+        Args:
+            file (str): Path to the copied file.
+            size (int): File size in bytes.
+            seconds (float): Copy time in seconds.
+        """
+        self.count("copy")
+        self.bytes_copied += size
+        self.copy_seconds += seconds
+        self.keep_slowest((seconds, size, file))
+
+    def add_link(self, size: int) -> None:
+        """It adds a file that was hard linked instead of copied.
+
+        Args:
+            size (int): File size in bytes.
+        """
+        self.count("link")
+        self.bytes_linked += size
+
+    def keep_slowest(self, copy: tuple) -> None:
+        """It keeps a copied file if it is one of the slowest ones.
+
+        Args:
+            copy (tuple): Copy time in seconds, size in bytes and path of the copied file.
+        """
+        if len(self._Metrics__slowest) < self.slowest_files:
+            heappush(self._Metrics__slowest, copy)
+        elif self.slowest_files:
+            heappushpop(self._Metrics__slowest, copy)
+
+    def merge(self, metrics: "Metrics") -> None:
+        """It adds the metrics of another sync process (or part of it) to these ones.
+
+        Args:
+            metrics (Metrics): Metrics to be added.
+        """
+        for name in metrics.phases:
+            self.phases[name] = self.phases.get(name, 0) + metrics.phases[name]
+        for operation in metrics.operations:
+            self.count(operation, metrics.operations[operation])
+        self.bytes_copied += metrics.bytes_copied
+        self.copy_seconds += metrics.copy_seconds
+        self.bytes_linked += metrics.bytes_linked
+        for copy in metrics._Metrics__slowest:
+            self.keep_slowest(copy)
+
+    def to_dict(self) -> dict:
+        """It returns the metrics as a dictionary that can be written as JSON.
+
+        Returns:
+            dict: Metrics.
+        """
+        throughput = None  # Bytes copied per second
+        if self.copy_seconds:
+            throughput = self.bytes_copied / self.copy_seconds
+        return {
+            "seconds": sum(self.phases.values()),
+            "phases": dict(self.phases),
+            "operations": dict(self.operations),
+            "bytes_copied": self.bytes_copied,
+            "copy_seconds": self.copy_seconds,
+            "throughput": throughput,
+            "bytes_linked": self.bytes_linked,
+            # Estimated time that copying the linked files would have taken
+            "seconds_saved": self.bytes_linked / throughput if throughput else None,
+            "slowest_files": [
+                {"file": file, "size": size, "seconds": seconds}
+                for seconds, size, file in sorted(self._Metrics__slowest, reverse=True)
+            ],
+        }
+
+    def write(self, file_name: str) -> None:
+        """It writes the metrics as a JSON file.
+
+        Args:
+            file_name (str): Path to the JSON file.
+        """
+        with open(file_name, mode="w", encoding="utf-8") as file:
+            json.dump(self.to_dict(), file, indent=2)
@@ -0,0 +1,106 @@
+import os
+import json
+from sys import getsizeof
+from heapq import merge
+from tempfile import mkstemp
+from src.music_library import SEPARATOR, ENCODING, BUFFER_SIZE
+
+RECORD_SIZE = 120  # Approximate bytes of a planned song in memory, besides its paths
+MEMORY_BUDGET = 64 << 20  # Default memory budget (in bytes) for planned songs
+
+
+def get_key(path: str) -> list:
+    """It gets the sort key of a path, so paths are sorted folder by folder, as they are found when the folders are walked in order.
+
+    Args:
+        path (str): Path with / as separator.
+
+    Returns:
+        list: Path folders and file name.
+    """
+    return path.split(SEPARATOR)
+
+
+def write_runs(records, folder: str, budget: int = MEMORY_BUDGET) -> list:
+    """It writes the planned songs in sorted runs, as JSON lines files, so only one run is kept in memory at a time.
+
+    Args:
+        records (iterable): Destination path, source path and ID of each song.
+        folder (str): Folder path for the runs files.
+        budget (int, optional): Approximate memory (in bytes) of each run. Defaults to MEMORY_BUDGET.
+
+    Returns:
+        list: Paths to the runs files.
+    """
+    runs = []
+    run = []
+    size = 0
+    for record in records:
+        run.append(record)
+        size += getsizeof(record[0]) + getsizeof(record[1]) + RECORD_SIZE
+        if size >= budget:
+            runs.append(write_run(run, folder))
+            run = []
+            size = 0
+    if run:
+        runs.append(write_run(run, folder))
+    return runs
+
+
+def write_run(run: list, folder: str) -> str:
+    """It sorts a run of planned songs by destination path and writes it as a JSON lines file.
+
+    Args:
+        run (list): Destination path, source path and ID of each song.
+        folder (str): Folder path for the run file.
+
+    Returns:
+        str: Path to the run file.
+    """
+    run.sort(key=lambda record: get_key(record[0]))
+    handle, file_name = mkstemp(prefix="run-", suffix=".jsonl", dir=folder)
+    with open(handle, mode="w", encoding=ENCODING, buffering=BUFFER_SIZE) as file:
+        for record in run:
+            file.write(json.dumps(record, ensure_ascii=False) + "\n")
+    return file_name
+
+
+def read_run(file_name: str):
+    """It reads a run of planned songs.
+
+    Args:
+        file_name (str): Path to the run file.
+
+    Yields:
+        list: Destination path, source path and ID of each song.
+    """
+    with open(file_name, mode="r", encoding=ENCODING, buffering=BUFFER_SIZE) as file:
+        for line in file:
+            yield json.loads(line)
+
+
+def merge_runs(runs: list):
+    """It merges sorted runs of planned songs, reading one record of each run at a time.
+
+    Args:
+        runs (list): Paths to the runs files.
+
+    Returns:
+        iterator: Destination path, source path and ID of each song, sorted by destination path.
+    """
+    return merge(
+        *[read_run(run) for run in runs], key=lambda record: get_key(record[0])
+    )
+
+
+def remove_runs(runs: list) -> None:
+    """It removes the runs files.
+
+    Args:
+        runs (list): Paths to the runs files.
+    """
+    for run in runs:
+        try:
+            os.remove(run)
+        except OSError:
+            pass
@@ -0,0 +1,99 @@
+import os
+import cProfile
+import tracemalloc
+from datetime import datetime
+from contextlib import contextmanager, nullcontext
+
+PROFILE = "ITUNES_SYNC_PROFILE"  # Environment variable with the profilers to be enabled, separated by commas
+PROFILE_FOLDER = "ITUNES_SYNC_PROFILE_FOLDER"  # Environment variable with the folder path to the profiling results
+PROFILERS = ["cpu", "memory"]  # cProfile and tracemalloc
+TOP_ALLOCATIONS = 10  # Number of allocation sites written for each phase
+DISABLED = nullcontext()  # Context used when profiling is disabled
+profilers = set()  # Enabled profilers
+folder = "."  # Folder path to the profiling results
+
+
+def configure(enabled: list = None, results_folder: str = None) -> None:
+    """It enables the profilers. It is called by the entry points (main.py and itunes_sync.py), so importing this module never fails. It raises ValueError if a profiler is not valid.
+
+    Args:
+        enabled (list, optional): Profilers to be enabled (see PROFILERS). An empty list disables profiling. Defaults to None, so they are read from the PROFILE environment variable.
+        results_folder (str, optional): Folder path to the profiling results. Defaults to None, so it is read from the PROFILE_FOLDER environment variable (or it is the current folder).
+    """
+    global folder
+    if enabled is None:
+        enabled = os.environ.get(PROFILE, "").split(",")
+    enabled = [profiler.strip() for profiler in enabled if profiler.strip()]
+    for profiler in enabled:
+        if not profiler in PROFILERS:
+            raise ValueError(
+                "Profiler " + profiler + " is not valid (" + ", ".join(PROFILERS) + ")."
+            )
+    profilers.clear()
+    profilers.update(enabled)
+    folder = results_folder or os.environ.get(PROFILE_FOLDER) or "."
+
+
+def profile(phase: str):
+    """It returns a context that profiles a phase with the enabled profilers. CPU profiles are written as .prof files and the top allocation sites as .txt files in the results folder. When profiling is disabled, it does nothing.
+
+    Args:
+        phase (str): Phase name.
+
+    Returns:
+        ContextManager: Profiling context.
+    """
+    if not profilers:
+        return DISABLED
+    return profile_phase(phase)
+
+
+@contextmanager
+def profile_phase(phase: str):
+    """It profiles a phase with the enabled profilers (see profile).
+
+    Args:
+        phase (str): Phase name.
+    """
+    os.makedirs(folder, exist_ok=True)
+    name = folder + "/" + phase + " " + datetime.now().strftime("%Y-%m-%d %H-%M-%S-%f")
+    memory = "memory" in profilers
+    started = memory and not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    if memory:
+        tracemalloc.reset_peak()
+    if "cpu" in profilers:
+        profiler = cProfile.Profile()
+        profiler.enable()
+    try:
+        yield
+    finally:
+        if "cpu" in profilers:
+            profiler.disable()
+            profiler.dump_stats(name + ".prof")
+            print("CPU profile of " + phase + " written to " + name + ".prof")
+        if memory:
+            snapshot = tracemalloc.take_snapshot().filter_traces(
+                [
+                    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+                    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+                    tracemalloc.Filter(False, tracemalloc.__file__),
+                ]
+            )
+            current, peak = tracemalloc.get_traced_memory()
+            if started:
+                tracemalloc.stop()
+            with open(name + ".txt", mode="w", encoding="utf-8") as file:
+                file.write(
+                    "Memory of "
+                    + phase
+                    + ": "
+                    + str(current)
+                    + " bytes (peak of "
+                    + str(peak)
+                    + " bytes)\n\nTop allocation sites:\n"
+                )
+                for statistic in snapshot.statistics("lineno")[:TOP_ALLOCATIONS]:
+                    file.write(str(statistic) + "\n")
+            print("Memory profile of " + phase + " written to " + name + ".txt")
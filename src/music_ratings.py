@@ -1,46 +1,271 @@
-from music_library import *
-from tkinter.filedialog import askopenfilename
+from src.music_library import *
+from src.music_matcher import Matcher
 
+PROPERTIES = {
+    "rating": "rating",
+    "play-count": "play_count",
+}  # Song attributes by Rhythmbox entry tag that can be copied
 
-def add_ratings(source: str, destination: str) -> None:
-    """It adds songs ratings from iTunes library to Rhythmbox library.
+
+def add_ratings(
+    source: str, destination: str, properties: list = ["rating"], fuzzy: float = None
+) -> dict:
+    """It adds songs ratings (and other properties like play counts) from iTunes library to Rhythmbox library. Songs are matched by artist, album and title through an index of the Rhythmbox entries, so each library is only walked once.
 
     Args:
         source (str): Path to the iTunes library XML file.
         destination (str): Path to the Rhythmbox library XML file.
+        properties (list, optional): Rhythmbox entry tags to be copied (see PROPERTIES). Defaults to only ratings.
+        fuzzy (float, optional): Minimum score (from 0 to 1) to match the songs whose tags are written differently in each library (see Matcher). Defaults to None, so only songs with the same tags are matched.
+
+    Returns:
+        dict: Number of properties that were edited and added, lists of the iTunes (artist, album, title) keys that were unmatched or ambiguous (found more than once in any library, or fuzzily matched with a Rhythmbox song that other iTunes songs match too), and list of the iTunes keys that were fuzzily matched with the Rhythmbox key and the score.
     """
+    for tag in properties:
+        assert tag in PROPERTIES, "Property " + tag + " can not be copied."
     print("Copying songs ratings:" + "\n - From\t" + source + "\n - To\t" + destination)
     library = Library([source], language="iTunes")
-    file = open(destination, mode="r", encoding="utf-8")
-    tree = ElementTree.parse(destination)
-    root = tree.getroot()
-    counter = {"edited": 0, "added": 0}
+    # Rhythmbox songs locations by key
+    entries = {}
+    for element in read_entries(destination):
+        if element.attrib["type"] == "song":
+            entry = get_properties(element)
+            if entry.get("location") is not None:
+                key = get_key(entry)
+                if not key in entries:
+                    entries[key] = []
+                entries[key].append(entry["location"])
+    # iTunes songs by key
+    songs = {}
     for song in library.songs:
-        for index, element in enumerate(root):
-            if element.attrib["type"] == "song":
-                if (
-                    get_property(element, "artist") == song.artist
-                    and get_property(element, "album") == song.album
-                    and get_property(element, "title") == song.title
+        key = (song.artist, song.album, song.title)
+        if not key in songs:
+            songs[key] = []
+        songs[key].append(song)
+    report = {"edited": 0, "added": 0, "unmatched": [], "ambiguous": [], "fuzzy": []}
+    contested = set()  # iTunes keys fuzzily matched with a claimed Rhythmbox song
+    # Songs whose tags are written differently
+    if fuzzy is not None:
+        matcher = Matcher()
+        for key in entries:
+            matcher.add(*key, item=key)
+        matched = []
+        for key in songs:
+            if not key in entries:
+                matches = matcher.match(*key, limit=2, threshold=fuzzy)
+                # A tie between the best matches is not a match
+                if len(matches) == 1 or (
+                    len(matches) == 2 and matches[0][0] > matches[1][0]
                 ):
-                    if get_property(element, "rating"):
-                        set_property(element, "rating", str(song.rating))
-                        counter["edited"] += 1
-                    else:
-                        ElementTree.SubElement(root[index], "rating").text = str(
-                            song.rating
-                        )
-                        counter["added"] += 1
-                    break
-    tree.write(destination)
-    file.close()
-    # Console output
-    total = 0
-    for action in counter:
-        total += counter[action]
-    print("Successfully set ratings to " + str(total) + " song(s):")
-    for action in counter:
-        print(" - " + str(counter[action]) + " song(s) were " + action + ".")
+                    matched.append((key, matches[0][1], matches[0][0]))
+        # iTunes keys by claimed Rhythmbox song location
+        claims = {}
+        for key, match in [(key, key) for key in songs if key in entries] + [
+            (key, match) for key, match, score in matched
+        ]:
+            for location in entries[match]:
+                if not location in claims:
+                    claims[location] = []
+                claims[location].append(key)
+        for key, match, score in matched:
+            if any(len(claims[location]) > 1 for location in entries[match]):
+                contested.add(key)
+            else:
+                report["fuzzy"].append((key, match, score))
+        for key, match, score in report["fuzzy"]:
+            entries[key] = entries[match]
+    patches = {}  # Properties values by Rhythmbox song location
+    for key in songs:
+        if key in contested:
+            report["ambiguous"].append(key)
+            continue
+        if not key in entries:
+            report["unmatched"].append(key)
+            continue
+        if len(songs[key]) > 1 or len(entries[key]) > 1:
+            report["ambiguous"].append(key)
+        values = {}
+        for tag in properties:
+            # Duplicated iTunes songs keep the highest value
+            values[tag] = str(
+                max(getattr(song, PROPERTIES[tag]) for song in songs[key])
+            )
+        for location in entries[key]:
+            patches[location] = values
+    report.update(rewrite_entries(destination, patches))
+    print_report(report)
+    return report
+
+
+def read_entries(file_name: str):
+    """It reads the entries of a Rhythmbox library XML file one by one, so the whole library is never loaded in memory. Each entry is released once the next one is read.
+
+    Args:
+        file_name (str): Path to the Rhythmbox library XML file.
+
+    Yields:
+        ElementTree: Entry XML tag.
+    """
+    depth = 0
+    root = None
+    for event, element in ElementTree.iterparse(file_name, events=("start", "end")):
+        if event == "start":
+            if root is None:
+                root = element
+            depth += 1
+        else:
+            depth -= 1
+            if depth == 1:
+                yield element
+                root.remove(element)
+
+
+def rewrite_entries(file_name: str, patches: dict) -> dict:
+    """It sets properties of the entries of a Rhythmbox library XML file by streaming the file into a temporary file, which then replaces it. Only the patched entries are changed, and the XML declaration and formatting are kept.
+
+    Args:
+        file_name (str): Path to the Rhythmbox library XML file.
+        patches (dict): Properties values (by entry tag) to be set, by entry location.
+
+    Returns:
+        dict: Number of properties that were edited and added.
+    """
+    counter = {"edited": 0, "added": 0}
+    # Original text until the root XML tag (included)
+    with open(file_name, mode="r", encoding=ENCODING) as file:
+        header = ""
+        end = -1
+        while end < 0:
+            block = file.read(BUFFER_SIZE)
+            if not block:
+                return counter
+            header += block
+            start = header.find("<rhythmdb")
+            if start >= 0:
+                end = header.find(">", start)
+        header = header[: end + 1]
+    if header.endswith("/>"):
+        return counter
+    with atomic_open(file_name) as file:
+        file.write(header)
+        depth = 0
+        root = None
+        first = True  # No entry has been read yet
+        # Last written entry. Its tail is only complete when the next tag is read
+        # (the parser can stop at the end of the entry), so it is written then
+        previous = None
+        for event, element in ElementTree.iterparse(file_name, events=("start", "end")):
+            if event == "start":
+                if root is None:
+                    root = element
+                elif depth == 1 and first:
+                    # Text between the root XML tag and its first entry
+                    file.write(str2html(root.text or "", quote=False))
+                    first = False
+                elif depth == 1 and previous is not None:
+                    file.write(str2html(previous.tail or "", quote=False))
+                    root.remove(previous)
+                    previous = None
+                depth += 1
+            else:
+                depth -= 1
+                if depth == 1:
+                    location = element.find("location")
+                    if location is not None and location.text in patches:
+                        values = patches[location.text]
+                        for tag in values:
+                            if set_entry_property(element, tag, values[tag]):
+                                counter["added"] += 1
+                            else:
+                                counter["edited"] += 1
+                    tail = element.tail
+                    element.tail = None
+                    file.write(ElementTree.tostring(element, encoding="unicode"))
+                    element.tail = tail
+                    previous = element
+                elif depth == 0 and previous is not None:
+                    # Text between the last entry and the end of the root XML tag
+                    file.write(str2html(previous.tail or "", quote=False))
+                elif depth == 0 and first and root.text:
+                    # Root XML tag without entries
+                    file.write(str2html(root.text, quote=False))
+        file.write("</" + root.tag + ">\n")
+    return counter
+
+
+def set_entry_property(xml: ElementTree, key: str, value: str) -> bool:
+    """It sets the value of a XML tag inside of an entry XML tag, adding the XML tag with the same indentation as the others if it does not exist.
+
+    Args:
+        xml (ElementTree): Entry XML tag.
+        key (str): Children XML tag key.
+        value (str): Value of the children XML tag.
+
+    Returns:
+        bool: True if the children XML tag was added.
+    """
+    child = xml.find(key)
+    if child is not None:
+        child.text = value
+        return False
+    child = ElementTree.SubElement(xml, key)
+    child.text = value
+    if len(xml) > 1:
+        child.tail = xml[-2].tail
+        xml[-2].tail = xml.text
+    return True
+
+
+def get_properties(xml: ElementTree) -> dict:
+    """It returns the values of all XML tags inside of another XML tag in a single pass.
+
+    Args:
+        xml (ElementTree): Parent XML tag.
+
+    Returns:
+        dict: Value of the children XML tags by key.
+    """
+    return {child.tag: child.text for child in xml}
+
+
+def get_key(properties: dict) -> tuple:
+    """It returns the key used to match songs between libraries.
+
+    Args:
+        properties (dict): Song properties by Rhythmbox entry tag.
+
+    Returns:
+        tuple: Artist, album and title.
+    """
+    return (properties.get("artist"), properties.get("album"), properties.get("title"))
+
+
+def print_report(report: dict) -> None:
+    """It prints the result of copying songs properties.
+
+    Args:
+        report (dict): Result returned by add_ratings.
+    """
+    print("Successfully set " + str(report["edited"] + report["added"]) + " value(s):")
+    for action in ["edited", "added"]:
+        print(" - " + str(report[action]) + " value(s) were " + action + ".")
+    if report["fuzzy"]:
+        print(" - " + str(len(report["fuzzy"])) + " song(s) were fuzzily matched:")
+        for key, match, score in report["fuzzy"]:
+            print(
+                "\t"
+                + " - ".join(str(value) for value in key)
+                + " = "
+                + " - ".join(str(value) for value in match)
+                + " ("
+                + str(round(100 * score))
+                + "%)"
+            )
+    for problem in ["unmatched", "ambiguous"]:
+        if report[problem]:
+            print(" - " + str(len(report[problem])) + " song(s) were " + problem + ":")
+            for key in report[problem]:
+                print("\t" + " - ".join(str(value) for value in key))
 
 
 def get_property(xml: ElementTree, key: str) -> ElementTree:
@@ -69,15 +294,18 @@ def set_property(xml: ElementTree, key: str, value: str) -> None:
         xml.find(key).text = value
 
 
-# Main
-source = askopenfilename(
-    title="Select the source iTunes library XML file",
-    filetypes=[("XML File", "*.xml")],
-)
-if source != "":
-    destination = askopenfilename(
-        title="Select the destination Rhythmbox library XML file",
+# Main (run from the repository folder with: python -m src.music_ratings)
+if __name__ == "__main__":
+    from tkinter.filedialog import askopenfilename
+
+    source = askopenfilename(
+        title="Select the source iTunes library XML file",
         filetypes=[("XML File", "*.xml")],
     )
-    if destination != "":
-        add_ratings(source, destination)
+    if source != "":
+        destination = askopenfilename(
+            title="Select the destination Rhythmbox library XML file",
+            filetypes=[("XML File", "*.xml")],
+        )
+        if destination != "":
+            add_ratings(source, destination)
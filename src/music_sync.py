@@ -1,12 +1,59 @@
 from platform import platform as get_os
 from src.music_library import *
+from src.music_metrics import Metrics
+from src.music_filesystem import LocalFileSystem
+from src.music_plan import get_key, write_runs, merge_runs, remove_runs
+from src.music_dedup import HASH_CACHE, get_duplicates, read_cache, write_cache
+from src.music_transcode import ENCODER, transcode_file
+from src.music_log import EventLog, RING_SIZE
+from src.music_archive import (
+    get_compression,
+    get_footprint,
+    read_index,
+    write_index,
+    open_archive,
+    add_member,
+)
+from tempfile import mkdtemp
+from posixpath import dirname as get_parent
 from io import open
-from os.path import exists, join
-from os import makedirs as create_dir
-from os import remove
-from os import listdir as dir
-from shutil import copy2 as copy
-from shutil import rmtree as remove_tree
+from io import BytesIO
+from time import perf_counter, time
+from datetime import date, datetime
+from hashlib import sha1
+from os.path import join
+from os import stat_result
+from os import rmdir
+from os import cpu_count
+from contextlib import redirect_stdout
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from multiprocessing import get_context
+
+PLAYLIST_EXTENSION = ".m3u"  # Generic playlist file extension
+MEDIA_TYPES = {
+    "mp3": "audio/mpeg",
+    "m4a": "audio/x-m4a",
+    "aac": "audio/aac",
+    "flac": "audio/x-flac",
+    "ogg": "audio/x-vorbis+ogg",
+    "opus": "audio/x-opus+ogg",
+    "wav": "audio/x-wav",
+}  # Rhythmbox media types by file format
+DATABASE_TAGS = {
+    "title": "title",
+    "genre": "genre",
+    "artist": "artist",
+    "album": "album",
+    "album-artist": "album_artist",
+    "track-number": "track_number",
+    "disc-number": "disc_number",
+    "rating": "rating",
+    "play-count": "play_count",
+}  # Song attributes by Rhythmbox entry tag (and the year as date, see sync_database)
+IS_WINDOWS = get_os()[:7] == "Windows"  # iTunes shortens the paths on Windows
+SHARDS_PER_WORKER = 4  # Artists shards for each worker process (to balance them)
+RESERVE = 16 << 20  # Bytes kept free for playlists and library files (see fit_library)
 
 
 class Sync:
@@ -18,8 +65,26 @@ class Sync:
         None  # Absolute folder path to the destination music folder.
     )
     destination_playlists: str = None  # Absolute file path to the destination playlists XML file (only if destination language is Rhythmbox).
+    destination_database: str = None  # Absolute file path to the destination library XML file (only if destination language is Rhythmbox).
     window: set = None  # Graphical user interface object.
-    errors: set = []  # Songs and playlists that could not be synced.
+    errors: deque = None  # Last songs and playlists that could not be synced.
+    log: EventLog = None  # Events of the sync process (see music_log).
+    events: str = None  # Absolute file path to the events JSON lines file.
+    metrics: Metrics = None  # Performance metrics of the sync process.
+    workers: int = None  # Number of worker processes that sync the songs.
+    filesystem: LocalFileSystem = None  # File system of the music folders.
+    memory_budget: int = None  # Memory (in bytes) for planned songs (see sync_external).
+    dedup: bool = False  # Identical songs files are hard linked (see plan_duplicates).
+    duplicates: dict = None  # First source file with the same content, by source file.
+    copies: dict = None  # Destination file with each content, by first source file.
+    transcode: dict = None  # Target file format and bitrate, by source file format.
+    formats: dict = None  # Target file format, by source file format.
+    encoder: list = None  # Encoder command template (see music_transcode.ENCODER).
+    transcode_cache: str = None  # Folder path to the transcoded files cache.
+    jobs: list = None  # Songs, source files and destination files to be transcoded.
+    fit: bool = False  # Only songs that fit are synced (see fit_library).
+    source_library: Library = None  # Whole source music library (only if fit is True).
+    archive: str = None  # Absolute file path to the tar archive (see sync_archive).
 
     def __init__(
         self,
@@ -29,6 +94,18 @@ class Sync:
         destination_folder: str,
         destination_playlists: str = None,
         window: set = None,
+        destination_database: str = None,
+        library: Library = None,
+        workers: int = None,
+        filesystem: LocalFileSystem = None,
+        memory_budget: int = None,
+        dedup: bool = False,
+        transcode: dict = None,
+        encoder: list = None,
+        transcode_cache: str = None,
+        fit: bool = False,
+        archive: str = None,
+        events: str = None,
     ) -> None:
         """It creates a sync process.
 
@@ -39,35 +116,129 @@ class Sync:
             destination_folder (str): Absolute folder path to the destination music folder.
             destination_playlists (str): Absolute file path to the destination playlists XML file (only if destination language is Rhythmbox). Defaults to None.
             window (set, optional): Graphical user interface object.
+            destination_database (str, optional): Absolute file path to the destination library XML file (only if destination language is Rhythmbox), so Rhythmbox does not need to scan the destination folder. Defaults to None.
+            library (Library, optional): Source music library that is already parsed (for example, a merged library, whose songs have their own locations), instead of the source XML files. Defaults to None.
+            workers (int, optional): Number of worker processes that sync the songs, partitioned by artist folder (see sync_shards), only with the local file system. Defaults to None, so songs are synced in this process.
+            filesystem (LocalFileSystem | MemoryFileSystem, optional): File system of the source and destination folders (see music_filesystem). Defaults to None, so the local file system is used.
+            memory_budget (int, optional): Approximate memory (in bytes) for planned songs. If it is given, songs are planned in external memory (see sync_external). Defaults to None, so songs are planned in memory.
+            dedup (bool, optional): If True, songs files with identical content are copied once, and the other destination files are hard links to it (see plan_duplicates). Defaults to False.
+            transcode (dict, optional): Target file format (str) and bitrate in kbit/s (int) by source file format. Songs files of these formats are transcoded instead of copied (see transcode_songs), only with the local file system. Defaults to None, so songs files are copied as they are.
+            encoder (list, optional): Encoder command template, whose arguments can have {source}, {destination}, {format} and {bitrate} fields. Defaults to None, so ffmpeg is used (see music_transcode.ENCODER).
+            transcode_cache (str, optional): Absolute folder path where transcoded files are kept, so they are reused while the source files and the settings do not change. Defaults to None, so transcoded files are not cached.
+            fit (bool, optional): If True, only the songs that fit in the free space of the destination device are synced, by priority (see fit_library). Defaults to False.
+            archive (str, optional): Absolute file path to a tar archive (.tar, .tar.gz or .tar.zst) where songs and generic playlists are written instead of the destination folder (see sync_archive). Defaults to None.
+            events (str, optional): Absolute file path to a JSON lines file where the events of each sync process are appended as they happen (see music_log). Defaults to None, so only the last events are kept in memory.
         """
-        self.library = Library(source_files, language=source_language)
+        self.metrics = Metrics()
+        self.events = events
+        self.errors = deque(maxlen=RING_SIZE)
+        self.log = EventLog()
+        if library is None:
+            with self.metrics.phase("parse"):
+                library = Library(source_files, language=source_language)
+        self.library = library
         self.source_language = source_language
         self.source_folder = source_folder
         self.destination_folder = destination_folder
         self.destination_playlists = destination_playlists
+        self.destination_database = destination_database
+        self.workers = workers
+        self.filesystem = filesystem or LocalFileSystem()
+        self.memory_budget = memory_budget
+        self.dedup = dedup
+        self.duplicates = {}
+        self.copies = {}
+        self.transcode = transcode or {}
+        self.formats = {
+            format: target for format, (target, bitrate) in self.transcode.items()
+        }
+        assert (
+            not self.transcode or type(self.filesystem) is LocalFileSystem
+        ), "Songs can only be transcoded in the local file system."
+        self.encoder = encoder or ENCODER
+        self.transcode_cache = transcode_cache
+        self.jobs = []
+        self.fit = fit
+        self.source_library = library if fit else None
+        self.archive = archive
+        assert not archive or not (
+            transcode or dedup or fit
+        ), "Archives cannot be written with transcoded, deduplicated or fitted songs."
         self.window = window
         message = "Sync process created:"
-        message += "\n- Source language = " + source_language
-        message += "\n- Source library = " + self.library.files[0]
-        if source_language == "Rhythmbox":
-            message += "\n- Source playlists = " + self.library.files[1]
-        message += "\n- Source folder = " + self.source_folder
-        message += "\n- Destination folder = " + self.destination_folder
+        if source_language:
+            message += "\n- Source language = " + source_language
+        if self.library.files:
+            message += "\n- Source library = " + self.library.files[0]
+            if source_language == "Rhythmbox":
+                message += "\n- Source playlists = " + self.library.files[1]
+        if self.source_folder:
+            message += "\n- Source folder = " + self.source_folder
+        if self.destination_folder:
+            message += "\n- Destination folder = " + self.destination_folder
+        if self.archive:
+            message += "\n- Destination archive = " + self.archive
         if self.destination_playlists:
             message += "\n- Destination playlists = " + self.destination_playlists
+        if self.destination_database:
+            message += "\n- Destination library = " + self.destination_database
         print(message)
 
-    def start(self):
-        """It syncs the the destination folder to contains the songs and playlists according to the source music library."""
+    def start(self) -> dict:
+        """It syncs the the destination folder to contains the songs and playlists according to the source music library.
+
+        Returns:
+            dict: Performance metrics of the sync process (see Metrics.to_dict).
+        """
         print("Syncing")
         progress_weight = 0.8
-        self.errors = []
+        self.open_log()
+        parse = self.metrics.phases.get("parse")
+        self.metrics = Metrics()
+        if parse is not None:
+            self.metrics.phases["parse"] = parse
         self.set_progress(0)
-        self.sync_songs(progress_weight)
-        self.set_progress(100 * progress_weight)
-        self.sync_playlists(1 - progress_weight)
+        try:
+            if self.fit:
+                with self.metrics.phase("planning"):
+                    self.fit_library()
+            if self.archive:
+                with self.metrics.phase("archive"):
+                    self.sync_archive()
+            else:
+                self.sync_songs(progress_weight)
+                self.set_progress(100 * progress_weight)
+                with self.metrics.phase("playlists"):
+                    self.sync_playlists(1 - progress_weight)
+                if self.destination_database:
+                    with self.metrics.phase("database"):
+                        self.sync_database()
+        finally:
+            # Events written so far are kept even if the sync process fails
+            self.log.close()
         self.set_progress(100)
-        print("Sync process completed")
+        print("Sync process completed (" + self.log.get_summary() + ")")
+        return self.metrics.to_dict()
+
+    def open_log(self) -> None:
+        """It starts the events log and the errors of a new sync process (see music_log.EventLog)."""
+        self.log.close()
+        self.log = EventLog(self.events)
+        self.errors = deque(maxlen=RING_SIZE)
+
+    def report_error(self, item, message: str) -> None:
+        """It reports a song or playlist that could not be synced: it is added to the events log and to the last errors, and the message is printed.
+
+        Args:
+            item (Song | Playlist): Song or playlist that could not be synced.
+            message (str): Error message.
+        """
+        self.errors.append(item)
+        if isinstance(item, Playlist):
+            self.log.add("error", playlist=item.name, message=message)
+        else:
+            self.log.add("error", song=get_file_path(item), id=item.id, message=message)
+        print(message)
 
     def sync_songs(self, progress_weight: float = 1) -> None:
         """It syncs the destination folder to contains the songs files according to the source music library.
@@ -76,22 +247,320 @@ class Sync:
             progress_weight (float, optional): Part of total that represents this sync process in the progress bar from the graphical user interface (1 means the whole progress bar and 0.5 means half of it).
         """
         print("Syncing songs")
-        increment_song = 50 * progress_weight / len(self.library.songs)
-        increment_artist = 50 * progress_weight / self.library.get_artists_number()
+        increment_song = 50 * progress_weight / max(len(self.library.songs), 1)
+        increment_artist = (
+            50 * progress_weight / max(self.library.get_artists_number(), 1)
+        )
+        if self.dedup:
+            with self.metrics.phase("dedup"):
+                self.plan_duplicates()
+        if self.memory_budget:
+            # Destination files are cleaned while songs are copied
+            self.sync_external(2 * increment_song)
+        elif (
+            self.workers
+            and self.workers > 1
+            and type(self.filesystem) is LocalFileSystem
+            # Identical files can be in the folders of different shards
+            and not self.dedup
+            and not self.transcode
+        ):
+            self.sync_shards(increment_song, increment_artist)
+        else:
+            with self.metrics.phase("songs"):
+                artists, albums, songs = self.copy_songs(increment_song)
+            with self.metrics.phase("transcode"):
+                self.transcode_songs()
+            with self.metrics.phase("cleanup"):
+                self.clean_destination(artists, albums, songs, increment_artist)
+        if self.dedup:
+            print(
+                "Songs linked: "
+                + str(self.metrics.operations["link"])
+                + " file(s) ("
+                + str(self.metrics.bytes_linked)
+                + " bytes saved)"
+            )
+        print("Songs synced")
+
+    def fit_library(self) -> None:
+        """It selects the songs to be synced so they fit in the destination device, and removes the destination songs files that are not selected first, so there is space for the new ones.
+
+        The available space is the free space of the device, the space of the destination songs files (which are removed unless their songs are selected) and the space of the playlists, library and hashes files (which are rewritten, and RESERVE is kept for them), without RESERVE. Each song takes the size of its destination file if it exists, or else the size of its source file (transcoded files are usually smaller, so it is an upper bound). Songs in playlists go first, then songs by rating and then by play count, and each song is selected if it still fits (a greedy approximation of the knapsack problem that keeps the priority order). Playlists only keep the selected songs (see Library.get_subset).
+        """
+        library = self.source_library
+        if not self.exists(self.destination_folder):
+            self.create_dir(self.destination_folder)
+        space = self.free_space(self.destination_folder)
+        if space is None:
+            print("Free space of the destination folder is unknown")
+            self.library = library
+            return
+        existing = {}  # Size and inode of the destination songs files by path
+        for artist in self.dir(self.destination_folder):
+            try:
+                albums = self.dir(self.destination_folder + SEPARATOR + artist)
+            except OSError:  # Files out of artists folders are kept
+                continue
+            for album in albums:
+                folder = artist + SEPARATOR + album
+                try:
+                    sizes = self.scan(self.destination_folder + SEPARATOR + folder)
+                except OSError:
+                    continue
+                for name, status in sizes.items():
+                    existing[folder + SEPARATOR + name] = status
+        rewritten = [
+            status
+            for name, status in self.scan(self.destination_folder).items()
+            if name.endswith(PLAYLIST_EXTENSION) or name == HASH_CACHE
+        ]  # Size and inode of the files that are rewritten after the songs
+        for file in [self.destination_playlists, self.destination_database]:
+            if file and self.exists(file):
+                status = self.stat(file)
+                rewritten.append((status.st_size, status.st_ino))
+        # Hard links of a file take its space once
+        sizes = {inode: size for size, inode in list(existing.values()) + rewritten}
+        space += sum(sizes.values()) - RESERVE
+        # Songs of generic playlists are found by their file paths
+        playlists = set()  # Songs in playlists
+        files = set()  # Files of generic playlists
+        for playlist in library.playlists:
+            if playlist.get_songs() is not None:
+                playlists.update(id(song) for song in playlist.get_songs())
+            else:
+                files.update(playlist.iter_files())
+        candidates = []  # Priority, size, inode and destination file of each song
+        folders = {}  # Sizes of the source files by folder
+        for index, song in enumerate(library.songs):
+            destination_file = self.get_destination_file(song)
+            size, inode = existing.get(destination_file, (None, None))
+            if size is None:
+                source_file = self.get_source_path(song)
+                folder = get_parent(source_file)
+                if not folder in folders:
+                    try:
+                        folders[folder] = self.scan(folder)
+                    except OSError:
+                        folders[folder] = {}
+                # Missing source files are reported when they are copied
+                size = folders[folder].get(source_file.split(SEPARATOR)[-1], (0,))[0]
+            in_playlist = id(song) in playlists or get_file_path(song) in files
+            candidates.append(
+                (
+                    (not in_playlist, -(song.rating or 0), -(song.play_count or 0)),
+                    index,
+                    size,
+                    inode,
+                    destination_file,
+                )
+            )
+        candidates.sort()
+        selected = set()  # Indexes of the selected songs
+        chosen = set()  # Destination files of the selected songs
+        inodes = set()  # Inodes of the selected destination files
+        for priority, index, size, inode, destination_file in candidates:
+            # Songs with the same destination file (or hard links) take its space once
+            if destination_file in chosen or inode in inodes:
+                selected.add(index)
+                chosen.add(destination_file)
+            elif size <= space:
+                space -= size
+                selected.add(index)
+                chosen.add(destination_file)
+                if inode is not None:
+                    inodes.add(inode)
+        self.library = library.get_subset(
+            [song for index, song in enumerate(library.songs) if index in selected]
+        )
+        for file in existing:
+            if not file in chosen:
+                self.remove(self.destination_folder + SEPARATOR + file)
+        print(
+            "Songs selected to fit in the destination device: "
+            + str(len(selected))
+            + " of "
+            + str(len(library.songs))
+            + " ("
+            + str(max(space, 0))
+            + " bytes left)"
+        )
+
+    def sync_archive(self, progress_weight: float = 1) -> None:
+        """It writes the songs files and the generic playlists files into the destination tar archive, with the same paths as in a destination folder, in one sequential pass sorted by path.
+
+        A members index is kept next to the archive (see music_archive.read_index). If the archive is uncompressed and it matches its index, only the members that are new or changed (by source file size and modification time, or by playlist content) are appended, and the extracted archive gets their last version. Archives that do not change are not written. Members of removed songs stay in the archive until it is written again, which happens when replaced or removed members take more space than the others (or when it is compressed).
+
+        Args:
+            progress_weight (float, optional): Part of total that represents this sync process in the progress bar from the graphical user interface (1 means the whole progress bar and 0.5 means half of it).
+        """
+        print("Syncing archive")
+        # Fingerprint, song or playlist, and source file (None for playlists) by member name
+        planned = {}
+        for song in self.library.songs:
+            name = get_file_path(song)
+            if name in planned:
+                continue
+            source_file = self.get_source_path(song)
+            try:
+                status = self.stat(source_file)
+            except OSError:
+                self.report_error(
+                    song, "Song not found in the source folder (" + source_file + ")"
+                )
+                continue
+            planned[name] = ([status.st_size, status.st_mtime], song, source_file)
+        for playlist, name in zip(
+            self.library.playlists, get_playlists_files(self.library.playlists)
+        ):
+            planned[name] = (
+                list(get_lines_fingerprint(playlist.iter_files())),
+                playlist,
+                None,
+            )
+        index = read_index(self.archive)
+        members = {}  # Fingerprint and content size of the archive members
+        dead = 0  # Bytes of replaced or removed members
+        compression = get_compression(self.archive)
+        # Archive that matches its index
+        valid = (
+            index is not None
+            and index.get("compression") == compression
+            and self.exists(self.archive)
+            and self.getsize(self.archive) == index.get("size")
+        )
+        if valid and {name: item[0] for name, item in planned.items()} == {
+            name: member[0] for name, member in index["members"].items()
+        }:
+            print("Archive synced: it was up to date")
+            return
+        append = valid and not compression
+        if append:
+            members = index["members"]
+            dead = index.get("dead", 0)
+            for name in members:
+                if name in planned and planned[name][0] == members[name][0]:
+                    continue
+                dead += get_footprint(members[name][1])
+            # Archive is written again when most of it is dead
+            append = 2 * dead <= self.getsize(self.archive)
+        if append:
+            names = [
+                name
+                for name in planned
+                if not name in members or members[name][0] != planned[name][0]
+            ]
+            members = {name: members[name] for name in members if name in planned}
+        else:
+            names = list(planned)
+            members = {}
+            dead = 0
+        names.sort(key=get_key)
+        increment = 100 * progress_weight / max(len(names), 1)
+        with open_archive(self.archive, append) as archive:
+            for name in names:
+                fingerprint, item, source_file = planned[name]
+                start = perf_counter()
+                if source_file is None:
+                    content = "\n".join(item.iter_files()).encode(ENCODING)
+                    add_member(archive, name, BytesIO(content), len(content), time())
+                    size = len(content)
+                else:
+                    size = fingerprint[0]
+                    with self.filesystem.open_read(source_file) as file:
+                        add_member(archive, name, file, size, fingerprint[1])
+                seconds = perf_counter() - start
+                self.metrics.add_copy(name, size, seconds)
+                self.log.add("copy", file=name, size=size, seconds=seconds)
+                members[name] = [fingerprint, size]
+                self.increment_progress(increment)
+        write_index(
+            self.archive,
+            {
+                "compression": compression,
+                "size": self.getsize(self.archive),
+                "dead": dead,
+                "members": members,
+            },
+        )
+        print(
+            "Archive synced: "
+            + str(len(names))
+            + " member(s) "
+            + ("appended" if append else "written")
+        )
+
+    def sync_shards(
+        self, increment_song: float = 0, increment_artist: float = 0
+    ) -> None:
+        """It syncs the songs files in worker processes. Songs are partitioned by artist folder, because each artist has its own folder in the destination folder, so each shard copies and cleans its artists folders independently. Then the folders of artists that do not belong to the library are removed, and the errors, metrics and progress of the shards are merged.
+
+        Args:
+            increment_song (float, optional): Progress percent number to increment for each song. Defaults to 0.
+            increment_artist (float, optional): Progress percent number to increment for each artist folder. Defaults to 0.
+        """
+        with self.metrics.phase("songs"):
+            artists = {}  # Songs by artist folder
+            for song in self.library.songs:
+                artist = get_folder_path(song).split(SEPARATOR)[0]
+                if not artist in artists:
+                    artists[artist] = []
+                artists[artist].append(song)
+            shards = get_shards(artists, self.workers * SHARDS_PER_WORKER)
+            # Forked workers would copy the threads state (such as the events writer)
+            with ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=get_context("spawn")
+            ) as executor:
+                futures = {
+                    executor.submit(
+                        sync_shard,
+                        self.source_language,
+                        self.source_folder,
+                        self.destination_folder,
+                        songs,
+                        folders,
+                        self.events,
+                    ): (songs, folders)
+                    for songs, folders in shards
+                }
+                for future in as_completed(futures):
+                    songs, folders = futures[future]
+                    errors, metrics, counters, events = future.result()
+                    self.errors += [songs[index] for index in errors]
+                    self.metrics.merge(metrics)
+                    self.log.merge(counters, events)
+                    self.increment_progress(
+                        len(songs) * increment_song + len(folders) * increment_artist
+                    )
+        with self.metrics.phase("cleanup"):
+            if self.exists(self.destination_folder):
+                for artist in self.dir(self.destination_folder):
+                    if not artist in artists:
+                        self.remove_tree(
+                            self.destination_folder + SEPARATOR + artist,
+                            ignore_errors=True,
+                        )
+
+    def copy_songs(self, increment_song: float = 0) -> tuple:
+        """It copies the songs files that are missing in the destination folder.
+
+        Args:
+            increment_song (float, optional): Progress percent number to increment for each song. Defaults to 0.
+
+        Returns:
+            tuple: Folder paths to library artists (set), folder paths to library albums by artist (dict) and file paths to library songs by artist and album (dict), relative to the destination folder.
+        """
         artists = set()  # List of folder paths to library artists
         albums = {}  # List of folder paths to library albums
         songs = {}  # List of file paths to library songs
-        is_windows = get_os()[:7] == "Windows"
         for song in self.library.songs:
             # Folder relative path to artist
             artist = sub(r"^\.|\.$", "_", replace_special_characters(song.artist))
             # Folder relative path to album
             album = get_folder_path(song)
             # File relative path
-            source_file = get_file_path(
-                song, self.source_language == "iTunes" and is_windows
-            )
-            destination_file = get_file_path(song)
+            source_file = self.get_source_path(song)
+            destination_file = self.get_destination_file(song)
             # Library folders
             if not artist in albums:
                 albums[artist] = set()
@@ -101,70 +570,403 @@ class Sync:
             artists.add(artist)
             albums[artist].add(album)
             songs[artist][album].add(destination_file)
-            # Check if the song file exists in the source folder. If not, add the song to the errors list.
-            if not exists(self.source_folder + SEPARATOR + source_file):
-                self.errors.append(song)
-                print(
-                    "Song not found in the source folder ("
-                    + self.source_folder
-                    + SEPARATOR
+            # Check if the song file exists in the destination folder. If not, copy the song file.
+            if not self.exists(self.destination_folder + SEPARATOR + destination_file):
+                if not self.exists(self.destination_folder + SEPARATOR + album):
+                    self.create_dir(self.destination_folder + SEPARATOR + album)
+                self.copy_song(
+                    song,
+                    source_file,
+                    self.destination_folder + SEPARATOR + destination_file,
+                )
+            else:
+                self.log.count("skip")
+            # Update progress bar
+            self.increment_progress(increment_song)
+        return artists, albums, songs
+
+    def copy_song(self, song: Song, source_file: str, destination_file: str) -> None:
+        """It copies a song file. If it cannot be copied, the song is added to the errors list. The source file is only checked if it cannot be copied. Songs files that must be transcoded are queued instead (see transcode_songs).
+
+        Args:
+            song (Song): Song object.
+            source_file (str): Absolute path to the source file.
+            destination_file (str): Absolute path to the destination file.
+        """
+        if song.format in self.formats:
+            self.jobs.append((song, source_file, destination_file))
+            return
+        original = self.duplicates.get(source_file)
+        if original in self.copies:
+            try:
+                self.link(self.copies[original], destination_file)
+                return
+            except OSError:  # File systems without hard links
+                pass
+        try:
+            self.copy(source_file, destination_file)
+        except Exception as error:
+            if isinstance(error, FileNotFoundError) and not self.exists(source_file):
+                message = "Song not found in the source folder (" + source_file + ")"
+            else:
+                message = (
+                    "Song could not be copied (from "
                     + source_file
+                    + " to "
+                    + destination_file
                     + ")"
                 )
-            else:
-                # Check if the song file exists in the destination folder. If not, copy the song file.
-                if not exists(self.destination_folder + SEPARATOR + destination_file):
-                    if not exists(self.destination_folder + SEPARATOR + album):
-                        create_dir(self.destination_folder + SEPARATOR + album)
-                        copy(
-                            self.source_folder + SEPARATOR + source_file,
-                            self.destination_folder + SEPARATOR + destination_file,
-                        )
-                    else:
-                        try:
-                            copy(
-                                self.source_folder + SEPARATOR + source_file,
-                                self.destination_folder + SEPARATOR + destination_file,
+            self.report_error(song, message)
+        else:
+            if original is not None:
+                self.copies[original] = destination_file
+
+    def transcode_songs(self) -> None:
+        """It transcodes the queued songs files (see copy_song) with the encoder command, running one encoder process for each worker (or for each processor) at a time. If a song file cannot be transcoded, the song is added to the errors list."""
+        jobs = self.jobs
+        self.jobs = []
+        if not jobs:
+            return
+        print("Transcoding " + str(len(jobs)) + " song(s)")
+        with ThreadPoolExecutor(max_workers=self.workers or cpu_count()) as executor:
+            futures = {
+                executor.submit(
+                    transcode_file,
+                    source_file,
+                    destination_file,
+                    *self.transcode[song.format],
+                    encoder=self.encoder,
+                    cache=self.transcode_cache,
+                ): (song, source_file, destination_file)
+                for song, source_file, destination_file in jobs
+            }
+            for future in as_completed(futures):
+                song, source_file, destination_file = futures[future]
+                try:
+                    # Cached transcoded files are copied
+                    cached = future.result()
+                    self.metrics.count("copy" if cached else "transcode")
+                    self.log.add("transcode", file=destination_file, cached=cached)
+                except Exception:
+                    self.report_error(
+                        song,
+                        "Song could not be transcoded (from "
+                        + source_file
+                        + " to "
+                        + destination_file
+                        + ")",
+                    )
+
+    def plan_duplicates(self) -> None:
+        """It finds the songs files with identical content (see music_dedup.get_duplicates), so each content is copied once and the other destination files become hard links to it (see copy_song). If a destination file with that content already exists, the others are linked to it. Hashes are cached in the destination folder between sync processes."""
+        cache_file = self.destination_folder + SEPARATOR + HASH_CACHE
+        cache = read_cache(cache_file, self.filesystem.open_read)
+        files = {}  # Size and modification time by source file
+        destinations = {}  # Destination files by source file
+        for song in self.library.songs:
+            source_file = self.get_source_path(song)
+            if source_file in destinations:
+                destinations[source_file].append(self.get_destination_file(song))
+                continue
+            destinations[source_file] = [self.get_destination_file(song)]
+            try:
+                status = self.stat(source_file)
+            except OSError:
+                continue
+            files[source_file] = (status.st_size, status.st_mtime)
+        self.duplicates = get_duplicates(files, self.filesystem.open_read, cache)
+        # Songs of the same source file
+        for source_file, paths in destinations.items():
+            if len(paths) > 1 and not source_file in self.duplicates:
+                self.duplicates[source_file] = source_file
+        self.copies = {}
+        for source_file, original in self.duplicates.items():
+            if original in self.copies:
+                continue
+            for path in destinations[source_file]:
+                if self.exists(self.destination_folder + SEPARATOR + path):
+                    self.copies[original] = self.destination_folder + SEPARATOR + path
+                    break
+        try:
+            # On the first sync, the destination folder does not exist yet
+            if not self.exists(self.destination_folder):
+                self.create_dir(self.destination_folder)
+            write_cache(cache_file, cache, self.filesystem.open_write, files)
+        except OSError as error:
+            print("Hashes cache could not be written (" + str(error) + ")")
+
+    def sync_external(self, increment_song: float = 0) -> None:
+        """It syncs the songs files planning them in external memory, so the memory does not grow with the library. Planned songs are written in sorted runs (see music_plan), which are merged and joined with the destination folder walked in the same order: songs that are only planned are copied, and files that are only in the destination folder are removed.
+
+        Args:
+            increment_song (float, optional): Progress percent number to increment for each song. Defaults to 0.
+        """
+        folder = mkdtemp(prefix="itunes-sync-")
+        runs = []
+        try:
+            with self.metrics.phase("planning"):
+                runs = write_runs(
+                    (
+                        [
+                            self.get_destination_file(song),
+                            self.get_source_path(song),
+                            song.id,
+                        ]
+                        for song in self.library.songs
+                    ),
+                    folder,
+                    self.memory_budget,
+                )
+            with self.metrics.phase("songs"):
+                empty = set()  # Destination folders that can become empty
+                planned = merge_runs(runs)
+                existing = self.walk_destination(empty)
+                record = next(planned, None)
+                file = next(existing, None)
+                last = None  # Destination path of the last planned song
+                created = None  # Last folder that is known to exist
+                while record is not None or file is not None:
+                    if file is None or (
+                        record is not None and get_key(record[0]) < get_key(file)
+                    ):
+                        # Songs with the same destination path are copied once
+                        if record[0] != last:
+                            album = get_parent(record[0])
+                            if album != created:
+                                path = self.destination_folder + SEPARATOR + album
+                                if not self.exists(path):
+                                    self.create_dir(path)
+                                created = album
+                            self.copy_song(
+                                self.library.get_song(record[2]),
+                                record[1],
+                                self.destination_folder + SEPARATOR + record[0],
                             )
-                        except:
-                            self.errors.append(song)
-                            print(
-                                "Song could not be copied (from "
-                                + self.source_folder
-                                + SEPARATOR
-                                + source_file
-                                + "to "
-                                + self.destination_folder
-                                + SEPARATOR
-                                + destination_file
-                                + ")"
+                            last = record[0]
+                        record = next(planned, None)
+                        self.increment_progress(increment_song)
+                    elif record is None or get_key(file) < get_key(record[0]):
+                        path = self.destination_folder + SEPARATOR + file
+                        try:
+                            self.remove(path)
+                        except OSError:
+                            self.remove_tree(path, ignore_errors=True)
+                        empty.add(get_parent(file))
+                        file = next(existing, None)
+                    else:
+                        self.log.count("skip")
+                        last = record[0]
+                        created = get_parent(record[0])
+                        record = next(planned, None)
+                        file = next(existing, None)
+                        self.increment_progress(increment_song)
+            with self.metrics.phase("transcode"):
+                self.transcode_songs()
+        finally:
+            remove_runs(runs)
+            rmdir(folder)
+        with self.metrics.phase("cleanup"):
+            # Album folders first, and then artist folders
+            albums = [path for path in empty if SEPARATOR in path]
+            artists = empty.difference(albums)
+            for folders in [albums, artists]:
+                for path in sorted(folders):
+                    try:
+                        if not self.dir(self.destination_folder + SEPARATOR + path):
+                            self.remove_tree(
+                                self.destination_folder + SEPARATOR + path,
+                                ignore_errors=True,
                             )
-            # Update progress bar
-            self.increment_progress(increment_song)
-        # Destination clean
-        for artist in dir(self.destination_folder):
+                            if SEPARATOR in path:
+                                artists.add(get_parent(path))
+                    except OSError:
+                        pass
+
+    def walk_destination(self, empty: set):
+        """It walks the songs files of the destination folder (the files and folders inside album folders), sorted as planned songs (see music_plan.get_key), listing one folder at a time.
+
+        Args:
+            empty (set): Empty artists and album folders are added to this set.
+
+        Yields:
+            str: Path to each file or folder, relative to the destination folder.
+        """
+        if not self.exists(self.destination_folder):
+            return
+        for artist in sorted(self.dir(self.destination_folder)):
+            try:
+                albums = sorted(self.dir(self.destination_folder + SEPARATOR + artist))
+            except OSError:  # Files out of artists folders are kept
+                continue
+            if not albums:
+                empty.add(artist)
+            for album in albums:
+                folder = artist + SEPARATOR + album
+                try:
+                    files = sorted(
+                        self.dir(self.destination_folder + SEPARATOR + folder)
+                    )
+                except OSError:
+                    continue
+                if not files:
+                    empty.add(folder)
+                for file in files:
+                    yield folder + SEPARATOR + file
+
+    def update_songs(self, songs: list) -> None:
+        """It copies the songs files that are missing or outdated (with a different size or an older modification time) in the destination folder, without checking the rest of the library.
+
+        Args:
+            songs (list): Songs to be updated.
+        """
+        for song in songs:
+            source_file = self.get_source_path(song)
+            destination_file = (
+                self.destination_folder + SEPARATOR + self.get_destination_file(song)
+            )
+            try:
+                source = self.stat(source_file)
+            except OSError:
+                self.report_error(
+                    song, "Song not found in the source folder (" + source_file + ")"
+                )
+                continue
+            try:
+                destination = self.stat(destination_file)
+                # Transcoded files have their own size
+                if (
+                    destination.st_size == source.st_size or song.format in self.formats
+                ) and destination.st_mtime >= source.st_mtime:
+                    self.log.count("skip")
+                    continue
+                # Hard linked files would be overwritten too
+                if destination.st_nlink > 1:
+                    self.remove(destination_file)
+            except OSError:
+                folder = self.destination_folder + SEPARATOR + get_folder_path(song)
+                if not self.exists(folder):
+                    self.create_dir(folder)
+            if song.format in self.formats:
+                self.jobs.append((song, source_file, destination_file))
+                continue
+            try:
+                self.copy(source_file, destination_file)
+            except OSError:
+                self.report_error(
+                    song,
+                    "Song could not be copied (from "
+                    + source_file
+                    + " to "
+                    + destination_file
+                    + ")",
+                )
+        self.transcode_songs()
+
+    def remove_songs(self, files: list) -> None:
+        """It removes songs files from the destination folder, and their album and artist folders if they become empty, without checking the rest of the library.
+
+        Args:
+            files (list): Songs files paths, relative to the destination folder.
+        """
+        for file in files:
+            path = self.destination_folder + SEPARATOR + file
+            if self.exists(path):
+                self.remove(path)
+            # Empty album and artist folders
+            folders = file.split(SEPARATOR)[:-1]
+            while folders:
+                folder = self.destination_folder + SEPARATOR + SEPARATOR.join(folders)
+                if not self.exists(folder) or self.dir(folder):
+                    break
+                self.remove_tree(folder, ignore_errors=True)
+                folders.pop()
+
+    def get_source_file(self, song: Song) -> str:
+        """It gets the path to a song file in the source folder: its path in the library, or a path built from its metadata if the library does not have it (iTunes shortens the paths on Windows).
+
+        Args:
+            song (Song): Song object.
+
+        Returns:
+            str: Path to the song file, relative to the source folder.
+        """
+        if song.path is not None:
+            return song.path
+        return get_file_path(song, self.source_language == "iTunes" and IS_WINDOWS)
+
+    def get_destination_file(self, song: Song) -> str:
+        """It gets the path to a song file in the destination folder, with the file format extension of its transcoded file if it is transcoded.
+
+        Args:
+            song (Song): Song object.
+
+        Returns:
+            str: Path to the song file, relative to the destination folder.
+        """
+        return get_file_path(song, format=self.formats.get(song.format))
+
+    def get_source_path(self, song: Song) -> str:
+        """It gets the absolute path to a song file: its own location, or its path in the source folder.
+
+        Args:
+            song (Song): Song object.
+
+        Returns:
+            str: Absolute path to the song file.
+        """
+        if song.location:
+            return song.location
+        return self.source_folder + SEPARATOR + self.get_source_file(song)
+
+    def clean_destination(
+        self,
+        artists: set,
+        albums: dict,
+        songs: dict,
+        increment_artist: float = 0,
+        folders: list = None,
+    ) -> None:
+        """It removes the files and folders of the destination folder that do not belong to the library.
+
+        Args:
+            artists (set): Folder paths to library artists (see copy_songs).
+            albums (dict): Folder paths to library albums by artist (see copy_songs).
+            songs (dict): File paths to library songs by artist and album (see copy_songs).
+            increment_artist (float, optional): Progress percent number to increment for each artist folder. Defaults to 0.
+            folders (list, optional): Artists folders to be cleaned. Defaults to None, so every folder of the destination folder is cleaned.
+        """
+        if folders is None:
+            folders = self.dir(self.destination_folder)
+        else:
+            folders = [
+                artist
+                for artist in folders
+                if self.exists(self.destination_folder + SEPARATOR + artist)
+            ]
+        for artist in folders:
             if not artist in artists:
-                remove_tree(
+                self.remove_tree(
                     self.destination_folder + SEPARATOR + artist, ignore_errors=True
                 )
             else:
-                for album in dir(self.destination_folder + SEPARATOR + artist):
+                for album in self.dir(self.destination_folder + SEPARATOR + artist):
                     album_path = artist + SEPARATOR + album
                     if not album_path in albums[artist]:
-                        remove_tree(
+                        self.remove_tree(
                             self.destination_folder + SEPARATOR + album_path,
                             ignore_errors=True,
                         )
                     else:
-                        for song in dir(
+                        for song in self.dir(
                             self.destination_folder + SEPARATOR + album_path
                         ):
                             song_path = album_path + SEPARATOR + song
                             if not song_path in songs[artist][album_path]:
-                                remove(self.destination_folder + SEPARATOR + song_path)
+                                self.remove(
+                                    self.destination_folder + SEPARATOR + song_path
+                                )
             # Update progress bar
             self.increment_progress(increment_artist)
-        print("Songs synced")
 
     def sync_playlists(self, progress_weight: float = 1) -> None:
         """It updates the playlists in the destination folder according to the source music library.
@@ -173,73 +975,302 @@ class Sync:
             progress_weight (float, optional): Part of total that represents this sync process in the progress bar from the graphical user interface (1 means the whole progress bar and 0.5 means half of it).
         """
         print("Syncing playlists")
-        increment_playlist = int(progress_weight / len(self.library.playlists))
-        ENCODING = "utf-8"  # File encoding
-        EXTENSION = ".m3u"  # Generic playlist file extension
-        # Remove all prexisting playlists files from the destination folder
-        if exists(self.destination_folder):
-            for playlist in dir(self.destination_folder):
-                if playlist.endswith(EXTENSION):
-                    remove(join(self.destination_folder, playlist))
+        increment_playlist = int(progress_weight / max(len(self.library.playlists), 1))
+        if not self.exists(self.destination_folder):
+            self.create_dir(self.destination_folder)
+        # Language = Generic
+        if self.destination_playlists is None:
+            playlists_files = get_playlists_files(self.library.playlists)
+            # Remove the playlists files that no longer belong to any playlist
+            current_files = set(playlists_files)
+            for file_name in self.dir(self.destination_folder):
+                if (
+                    file_name.endswith(PLAYLIST_EXTENSION)
+                    and not file_name in current_files
+                ):
+                    self.remove(join(self.destination_folder, file_name))
+            for playlist, file_name in zip(self.library.playlists, playlists_files):
+                playlist_path = self.destination_folder + SEPARATOR + file_name
+                try:
+                    # Rewrite the playlist file only if its content has changed, so untouched files keep their modification time
+                    size, digest = get_lines_fingerprint(
+                        playlist.iter_files(formats=self.formats)
+                    )
+                    if (
+                        not self.exists(playlist_path)
+                        or self.getsize(playlist_path) != size
+                        or self.digest(playlist_path) != digest
+                    ):
+                        with self.filesystem.open_write(playlist_path) as playlist_file:
+                            for index, file in enumerate(
+                                playlist.iter_files(formats=self.formats)
+                            ):
+                                if index:
+                                    playlist_file.write("\n")
+                                playlist_file.write(file)
+                except:
+                    self.report_error(
+                        playlist,
+                        "Playlist could not be created (" + playlist_path + ")",
+                    )
+                # Update progress bar
+                self.increment_progress(increment_playlist)
+        # Language = Rhythmbox
         else:
-            create_dir(self.destination_folder)
-        if self.destination_playlists:
-            if exists(self.destination_playlists):
-                remove(self.destination_playlists)
-        # Create playlist file
-        if self.destination_playlists:
-            playlist_file = open(
-                self.destination_playlists, mode="w", encoding=ENCODING
+            # Remove all prexisting generic playlists files from the destination folder
+            for playlist_file in self.dir(self.destination_folder):
+                if playlist_file.endswith(PLAYLIST_EXTENSION):
+                    self.remove(join(self.destination_folder, playlist_file))
+            # The playlists file is written aside and then swapped in, so Rhythmbox never finds it half written
+            with self.filesystem.open_write(
+                self.destination_playlists
+            ) as playlist_file:
+                playlist_file.write('<?xml version="1.0"?>\n<rhythmdb-playlists>')
+                for playlist in self.library.playlists:
+                    write_rhythmbox_playlist(
+                        playlist_file, playlist, self.destination_folder, self.formats
+                    )
+                    # Update progress bar
+                    self.increment_progress(increment_playlist)
+                playlist_file.write("\n</rhythmdb-playlists>")
+        print("Playlist synced")
+
+    def exists(self, path: str) -> bool:
+        """It checks if a file or folder exists, counting it in the metrics.
+
+        Args:
+            path (str): Path to the file or folder.
+
+        Returns:
+            bool: True if it exists.
+        """
+        self.metrics.count("stat")
+        return self.filesystem.exists(path)
+
+    def stat(self, path: str) -> stat_result:
+        """It gets the status of a file or folder, counting it in the metrics.
+
+        Args:
+            path (str): Path to the file or folder.
+
+        Returns:
+            stat_result: File or folder status.
+        """
+        self.metrics.count("stat")
+        return self.filesystem.stat(path)
+
+    def getsize(self, file: str) -> int:
+        """It gets the size of a file, counting it in the metrics.
+
+        Args:
+            file (str): Path to the file.
+
+        Returns:
+            int: File size in bytes.
+        """
+        self.metrics.count("stat")
+        return self.filesystem.getsize(file)
+
+    def dir(self, folder: str) -> list:
+        """It lists the content of a folder, counting it in the metrics.
+
+        Args:
+            folder (str): Path to the folder.
+
+        Returns:
+            list: Names of the files and folders inside.
+        """
+        self.metrics.count("listdir")
+        return self.filesystem.listdir(folder)
+
+    def scan(self, folder: str) -> dict:
+        """It gets the sizes of the files of a folder while it is listed, counting it in the metrics.
+
+        Args:
+            folder (str): Path to the folder.
+
+        Returns:
+            dict: File size in bytes and inode number by name.
+        """
+        self.metrics.count("listdir")
+        return self.filesystem.scan(folder)
+
+    def free_space(self, folder: str) -> int:
+        """It gets the free space of the device of a folder, counting it in the metrics.
+
+        Args:
+            folder (str): Path to the folder.
+
+        Returns:
+            int: Free space in bytes, or None if it is unknown.
+        """
+        self.metrics.count("stat")
+        return self.filesystem.free_space(folder)
+
+    def create_dir(self, folder: str) -> None:
+        """It creates a folder and its parent folders, counting it in the metrics.
+
+        Args:
+            folder (str): Path to the folder.
+        """
+        self.metrics.count("mkdir")
+        self.filesystem.makedirs(folder)
+
+    def copy(self, source: str, destination: str) -> None:
+        """It copies a file, adding its size and copy time to the metrics.
+
+        Args:
+            source (str): Path to the source file.
+            destination (str): Path to the destination file.
+        """
+        start = perf_counter()
+        self.filesystem.copy(source, destination)
+        seconds = perf_counter() - start
+        size = self.getsize(destination)
+        self.metrics.add_copy(destination, size, seconds)
+        self.log.add("copy", file=destination, size=size, seconds=seconds)
+
+    def link(self, source: str, destination: str) -> None:
+        """It creates a hard link to a file instead of copying it, adding its size to the metrics.
+
+        Args:
+            source (str): Path to the existing file.
+            destination (str): Path to the new link.
+        """
+        self.filesystem.link(source, destination)
+        size = self.getsize(destination)
+        self.metrics.add_link(size)
+        self.log.add("link", file=destination, size=size)
+
+    def remove(self, file: str) -> None:
+        """It removes a file, counting it in the metrics.
+
+        Args:
+            file (str): Path to the file.
+        """
+        self.metrics.count("remove")
+        self.filesystem.remove(file)
+        self.log.add("remove", file=file)
+
+    def remove_tree(self, folder: str, ignore_errors: bool = False) -> None:
+        """It removes a folder and its content, counting it in the metrics.
+
+        Args:
+            folder (str): Path to the folder.
+            ignore_errors (bool, optional): If True, errors are ignored. Defaults to False.
+        """
+        self.metrics.count("remove")
+        self.filesystem.remove_tree(folder, ignore_errors=ignore_errors)
+        # Ignored errors can leave the folder (or the file) in place
+        if not ignore_errors or not self.filesystem.exists(folder):
+            self.log.add("remove", folder=folder)
+
+    def digest(self, file: str) -> str:
+        """It gets the SHA-1 digest of a file content.
+
+        Args:
+            file (str): Path to the file.
+
+        Returns:
+            str: SHA-1 digest of the file content.
+        """
+        with self.filesystem.open_read(file) as content:
+            return get_file_digest(content)
+
+    def write_log(self, file_name: str) -> None:
+        """It writes the log file of the last sync process, with the songs and playlists that could not be synced, reading their events one at a time (see music_log.EventLog.iter_events). Without an events file, only the last errors are kept.
+
+        Args:
+            file_name (str): Path to the log file.
+        """
+        log = open(file_name, "w")
+        log.write(
+            "Sync process was completed at "
+            + str(datetime.now())
+            + " with the following errors:\n"
+        )
+        for event in self.log.iter_events("error"):
+            if "song" in event:
+                log.write("\n" + event["song"])
+            elif "playlist" in event:
+                log.write("\nPlaylist: " + event["playlist"])
+        kept = len(self.log.recent["error"])
+        if not self.events and self.log.counters["error"] > kept:
+            log.write(
+                "\n\n("
+                + str(self.log.counters["error"] - kept)
+                + " older error(s) were not kept)"
             )
-            playlist_file.write('<?xml version="1.0"?>\n<rhythmdb-playlists>')
-        # Fill playlists files
-        for playlist in self.library.playlists:
-            # Language = Generic
-            if self.destination_playlists is None:
-                playlist_path = (
-                    self.destination_folder
-                    + SEPARATOR
-                    + replace_special_characters(playlist.name)
-                    + EXTENSION
-                )
+        log.close()
+
+    def write_metrics(self, file_name: str) -> None:
+        """It writes the performance metrics of the last sync process as a JSON file.
+
+        Args:
+            file_name (str): Path to the JSON file.
+        """
+        self.metrics.write(file_name)
+
+    def sync_database(self) -> None:
+        """It writes the destination Rhythmbox library XML file with the songs that were synced, streaming one entry at a time into a temporary file that then replaces it."""
+        print("Syncing library")
+        with self.filesystem.open_write(self.destination_database) as file:
+            file.write(
+                '<?xml version="1.0" standalone="yes"?>\n<rhythmdb version="2.0">'
+            )
+            for song in self.library.songs:
+                # Songs that could not be synced have no file
                 try:
-                    # Create a playlist file only if it doesn't exist and add the song path to this file
-                    if exists(playlist_path):
-                        mode = "a"  # Editing mode
-                    else:
-                        mode = "w"  # Creation mode
-                    playlist_file = open(
-                        playlist_path,
-                        mode=mode,
-                        encoding=ENCODING,
+                    status = self.stat(
+                        self.destination_folder
+                        + SEPARATOR
+                        + self.get_destination_file(song)
                     )
-                    playlist_file.write("\n".join(playlist.get_files()))
-                    playlist_file.close()
-                except:
-                    self.errors.append(playlist)
-                    print("Playlist could not be created (" + playlist_path + ")")
-            # Language = Rhythmbox
-            else:
-                playlist_file.write(
-                    '\n  <playlist name="'
-                    + str2html(playlist.name)
-                    + '" show-browser="true" browser-position="'
-                    + str(playlist.id)
-                    + '" search-type="search-match" type="static">'
-                    + "\n    <location>"
-                    + "</location>\n    <location>".join(
-                        playlist.get_urls(folder=self.destination_folder)
+                except OSError:
+                    continue
+                file.write('\n  <entry type="song">')
+                for tag in DATABASE_TAGS:
+                    value = getattr(song, DATABASE_TAGS[tag])
+                    if value is not None:
+                        file.write(
+                            "\n    <"
+                            + tag
+                            + ">"
+                            + str2html(str(value), quote=False)
+                            + "</"
+                            + tag
+                            + ">"
+                        )
+                if song.year:
+                    # Julian day of the first day of the year
+                    file.write(
+                        "\n    <date>"
+                        + str(date(song.year, 1, 1).toordinal())
+                        + "</date>"
+                    )
+                file.write(
+                    "\n    <location>"
+                    + get_url(
+                        song, self.destination_folder, self.formats.get(song.format)
                     )
                     + "</location>"
-                    + "\n  </playlist>"
                 )
-            # Update progress bar
-            self.increment_progress(increment_playlist)
-        # Close playlist file
-        if self.destination_playlists:
-            playlist_file.write("\n</rhythmdb-playlists>")
-            playlist_file.close()
-        print("Playlist synced")
+                # Rhythmbox does not read the file again if its size and modification time do not change
+                file.write(
+                    "\n    <file-size>"
+                    + str(status.st_size)
+                    + "</file-size>\n    <mtime>"
+                    + str(int(status.st_mtime))
+                    + "</mtime>"
+                )
+                format = self.formats.get(song.format, song.format)
+                if format in MEDIA_TYPES:
+                    file.write(
+                        "\n    <media-type>" + MEDIA_TYPES[format] + "</media-type>"
+                    )
+                file.write("\n  </entry>")
+            file.write("\n</rhythmdb>\n")
+        print("Library synced")
 
     def set_progress(self, progress: int) -> None:
         """It sets the progress bar to an specific percent number.
@@ -260,3 +1291,157 @@ class Sync:
         if self.window:
             self.window["progress"]["value"] += progress
             self.window["root"].update()
+
+
+def sync_shard(
+    source_language: str,
+    source_folder: str,
+    destination_folder: str,
+    songs: list,
+    folders: list,
+    events: str = None,
+) -> tuple:
+    """It syncs the songs files of some artists folders (in a worker process, see Sync.sync_shards).
+
+    Args:
+        source_language (str): Library language for the source XML files.
+        source_folder (str): Absolute folder path to the source music folder.
+        destination_folder (str): Absolute folder path to the destination music folder.
+        songs (list): Songs of the artists.
+        folders (list): Artists folders.
+        events (str, optional): Absolute file path to the events JSON lines file, where the events of the shard are appended too. Defaults to None.
+
+    Returns:
+        tuple: Indexes of the last songs that could not be synced (list), performance metrics (Metrics), events counters (dict) and last events (list).
+    """
+    library = Library()
+    for song in songs:
+        library.add_song(song)
+    with redirect_stdout(None):
+        process = Sync(
+            source_language,
+            None,
+            source_folder,
+            destination_folder,
+            library=library,
+            events=events,
+        )
+        process.open_log()
+    try:
+        artists, albums, files = process.copy_songs()
+        process.clean_destination(artists, albums, files, folders=folders)
+    finally:
+        process.log.close()
+    errors = {id(song) for song in process.errors}
+    return (
+        [index for index, song in enumerate(songs) if id(song) in errors],
+        process.metrics,
+        process.log.counters,
+        process.log.get_recent(),
+    )
+
+
+def get_shards(artists: dict, number: int) -> list:
+    """It partitions the artists in shards with similar numbers of songs (the artists with more songs are assigned first to the shard with less songs).
+
+    Args:
+        artists (dict): Songs by artist folder.
+        number (int): Maximum number of shards.
+
+    Returns:
+        list: Songs (list) and artists folders (list) of each shard.
+    """
+    shards = [([], []) for shard in range(min(number, len(artists)))]
+    for artist in sorted(artists, key=lambda artist: -len(artists[artist])):
+        songs, folders = min(shards, key=lambda shard: len(shard[0]))
+        songs += artists[artist]
+        folders.append(artist)
+    return shards
+
+
+def write_rhythmbox_playlist(
+    file, playlist: Playlist, folder: str, formats: dict = None
+) -> None:
+    """It writes a playlist as a Rhythmbox XML element, one location at a time, so no long string is built for the whole playlist.
+
+    Args:
+        file (TextIOWrapper): Opened Rhythmbox playlists XML file.
+        playlist (Playlist): Playlist to be written.
+        folder (str): Music folder path where the songs files are.
+        formats (dict, optional): File format extension of the songs files by their own format (for transcoded songs). Defaults to None.
+    """
+    file.write(
+        '\n  <playlist name="'
+        + str2html(playlist.name)
+        + '" show-browser="true" browser-position="'
+        + str(playlist.id)
+        + '" search-type="search-match" type="static">'
+    )
+    for url in playlist.iter_urls(folder, formats):
+        file.write("\n    <location>")
+        file.write(url)
+        file.write("</location>")
+    file.write("\n  </playlist>")
+
+
+def get_playlists_files(playlists: list) -> list:
+    """It gets the generic playlist file name of each playlist. When several playlists names are the same once special characters are replaced (ignoring the case, as FAT and exFAT do), the playlist with the lowest ID keeps the name and the others get their ID appended, so the names do not depend on the playlists order.
+
+    Args:
+        playlists (list): List of Playlist objects.
+
+    Returns:
+        list: Playlist file names (relative to the music folder), in the same order as the playlists.
+    """
+    names = {}  # Playlists indexes by case folded replaced name
+    for index, playlist in enumerate(playlists):
+        name = replace_special_characters(playlist.name).casefold()
+        if not name in names:
+            names[name] = []
+        names[name].append(index)
+    files = [None] * len(playlists)
+    for name in names:
+        indexes = sorted(names[name], key=lambda index: (playlists[index].id, index))
+        for order, index in enumerate(indexes):
+            file = replace_special_characters(playlists[index].name)
+            if order:
+                # Appended ID could match another playlist name
+                while file.casefold() in names:
+                    file += " (" + str(playlists[index].id) + ")"
+            files[index] = file + PLAYLIST_EXTENSION
+    return files
+
+
+def get_lines_fingerprint(lines) -> tuple:
+    """It gets the fingerprint of a text made of lines separated by new line characters, without building the whole text.
+
+    Args:
+        lines (iterable): Text lines.
+
+    Returns:
+        tuple: Size in bytes and SHA-1 digest of the text.
+    """
+    digest = sha1()
+    size = 0
+    for index, line in enumerate(lines):
+        if index:
+            line = "\n" + line
+        line = line.encode(ENCODING)
+        digest.update(line)
+        size += len(line)
+    return size, digest.hexdigest()
+
+
+def get_file_digest(file) -> str:
+    """It gets the SHA-1 digest of a file content, reading it by blocks.
+
+    Args:
+        file (BufferedReader): File object opened in binary mode.
+
+    Returns:
+        str: SHA-1 digest of the file content.
+    """
+    digest = sha1()
+    for block in iter(lambda: file.read(BUFFER_SIZE), b""):
+        digest.update(block)
+    return digest.hexdigest()
@@ -0,0 +1,115 @@
+import os
+import json
+from hashlib import sha1
+from shutil import copy2 as copy
+from subprocess import run, DEVNULL
+from tempfile import mkstemp
+
+ENCODER = [
+    "ffmpeg",
+    "-loglevel",
+    "error",
+    "-y",
+    "-i",
+    "{source}",
+    "-b:a",
+    "{bitrate}k",
+    "{destination}",
+]  # Default encoder command ({source}, {destination}, {format} and {bitrate} are replaced)
+
+
+def get_cache_file(
+    source: str, format: str, bitrate: int, encoder: list, folder: str
+) -> str:
+    """It gets the path to the cached output of a song file, keyed by the source file fingerprint (path, size and modification time) and the transcoding settings, so it changes when any of them changes.
+
+    Args:
+        source (str): Path to the source file.
+        format (str): Target file format extension.
+        bitrate (int): Target bitrate in kbit/s.
+        encoder (list): Encoder command template.
+        folder (str): Cache folder path.
+
+    Returns:
+        str: Path to the cached file.
+    """
+    status = os.stat(source)
+    key = json.dumps(
+        [source, status.st_size, status.st_mtime_ns, format, bitrate, encoder]
+    )
+    return os.path.join(folder, sha1(key.encode("utf-8")).hexdigest() + "." + format)
+
+
+def transcode_file(
+    source: str,
+    destination: str,
+    format: str,
+    bitrate: int,
+    encoder: list = ENCODER,
+    cache: str = None,
+) -> bool:
+    """It transcodes a song file with an external encoder command. The output is written aside and then renamed, so an interrupted encoder never leaves a partial destination file. If there is a cache folder, outputs are kept there and reused while the source file and the settings do not change.
+
+    Args:
+        source (str): Path to the source file.
+        destination (str): Path to the destination file.
+        format (str): Target file format extension.
+        bitrate (int): Target bitrate in kbit/s.
+        encoder (list, optional): Encoder command template (see ENCODER). Defaults to ENCODER.
+        cache (str, optional): Cache folder path. Defaults to None, so outputs are not cached.
+
+    Returns:
+        bool: True if the output was found in the cache.
+    """
+    cache_file = None
+    if cache:
+        cache_file = get_cache_file(source, format, bitrate, encoder, cache)
+        if os.path.exists(cache_file):
+            copy_file(cache_file, destination)
+            return True
+    # Encoders choose the output format by its extension
+    handle, temporary = mkstemp(
+        prefix=".", suffix="." + format, dir=os.path.dirname(destination)
+    )
+    os.close(handle)
+    try:
+        run(
+            [
+                argument.format(
+                    source=source,
+                    destination=temporary,
+                    format=format,
+                    bitrate=bitrate,
+                )
+                for argument in encoder
+            ],
+            stdin=DEVNULL,
+            capture_output=True,
+            check=True,
+        )
+        if cache_file:
+            os.makedirs(cache, exist_ok=True)
+            copy_file(temporary, cache_file)
+        os.replace(temporary, destination)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+    return False
+
+
+def copy_file(source: str, destination: str) -> None:
+    """It copies a file aside and then renames it, so the destination file is never partially written.
+
+    Args:
+        source (str): Path to the source file.
+        destination (str): Path to the destination file.
+    """
+    handle, temporary = mkstemp(prefix=".", dir=os.path.dirname(destination))
+    os.close(handle)
+    try:
+        copy(source, temporary)
+        os.replace(temporary, destination)
+    except BaseException:
+        os.remove(temporary)
+        raise
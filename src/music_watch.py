@@ -0,0 +1,475 @@
+import os
+import struct
+import ctypes
+import ctypes.util
+from select import select
+from time import monotonic, sleep
+from src.music_sync import *
+
+DEBOUNCE = 5  # Seconds without changes before syncing
+MAX_DELAY = 60  # Maximum seconds between the first change and the sync
+INTERVAL = 10  # Seconds between checks when polling
+EVENTS = (
+    0x00000008  # IN_CLOSE_WRITE
+    | 0x00000040  # IN_MOVED_FROM
+    | 0x00000080  # IN_MOVED_TO
+    | 0x00000100  # IN_CREATE
+    | 0x00000200  # IN_DELETE
+)  # inotify events that are watched
+IN_Q_OVERFLOW = 0x00004000  # inotify event when some events were lost
+IN_ISDIR = 0x40000000  # inotify flag for events about folders
+# inotify event: watch, mask, cookie and name length
+EVENT_HEADER = struct.Struct("iIII")
+
+
+class PollingWatcher:
+    """Class to watch files and folders by checking their modification times. Only the folders are checked inside the watched folders (their modification times change when files are added, removed or renamed), so files rewritten in place are only found if they are watched files too (see Watch, which watches the files of the synced songs)."""
+
+    def __init__(self, files: list, folders: list, interval: float = INTERVAL) -> None:
+        """Constructor for PollingWatcher class.
+
+        Args:
+            files (list): Paths to the watched files.
+            folders (list): Paths to the watched folders (with their subfolders).
+            interval (float, optional): Seconds between checks. Defaults to INTERVAL.
+        """
+        self.files = files
+        self.folders = folders
+        self.interval = interval
+        self.times = self.get_times()
+
+    def get_times(self) -> dict:
+        """It gets the modification times of the watched files and folders.
+
+        Returns:
+            dict: Modification time and size by path.
+        """
+        times = {file: get_time(file) for file in self.files}
+        folders = list(self.folders)
+        while folders:
+            folder = folders.pop()
+            try:
+                with os.scandir(folder) as entries:
+                    times[folder] = (os.stat(folder).st_mtime_ns, 0)
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            folders.append(entry.path)
+            except OSError:
+                times[folder] = None
+        return times
+
+    def set_files(self, files: list) -> None:
+        """It changes the watched files. The new files are compared from now on, and the files that are not watched any longer are forgotten.
+
+        Args:
+            files (list): Paths to the watched files.
+        """
+        for file in set(self.files) - set(files):
+            self.times.pop(file, None)
+        for file in set(files) - set(self.files):
+            self.times[file] = get_time(file)
+        self.files = files
+
+    def wait(self, timeout: float = None) -> set:
+        """It waits for changes.
+
+        Args:
+            timeout (float, optional): Maximum seconds to wait. Defaults to None, so it waits until something changes.
+
+        Returns:
+            set: Paths to the changed files and folders (empty if nothing changed before the timeout).
+        """
+        end = None if timeout is None else monotonic() + timeout
+        while True:
+            delay = self.interval
+            if end is not None:
+                delay = min(delay, max(0, end - monotonic()))
+            sleep(delay)
+            times = self.get_times()
+            changes = {
+                path
+                for path in set(times) | set(self.times)
+                if times.get(path) != self.times.get(path)
+            }
+            self.times = times
+            if changes or (end is not None and monotonic() >= end):
+                return changes
+
+    def close(self) -> None:
+        """It stops watching."""
+
+
+class InotifyWatcher:
+    """Class to watch files and folders with inotify (only on Linux)."""
+
+    def __init__(self, files: list, folders: list) -> None:
+        """Constructor for InotifyWatcher class. It raises OSError if inotify is not available.
+
+        Args:
+            files (list): Paths to the watched files (their folders are watched, because files are usually replaced instead of rewritten).
+            folders (list): Paths to the watched folders (with their subfolders).
+        """
+        library = ctypes.util.find_library("c")
+        self.libc = ctypes.CDLL(library, use_errno=True)
+        if not hasattr(self.libc, "inotify_init1"):
+            raise OSError("inotify is not available")
+        self.descriptor = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.descriptor < 0:
+            raise OSError(ctypes.get_errno(), "inotify could not be started")
+        self.watches = {}  # Folder path by watch descriptor
+        self.files = set(files)
+        try:
+            for file in files:
+                self.add_watch(os.path.dirname(os.path.abspath(file)))
+            for folder in folders:
+                for path, subfolders, names in os.walk(folder):
+                    self.add_watch(path)
+        except OSError:
+            self.close()
+            raise
+
+    def add_watch(self, folder: str) -> None:
+        """It watches a folder.
+
+        Args:
+            folder (str): Path to the folder.
+        """
+        watch = self.libc.inotify_add_watch(
+            self.descriptor, os.fsencode(folder), EVENTS
+        )
+        if watch < 0:
+            raise OSError(ctypes.get_errno(), "Folder could not be watched", folder)
+        self.watches[watch] = folder
+
+    def wait(self, timeout: float = None) -> set:
+        """It waits for changes.
+
+        Args:
+            timeout (float, optional): Maximum seconds to wait. Defaults to None, so it waits until something changes.
+
+        Returns:
+            set: Paths to the changed files and folders (empty if nothing changed before the timeout). If some events were lost, it contains the watched folders.
+        """
+        changes = set()
+        ready, _, _ = select([self.descriptor], [], [], timeout)
+        if not ready:
+            return changes
+        try:
+            data = os.read(self.descriptor, 1 << 16)
+        except BlockingIOError:
+            return changes
+        offset = 0
+        while offset < len(data):
+            watch, mask, cookie, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = os.fsdecode(data[offset : offset + length].rstrip(b"\0"))
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                changes.update(self.watches.values())
+                continue
+            if not watch in self.watches:
+                continue
+            path = os.path.join(self.watches[watch], name)
+            changes.add(path)
+            # New folders are watched too
+            if mask & IN_ISDIR and mask & 0x00000180:  # IN_CREATE or IN_MOVED_TO
+                try:
+                    for folder, subfolders, names in os.walk(path):
+                        self.add_watch(folder)
+                except OSError:
+                    pass
+        return changes
+
+    def close(self) -> None:
+        """It stops watching."""
+        if self.descriptor >= 0:
+            os.close(self.descriptor)
+            self.descriptor = -1
+
+
+class Watch:
+    """Class to keep the destination folder synced while the source library changes."""
+
+    def __init__(
+        self,
+        process: Sync,
+        debounce: float = DEBOUNCE,
+        max_delay: float = MAX_DELAY,
+        interval: float = INTERVAL,
+        polling: bool = False,
+    ) -> None:
+        """Constructor for Watch class. It uses inotify when it is available, or polling otherwise.
+
+        Args:
+            process (Sync): Sync process, whose library has already been parsed.
+            debounce (float, optional): Seconds without changes before syncing. Defaults to DEBOUNCE.
+            max_delay (float, optional): Maximum seconds between the first change and the sync. Defaults to MAX_DELAY.
+            interval (float, optional): Seconds between checks when polling. Defaults to INTERVAL.
+            polling (bool, optional): If True, polling is used even if inotify is available. Defaults to False.
+        """
+        self.process = process
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.files = [os.path.abspath(file) for file in process.library.files]
+        self.index = None  # Songs by source path (see get_index)
+        self.watcher = None
+        if not polling:
+            try:
+                self.watcher = InotifyWatcher(self.files, [process.source_folder])
+            except (OSError, AttributeError):
+                print("inotify is not available, so polling is used.")
+        if self.watcher is None:
+            # Songs files rewritten in place do not change their folders
+            self.watcher = PollingWatcher(
+                self.files + self.get_song_files(),
+                [process.source_folder],
+                interval=interval,
+            )
+
+    def get_song_files(self) -> list:
+        """It gets the paths to the source files of the synced songs.
+
+        Returns:
+            list: Absolute paths to the songs files.
+        """
+        folder = os.path.abspath(self.process.source_folder)
+        return [
+            os.path.join(folder, self.process.get_source_file(song))
+            for song in self.process.library.songs
+        ]
+
+    def run(self, batches: int = None) -> None:
+        """It waits for changes and syncs them. If the changes cannot be synced (for example, while the library file is still being written), the error is printed and they are synced again with the next changes.
+
+        Args:
+            batches (int, optional): Number of syncs before returning. Defaults to None, so it never returns.
+        """
+        pending = set()  # Changes that could not be synced
+        try:
+            while batches is None or batches > 0:
+                changes = self.watcher.wait()
+                if not changes:
+                    continue
+                # Wait until the changes stop
+                start = monotonic()
+                while monotonic() - start < self.max_delay:
+                    more = self.watcher.wait(
+                        min(self.debounce, self.max_delay - (monotonic() - start))
+                    )
+                    if not more:
+                        break
+                    changes |= more
+                changes |= pending
+                try:
+                    self.sync(changes)
+                    pending = set()
+                except Exception as error:
+                    pending = changes
+                    print(
+                        "Changes could not be synced ("
+                        + str(error)
+                        + "), they are synced again with the next changes"
+                    )
+                if batches is not None:
+                    batches -= 1
+        finally:
+            self.watcher.close()
+
+    def sync(self, changes: set) -> dict:
+        """It syncs the songs, playlists and library affected by some changes. If it fails, the previous library is kept, so the same changes are found when they are synced again.
+
+        Args:
+            changes (set): Paths to the changed files and folders.
+
+        Returns:
+            dict: Numbers of updated, edited (with only new metadata) and removed songs, if the playlists were synced, and performance metrics (see Metrics.to_dict).
+        """
+        process = self.process
+        old = process.library
+        process.open_log()
+        try:
+            return self.sync_changes(changes)
+        except BaseException:
+            process.library = old
+            self.index = None
+            raise
+        finally:
+            process.log.close()
+
+    def sync_changes(self, changes: set) -> dict:
+        """It syncs the songs, playlists and library affected by some changes, with the log of the sync process already open (see sync).
+
+        Args:
+            changes (set): Paths to the changed files and folders.
+
+        Returns:
+            dict: Sync result (see sync).
+        """
+        process = self.process
+        process.metrics = Metrics()
+        songs = {}  # Songs to be updated by ID
+        edited = []  # Songs with only new metadata
+        removed = []  # Destination files to be removed
+        playlists = False  # If playlists must be synced
+        # Library files
+        if any(os.path.abspath(path) in self.files for path in changes):
+            old = process.library
+            with process.metrics.phase("parse"):
+                new = Library(old.files, language=process.source_language)
+            updated, edited, removed = get_changes(old, new, process.formats)
+            for song in updated:
+                songs[song.id] = song
+            playlists = get_playlists(old) != get_playlists(new)
+            process.library = new
+            self.index = None
+            if isinstance(self.watcher, PollingWatcher):
+                self.watcher.set_files(self.files + self.get_song_files())
+        # Music folder
+        folder = os.path.abspath(process.source_folder)
+        paths = [
+            os.path.relpath(os.path.abspath(path), folder).replace(os.sep, SEPARATOR)
+            for path in changes
+            if os.path.abspath(path).startswith(folder + os.sep)
+            or os.path.abspath(path) == folder
+        ]
+        if paths:
+            if self.index is None:
+                self.index = get_index(process)
+            for path in paths:
+                for song in self.index.get(path, []):
+                    songs[song.id] = song
+        with process.metrics.phase("songs"):
+            process.update_songs(list(songs.values()))
+        with process.metrics.phase("cleanup"):
+            process.remove_songs(removed)
+        if playlists:
+            with process.metrics.phase("playlists"):
+                process.sync_playlists(0)
+        if process.destination_database and (songs or edited or removed):
+            with process.metrics.phase("database"):
+                process.sync_database()
+        process.log.flush()
+        result = {
+            "updated": len(songs),
+            "edited": len(edited),
+            "removed": len(removed),
+            "playlists": playlists,
+            "errors": process.log.counters["error"],
+            "metrics": process.metrics.to_dict(),
+        }
+        print(
+            "Changes synced: "
+            + str(len(songs))
+            + " song(s) updated, "
+            + str(len(edited))
+            + " edited, "
+            + str(len(removed))
+            + " song(s) removed"
+            + (" and playlists synced" if playlists else "")
+        )
+        return result
+
+
+def get_time(file: str) -> tuple:
+    """It gets the modification time and size of a file, to find out if it changed.
+
+    Args:
+        file (str): Path to the file.
+
+    Returns:
+        tuple: Modification time (in nanoseconds) and size, or None if the file cannot be read.
+    """
+    try:
+        status = os.stat(file)
+        return status.st_mtime_ns, status.st_size
+    except OSError:
+        return None
+
+
+def get_changes(old: Library, new: Library, formats: dict = None) -> tuple:
+    """It gets the differences between two versions of a library that affect the destination folder.
+
+    Args:
+        old (Library): Previous library.
+        new (Library): Current library.
+        formats (dict, optional): File format extension of the songs files by their own format (for transcoded songs). Defaults to None.
+
+    Returns:
+        tuple: Songs that are new or have a new file path (list), songs that only have new metadata of the destination library (list, see DATABASE_TAGS) and destination files that do not belong to the library any longer (list, relative to the destination folder).
+    """
+    files = {
+        song.id: get_file_path(song, format=get_format(song.format, formats))
+        for song in old.songs
+    }
+    updated = []
+    edited = []
+    current = set()
+    for song in new.songs:
+        file = get_file_path(song, format=get_format(song.format, formats))
+        current.add(file)
+        if files.pop(song.id, None) != file:
+            updated.append(song)
+        elif get_metadata(song) != get_metadata(old.get_song(song.id)):
+            edited.append(song)
+    removed = [file for file in files.values() if not file in current]
+    # Songs whose file path changed
+    for song in updated:
+        previous = old.get_song(song.id)
+        if previous is None:
+            continue
+        file = get_file_path(previous, format=get_format(previous.format, formats))
+        if not file in current:
+            removed.append(file)
+    return updated, edited, removed
+
+
+def get_metadata(song: Song) -> list:
+    """It gets the metadata of a song that is written in the destination library, to be compared.
+
+    Args:
+        song (Song): Song object.
+
+    Returns:
+        list: Values of the song attributes (see DATABASE_TAGS) and year.
+    """
+    return [getattr(song, attribute) for attribute in DATABASE_TAGS.values()] + [
+        song.year
+    ]
+
+
+def get_playlists(library: Library) -> list:
+    """It gets the content of the playlists of a library, to be compared.
+
+    Args:
+        library (Library): Music library.
+
+    Returns:
+        list: ID, name and files of each playlist.
+    """
+    return [
+        (playlist.id, playlist.name, playlist.get_files())
+        for playlist in library.playlists
+    ]
+
+
+def get_index(process: Sync) -> dict:
+    """It gets the songs by source path (of file, album folder and artist folder).
+
+    Args:
+        process (Sync): Sync process.
+
+    Returns:
+        dict: List of songs by path, relative to the source folder.
+    """
+    index = {}
+    for song in process.library.songs:
+        file = process.get_source_file(song)
+        folders = file.split(SEPARATOR)
+        for level in range(1, len(folders) + 1):
+            path = SEPARATOR.join(folders[:level])
+            if not path in index:
+                index[path] = []
+            index[path].append(song)
+    # The whole music folder
+    index["."] = process.library.songs
+    return index
@@ -0,0 +1,70 @@
+import unittest
+from tempfile import TemporaryDirectory
+from test import *
+from src.music_arrays import *
+
+ATTRIBUTES = NUMBERS.keys() | set(CATEGORIES) | set(TEXTS)  # Stored song attributes
+
+
+def get_library(songs: int) -> Library:
+    """It gets a library with some songs, one of them with a long location, and a playlist.
+
+    Args:
+        songs (int): Number of songs.
+
+    Returns:
+        Library: Music library.
+    """
+    library = Library(None)
+    for id in range(songs):
+        library.add_song(
+            Song(
+                id,
+                title="Canción " + str(id),
+                artist="Artist " + str(id % 10),
+                album="Album " + str(id % 40),
+                genre="Rock" if id % 2 else None,
+                year=2000 + id % 20,
+                rating=id % 6,
+                path="Artist/Album/" + str(id) + ".mp3",
+            )
+        )
+    library.songs[1].location = "/" + "long folder/" * 100 + "song.mp3"
+    library.songs[2].title = ""
+    library.playlists.append(Playlist(1, "Some", songs=library.songs[::3]))
+    return library
+
+
+class TestArrays(unittest.TestCase):
+    def test_round_trip(self):
+        library = get_library(1000)
+        with TemporaryDirectory() as folder:
+            save_npz(library, folder + SEPARATOR + "library.npz")
+            loaded = load_npz(folder + SEPARATOR + "library.npz")
+        self.assertEqual(len(loaded.songs), len(library.songs))
+        for song, copy in zip(library.songs, loaded.songs):
+            for attribute in ATTRIBUTES:
+                self.assertEqual(getattr(copy, attribute), getattr(song, attribute))
+        self.assertIs(loaded.get_song_by_path(library.songs[5].path), loaded.songs[5])
+        self.assertEqual(
+            [song.id for song in loaded.playlists[0].get_songs()],
+            [song.id for song in library.playlists[0].get_songs()],
+        )
+
+    def test_texts_size(self):
+        library = get_library(1000)
+        arrays = to_arrays(library)
+        # One long location does not make the other songs values longer
+        self.assertEqual(
+            arrays["location"].nbytes, len(library.songs[1].location.encode())
+        )
+        self.assertLess(arrays["title"].nbytes, 20 * len(library.songs))
+
+    def test_count_by(self):
+        arrays = to_arrays(get_library(100))
+        self.assertEqual(count_by(arrays, "genre"), {"Rock": 50, None: 50})
+        self.assertEqual(count_by(arrays, "rating")[5], 16)
+
+
+if __name__ == "__main__":
+    unittest.main()
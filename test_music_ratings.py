@@ -0,0 +1,137 @@
+import io
+import plistlib
+import unittest
+from contextlib import redirect_stdout
+from tempfile import TemporaryDirectory
+from test import *
+from src.music_ratings import add_ratings, rewrite_entries
+
+ENTRIES = 3000  # Much more than one parser buffer (16 KiB)
+
+
+def write_database(file_name: str, entries: int) -> str:
+    """It writes a Rhythmbox library XML file with some song entries.
+
+    Args:
+        file_name (str): Path to the Rhythmbox library XML file.
+        entries (int): Number of entries.
+
+    Returns:
+        str: Content of the file.
+    """
+    content = (
+        '<?xml version="1.0" standalone="yes"?>\n<rhythmdb version="2.0">\n  '
+        + "\n  ".join(
+            '<entry type="song">\n    <title>Song '
+            + str(number)
+            + "</title>\n    <rating>1</rating>\n    <location>"
+            + get_location(number)
+            + "</location>\n  </entry>"
+            for number in range(entries)
+        )
+        + "\n</rhythmdb>\n"
+    )
+    with open(file_name, mode="w", encoding=ENCODING) as file:
+        file.write(content)
+    return content
+
+
+def get_location(number: int) -> str:
+    """It gets the location of a song entry.
+
+    Args:
+        number (int): Entry number.
+
+    Returns:
+        str: Location URL.
+    """
+    return "file:///music/" + str(number) + ".mp3"
+
+
+class TestRewriteEntries(unittest.TestCase):
+    def test_formatting_is_kept(self):
+        with TemporaryDirectory() as folder:
+            file_name = folder + SEPARATOR + "rhythmdb.xml"
+            content = write_database(file_name, ENTRIES)
+            counter = rewrite_entries(file_name, {})
+            with open(file_name, mode="r", encoding=ENCODING) as file:
+                self.assertEqual(file.read(), content)
+        self.assertEqual(counter, {"edited": 0, "added": 0})
+
+    def test_patched_entries(self):
+        with TemporaryDirectory() as folder:
+            file_name = folder + SEPARATOR + "rhythmdb.xml"
+            content = write_database(file_name, ENTRIES)
+            patches = {
+                get_location(number): {"rating": "5", "play-count": "2"}
+                for number in range(ENTRIES)
+            }
+            counter = rewrite_entries(file_name, patches)
+            with open(file_name, mode="r", encoding=ENCODING) as file:
+                rewritten = file.read()
+        self.assertEqual(counter, {"edited": ENTRIES, "added": ENTRIES})
+        self.assertNotIn("</entry><entry", rewritten)
+        self.assertEqual(rewritten.count("\n  <entry"), ENTRIES)
+        self.assertEqual(
+            rewritten,
+            content.replace("<rating>1</rating>", "<rating>5</rating>").replace(
+                "</location>\n  </entry>",
+                "</location>\n    <play-count>2</play-count>\n  </entry>",
+            ),
+        )
+
+
+class TestAddRatings(unittest.TestCase):
+    def test_fuzzy_matches_of_the_same_song(self):
+        songs = [
+            ("The Beatles", "Abbey Road", "Something"),
+            ("Beatles", "Abbey Road", "Something"),
+            ("Queen", "A Night at the Opera", "Love of My Life"),
+            ("Queen.", "A Night at the Opera", "Love Of My Life"),
+            ("Nirvana", "Nevermind", "Lithium"),
+        ]
+        entries = [songs[0], ("Queen", "A Night At The Opera", "Love of my Life")]
+        entries.append(("Nirvana", "Nevermind", "Lithium!"))
+        with TemporaryDirectory() as folder:
+            source = folder + SEPARATOR + "iTunes Music Library.xml"
+            tracks = {
+                str(id): {
+                    "Track ID": id,
+                    "Artist": artist,
+                    "Album": album,
+                    "Name": title,
+                    "Rating": 100,
+                }
+                for id, (artist, album, title) in enumerate(songs, start=1)
+            }
+            with open(source, mode="wb") as file:
+                plistlib.dump({"Tracks": tracks, "Playlists": []}, file)
+            destination = folder + SEPARATOR + "rhythmdb.xml"
+            with open(destination, mode="w", encoding=ENCODING) as file:
+                file.write(
+                    '<?xml version="1.0" standalone="yes"?>\n<rhythmdb version="2.0">'
+                    + "".join(
+                        '<entry type="song"><title>'
+                        + title
+                        + "</title><artist>"
+                        + artist
+                        + "</artist><album>"
+                        + album
+                        + "</album><location>"
+                        + get_location(number)
+                        + "</location></entry>"
+                        for number, (artist, album, title) in enumerate(entries)
+                    )
+                    + "</rhythmdb>\n"
+                )
+            with redirect_stdout(io.StringIO()):
+                report = add_ratings(source, destination, fuzzy=0.5)
+        # Only the exact match and the single fuzzy match set the rating
+        self.assertEqual(report["edited"] + report["added"], 2)
+        self.assertEqual(report["ambiguous"], [songs[1], songs[2], songs[3]])
+        self.assertEqual([match[0] for match in report["fuzzy"]], [songs[4]])
+        self.assertEqual(report["unmatched"], [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,151 @@
+import io
+import unittest
+from contextlib import redirect_stdout
+from test import *
+from src.music_filesystem import MemoryFileSystem
+
+SONGS = 1500  # Songs that fit in the simulated device
+SONG_SIZE = 1 << 20  # Bytes of each song file
+
+
+def get_library(songs: int) -> Library:
+    """It gets a library with some songs, all of them in one playlist.
+
+    Args:
+        songs (int): Number of songs.
+
+    Returns:
+        Library: Music library.
+    """
+    library = Library(None)
+    for id in range(songs):
+        library.add_song(
+            Song(
+                id,
+                title="Song " + str(id),
+                artist="Artist " + str(id % 50),
+                album="Album " + str(id % 200),
+                track_number=id % 20 + 1,
+            )
+        )
+    library.playlists.append(Playlist(1, "All", songs=list(library.songs)))
+    return library
+
+
+class TestFitLibrary(unittest.TestCase):
+    def sync(self, library: Library, filesystem: MemoryFileSystem) -> Sync:
+        """It syncs a library into the simulated device, selecting the songs that fit.
+
+        Args:
+            library (Library): Music library.
+            filesystem (MemoryFileSystem): Simulated device.
+
+        Returns:
+            Sync: Finished sync process.
+        """
+        with redirect_stdout(io.StringIO()):
+            process = Sync(
+                "iTunes",
+                None,
+                SOURCE,
+                DESTINATION,
+                library=library,
+                filesystem=filesystem,
+                destination_database=DESTINATION + SEPARATOR + "rhythmdb.xml",
+                fit=True,
+            )
+            process.start()
+        return process
+
+    def test_second_run_is_noop(self):
+        library = get_library(SONGS + 500)
+        filesystem = MemoryFileSystem()
+        for song in library.songs:
+            filesystem.add_file(
+                SOURCE + SEPARATOR + get_file_path(song), size=SONG_SIZE, mtime=1
+            )
+        # Source files are in the same simulated device
+        filesystem.capacity = (
+            len(library.songs) * SONG_SIZE + SONGS * SONG_SIZE + RESERVE
+        )
+        first = self.sync(library, filesystem)
+        self.assertEqual(len(first.library.songs), SONGS)
+        self.assertEqual(first.log.counters["copy"], SONGS)
+        second = self.sync(library, filesystem)
+        self.assertEqual(len(second.library.songs), SONGS)
+        for category in ["copy", "remove", "error"]:
+            self.assertEqual(second.log.counters[category], 0, category)
+        self.assertEqual(second.log.counters["skip"], SONGS)
+
+
+class TestDedup(unittest.TestCase):
+    def sync(self, filesystem: MemoryFileSystem, library: Library) -> Sync:
+        """It syncs a library, linking the songs files with the same content.
+
+        Args:
+            filesystem (MemoryFileSystem): File system of the source and destination folders.
+            library (Library): Music library.
+
+        Returns:
+            Sync: Finished sync process.
+        """
+        with redirect_stdout(io.StringIO()):
+            process = Sync(
+                "iTunes",
+                None,
+                SOURCE,
+                DESTINATION,
+                library=library,
+                filesystem=filesystem,
+                dedup=True,
+            )
+            process.start()
+        return process
+
+    def test_identical_files_are_linked(self):
+        library = get_library(4)
+        filesystem = MemoryFileSystem()
+        for song in library.songs:
+            filesystem.add_file(
+                SOURCE + SEPARATOR + get_file_path(song),
+                content=b"same" if song.id < 3 else b"other",
+            )
+        process = self.sync(filesystem, library)
+        self.assertEqual(process.log.counters["copy"], 2)
+        self.assertEqual(process.log.counters["link"], 2)
+        self.assertEqual(process.log.counters["error"], 0)
+
+    def test_files_without_content_are_copied(self):
+        library = get_library(4)
+        filesystem = MemoryFileSystem()
+        for song in library.songs:
+            filesystem.add_file(SOURCE + SEPARATOR + get_file_path(song), size=10)
+        process = self.sync(filesystem, library)
+        self.assertEqual(process.log.counters["copy"], 4)
+        self.assertEqual(process.log.counters["link"], 0)
+        self.assertEqual(process.log.counters["error"], 0)
+
+
+class TestPlaylistsFiles(unittest.TestCase):
+    def test_case_insensitive_names(self):
+        playlists = [
+            Playlist(3, "rock"),
+            Playlist(1, "Rock"),
+            Playlist(2, "ROCK (3)"),
+            Playlist(4, "Jazz"),
+        ]
+        files = get_playlists_files(playlists)
+        self.assertEqual(
+            files,
+            [
+                "rock (3) (3)" + PLAYLIST_EXTENSION,
+                "Rock" + PLAYLIST_EXTENSION,
+                "ROCK (3)" + PLAYLIST_EXTENSION,
+                "Jazz" + PLAYLIST_EXTENSION,
+            ],
+        )
+        self.assertEqual(len({file.casefold() for file in files}), len(playlists))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,133 @@
+import io
+import os
+import sys
+import unittest
+from contextlib import redirect_stdout
+from subprocess import CalledProcessError
+from tempfile import TemporaryDirectory
+from test import *
+from src.music_transcode import transcode_file
+
+FAIL = [
+    sys.executable,
+    "-c",
+    "import sys; open(sys.argv[1], 'wb').write(b'partial'); sys.exit(1)",
+    "{destination}",
+]  # Stand-in encoder that fails after writing part of its output
+
+
+def get_encoder(runs: str) -> list:
+    """It gets a stand-in encoder command template that copies the source file, so the tests run without ffmpeg.
+
+    Args:
+        runs (str): Path to a file where a line is appended for each run, with the format and the bitrate.
+
+    Returns:
+        list: Encoder command template.
+    """
+    return [
+        sys.executable,
+        "-c",
+        "import shutil, sys; shutil.copyfile(sys.argv[1], sys.argv[2]); "
+        + "open(sys.argv[3], 'a').write('{format} {bitrate}\\n')",
+        "{source}",
+        "{destination}",
+        runs,
+    ]
+
+
+def read(file_name: str, mode: str = "r"):
+    """It reads the content of a file.
+
+    Args:
+        file_name (str): Path to the file.
+        mode (str, optional): Open mode. Defaults to "r".
+
+    Returns:
+        str | bytes: File content.
+    """
+    with open(file_name, mode=mode) as file:
+        return file.read()
+
+
+class TestTranscodeFile(unittest.TestCase):
+    def setUp(self):
+        self.temporary = TemporaryDirectory()
+        self.folder = self.temporary.name
+        self.runs = os.path.join(self.folder, "runs")
+        self.source = os.path.join(self.folder, "song.flac")
+        self.destination = os.path.join(self.folder, "song.mp3")
+        with open(self.source, mode="wb") as file:
+            file.write(b"song")
+
+    def tearDown(self):
+        self.temporary.cleanup()
+
+    def test_encoder_template(self):
+        encoder = get_encoder(self.runs)
+        cached = transcode_file(self.source, self.destination, "mp3", 128, encoder)
+        self.assertFalse(cached)
+        self.assertEqual(read(self.destination, "rb"), b"song")
+        self.assertEqual(read(self.runs), "mp3 128\n")
+
+    def test_cache_hit(self):
+        encoder = get_encoder(self.runs)
+        cache = os.path.join(self.folder, "cache")
+        cached = transcode_file(
+            self.source, self.destination, "mp3", 128, encoder, cache
+        )
+        self.assertFalse(cached)
+        os.remove(self.destination)
+        cached = transcode_file(
+            self.source, self.destination, "mp3", 128, encoder, cache
+        )
+        self.assertTrue(cached)
+        self.assertEqual(read(self.destination, "rb"), b"song")
+        # The encoder only ran for the first file
+        self.assertEqual(read(self.runs), "mp3 128\n")
+
+    def test_failing_encoder(self):
+        files = sorted(os.listdir(self.folder))
+        with self.assertRaises(CalledProcessError):
+            transcode_file(self.source, self.destination, "mp3", 128, FAIL)
+        # No destination or temporary files are left
+        self.assertEqual(sorted(os.listdir(self.folder)), files)
+
+
+class TestTranscodeSongs(unittest.TestCase):
+    def test_failing_encoder(self):
+        library = Library(None)
+        library.add_song(
+            Song(1, title="Song", artist="Artist", album="Album", format="flac")
+        )
+        song_file = get_file_path(library.songs[0])
+        with TemporaryDirectory() as folder:
+            source = folder + SEPARATOR + "source"
+            destination = folder + SEPARATOR + "destination"
+            os.makedirs(source + SEPARATOR + get_folder_path(library.songs[0]))
+            with open(source + SEPARATOR + song_file, mode="wb") as file:
+                file.write(b"song")
+            os.makedirs(destination)
+            with redirect_stdout(io.StringIO()):
+                process = Sync(
+                    "iTunes",
+                    None,
+                    source,
+                    destination,
+                    library=library,
+                    transcode={"flac": ("mp3", 128)},
+                    encoder=FAIL,
+                )
+                process.start()
+            album = destination + SEPARATOR + get_folder_path(library.songs[0])
+            files = os.listdir(album) if os.path.exists(album) else []
+        self.assertEqual(process.log.counters["error"], 1)
+        self.assertEqual(
+            [event["song"] for event in process.log.iter_events("error")],
+            [song_file],
+        )
+        self.assertEqual(files, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
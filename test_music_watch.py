@@ -0,0 +1,44 @@
+import io
+import os
+import unittest
+from contextlib import redirect_stdout
+from tempfile import TemporaryDirectory
+from test import *
+from src.music_watch import Watch
+
+
+class TestPollingWatch(unittest.TestCase):
+    def test_rewritten_song_file(self):
+        library = Library(None)
+        library.files = []
+        library.add_song(Song(1, title="Song", artist="Artist", album="Album"))
+        song_file = get_file_path(library.songs[0])
+        with TemporaryDirectory() as folder:
+            source = folder + SEPARATOR + "source"
+            destination = folder + SEPARATOR + "destination"
+            os.makedirs(source + SEPARATOR + get_folder_path(library.songs[0]))
+            with open(source + SEPARATOR + song_file, mode="wb") as file:
+                file.write(b"song")
+            os.makedirs(destination)
+            with redirect_stdout(io.StringIO()):
+                process = Sync("iTunes", None, source, destination, library=library)
+                process.start()
+                watch = Watch(process, polling=True, interval=0)
+                # Same size, so only the modification time changes
+                with open(source + SEPARATOR + song_file, mode="wb") as file:
+                    file.write(b"SONG")
+                status = os.stat(source + SEPARATOR + song_file)
+                os.utime(
+                    source + SEPARATOR + song_file,
+                    ns=(status.st_atime_ns, status.st_mtime_ns + 10**9),
+                )
+                changes = watch.watcher.wait(0)
+                result = watch.sync(changes)
+            with open(destination + SEPARATOR + song_file, mode="rb") as file:
+                content = file.read()
+        self.assertEqual(result["updated"], 1)
+        self.assertEqual(content, b"SONG")
+
+
+if __name__ == "__main__":
+    unittest.main()